@@ -0,0 +1,198 @@
+# Aggregation Engine
+"""
+Group-by aggregation on integer group codes instead of pandas' generic groupby machinery.
+Keys are factorized once (category columns reuse their codes), then every requested metric is
+a numpy kernel over the codes: np.bincount for size/count/sum/mean/std and unbuffered ufunc.at
+for min/max and exact integer sums. Only the metrics asked for are computed.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+
+AGGREGATIONS = ('size', 'count', 'sum', 'mean', 'std', 'min', 'max', 'median')
+
+Key = Union[str, pd.Series]
+
+
+class GroupCodes:
+    """Group number of every row (-1 = row left out, a missing key with dropna) and the key of each group"""
+
+    def __init__(self, codes: np.ndarray, keys: pd.DataFrame):
+        self.codes = codes
+        self.keys = keys
+        self.groups = len(keys)
+        self.complete = not (codes < 0).any()   # Every row belongs to a group
+
+    def sizes(self) -> np.ndarray:
+        codes = self.codes if self.complete else self.codes[self.codes >= 0]
+        return np.bincount(codes, minlength=self.groups)
+
+
+def _factorize_one(values: pd.Series, dropna: bool, sort: bool) -> Tuple[np.ndarray, pd.Index]:
+    """Codes and unique values of one key column; category columns keep only observed categories"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        raw = values.cat.codes.to_numpy()
+        categories = values.cat.categories
+        has_missing = not dropna and (raw < 0).any()
+        if sort:
+            order = np.flatnonzero(np.bincount(raw[raw >= 0], minlength=len(categories)))
+            order = np.append(order, -1) if has_missing else order   # Missing key last, as pandas does
+        else:
+            order = pd.unique(raw if has_missing else raw[raw >= 0])  # Order of first appearance
+        remap = np.full(len(categories) + 1, -1, dtype=np.int64)   # Code -1 (missing) reads the last slot
+        remap[order] = np.arange(len(order))
+        return remap[raw], pd.CategoricalIndex(pd.Categorical.from_codes(order, dtype=values.dtype))
+    codes, uniques = pd.factorize(values, sort=sort, use_na_sentinel=dropna)
+    return codes.astype(np.int64, copy=False), pd.Index(uniques)
+
+
+def factorize_groups(df: pd.DataFrame, by: Union[Key, Sequence[Key]], dropna: bool = True,
+                     sort: bool = True) -> GroupCodes:
+    """
+    Group codes for df grouped by one or more keys (column names or Series aligned with df).
+    sort=True orders groups by key (category order for category keys), sort=False by first appearance.
+    """
+    keys = [by] if isinstance(by, (str, pd.Series)) else list(by)
+    columns = [key if isinstance(key, pd.Series) else df[key] for key in keys]
+    names = [key.name if isinstance(key, pd.Series) else key for key in keys]
+
+    codes, uniques = _factorize_one(columns[0], dropna, sort)
+    if len(columns) == 1:
+        return GroupCodes(codes, pd.DataFrame({names[0]: uniques}))
+
+    # Several keys: combine the per-key codes into one integer per row, then number the combinations
+    level_codes, level_uniques = [codes], [uniques]
+    for values in columns[1:]:
+        codes, uniques = _factorize_one(values, dropna, sort)
+        level_codes.append(codes)
+        level_uniques.append(uniques)
+    combined = np.zeros(len(df), dtype=np.int64)
+    missing = np.zeros(len(df), dtype=bool)
+    for codes, uniques in zip(level_codes, level_uniques):
+        combined = combined * len(uniques) + codes
+        missing |= codes < 0
+    combined[missing] = -1
+    group_codes, combinations = pd.factorize(combined, sort=sort)
+    if missing.any():
+        kept = combinations >= 0
+        remap = np.cumsum(kept) - 1
+        remap[~kept] = -1
+        group_codes = np.where(group_codes >= 0, remap[group_codes], -1)
+        combinations = combinations[kept]
+
+    key_columns = {}
+    remainder = np.asarray(combinations, dtype=np.int64)
+    for name, uniques in reversed(list(zip(names, level_uniques))):
+        key_columns[name] = uniques.take(remainder % len(uniques))
+        remainder = remainder // len(uniques)
+    keys_frame = pd.DataFrame({name: key_columns[name] for name in names})
+    return GroupCodes(np.asarray(group_codes, dtype=np.int64), keys_frame)
+
+
+def _reduce_at(values: np.ndarray, codes: np.ndarray, count: np.ndarray, ufunc) -> np.ndarray:
+    """ufunc.at(values) per group (np.minimum, np.maximum, np.add); groups without values get NaN"""
+    if ufunc is np.add:
+        initial = 0
+    elif values.dtype.kind == 'i':
+        initial = np.iinfo(values.dtype).max if ufunc is np.minimum else np.iinfo(values.dtype).min
+    else:
+        initial = np.inf if ufunc is np.minimum else -np.inf
+    result = np.full(len(count), initial, dtype=values.dtype)
+    ufunc.at(result, codes, values)
+    if (count > 0).all():
+        return result
+    return np.where(count > 0, result, np.nan)
+
+
+def _median(values: np.ndarray, codes: np.ndarray, groups: int) -> np.ndarray:
+    # No counting kernel for order statistics; pandas' grouped median on the integer codes
+    medians = pd.Series(values).groupby(codes, sort=True).median()
+    return medians.reindex(range(groups)).to_numpy(dtype=np.float64)
+
+
+def _column_metrics(values: pd.Series, groups: GroupCodes, aggregations: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Requested metrics of one value column; the valid-row selection and counts are shared between them"""
+    is_integer = pd.api.types.is_integer_dtype(values.dtype) and not values.hasnans
+    array = values.to_numpy(dtype=np.int64) if is_integer else values.to_numpy(dtype=np.float64, na_value=np.nan)
+    codes = groups.codes
+    valid = groups.codes >= 0 if not groups.complete else None
+    if not is_integer:
+        present = ~np.isnan(array)
+        valid = present if valid is None else valid & present
+    if valid is not None and not valid.all():
+        array, codes = array[valid], codes[valid]
+
+    results: Dict[str, np.ndarray] = {}
+    count = np.bincount(codes, minlength=groups.groups)
+    if any(agg in aggregations for agg in ('sum', 'mean', 'std')):
+        weights = array.astype(np.float64, copy=False)
+        total = np.bincount(codes, weights=weights, minlength=groups.groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # mean / std come from the float total: an exact int64 total can wrap where floats don't
+        mean = total / count if any(agg in aggregations for agg in ('mean', 'std')) else None
+        for agg in aggregations:
+            if agg == 'count':
+                results[agg] = count
+            elif agg == 'sum':
+                if is_integer:
+                    # Float sums are exact below 2**53; beyond that integers are summed exactly by run
+                    exact = len(array) == 0 or float(np.abs(array).max()) * len(array) < 2 ** 53
+                    results[agg] = total.astype(np.int64) if exact else _reduce_at(array, codes, count, np.add)
+                else:
+                    results[agg] = total
+            elif agg == 'mean':
+                results[agg] = mean
+            elif agg == 'std':
+                deviations = np.bincount(codes, weights=(weights - mean[codes]) ** 2, minlength=groups.groups)
+                results[agg] = np.where(count > 1, np.sqrt(deviations / np.maximum(count - 1, 1)), np.nan)
+            elif agg in ('min', 'max'):
+                results[agg] = _reduce_at(array, codes, count, np.minimum if agg == 'min' else np.maximum)
+            elif agg == 'median':
+                results[agg] = _median(array.astype(np.float64, copy=False), codes, groups.groups)
+    return results
+
+
+def _normalise_metrics(metrics: Union[Dict[str, Union[str, Sequence[str]]], None]) -> Dict[str, List[str]]:
+    normalised = {}
+    for column, aggregations in (metrics or {}).items():
+        aggregations = [aggregations] if isinstance(aggregations, str) else list(aggregations)
+        unsupported = [agg for agg in aggregations if agg not in AGGREGATIONS or agg == 'size']
+        if unsupported:
+            raise ValueError(f"Unsupported aggregation for {column}: {unsupported}")
+        normalised[column] = aggregations
+    return normalised
+
+
+def aggregate(df: pd.DataFrame, by: Union[Key, Sequence[Key]],
+              metrics: Optional[Dict[str, Union[str, Sequence[str]]]] = None, size: bool = False,
+              dropna: bool = True, sort: bool = True, groups: Optional[GroupCodes] = None) -> pd.DataFrame:
+    """
+    One row per group: the key columns, then `<column>_<aggregation>` for each requested metric
+    (and `size`, the rows per group, when size=True). metrics maps a column to one aggregation or
+    a list of them, e.g. {'Sales': ['sum', 'mean'], 'Units': 'sum'}.
+    """
+    metrics = _normalise_metrics(metrics)
+    groups = groups or factorize_groups(df, by, dropna=dropna, sort=sort)
+    result = groups.keys.copy()
+    if size:
+        result['size'] = groups.sizes()
+    for column, aggregations in metrics.items():
+        for agg, values in _column_metrics(df[column], groups, aggregations).items():
+            result[f"{column}_{agg}"] = values
+    return result
+
+
+def group_aggregate(df: pd.DataFrame, by: Union[Key, Sequence[Key]], column: Optional[str] = None,
+                    aggregation: str = 'sum', dropna: bool = True, sort: bool = True) -> pd.Series:
+    """
+    One metric per group as a Series indexed by the key (what df.groupby(by)[column].agg(aggregation)
+    returns, with observed=True); column=None or aggregation='size' counts rows per group.
+    """
+    groups = factorize_groups(df, by, dropna=dropna, sort=sort)
+    if column is None or aggregation == 'size':
+        values, name = groups.sizes(), 'size' if column is None else column
+    else:
+        _normalise_metrics({column: aggregation})
+        values, name = _column_metrics(df[column], groups, [aggregation])[aggregation], column
+    index = pd.MultiIndex.from_frame(groups.keys) if groups.keys.shape[1] > 1 else pd.Index(groups.keys.iloc[:, 0])
+    return pd.Series(values, index=index, name=name)
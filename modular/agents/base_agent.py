@@ -2,7 +2,10 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional
 import pandas as pd
-from openai import OpenAI
+from .parallel_profiler import get_profiling_executor
+from .client_pool import get_openai_client
+from .rate_limiter import call_with_rate_limit, estimate_tokens
+from .request_coalescer import get_request_coalescer, request_key
 
 class BaseAgent(ABC):
     """Base class for all agents in the system"""
@@ -13,25 +16,46 @@ class BaseAgent(ABC):
         self.client = None
 
     def initialize_model(self, api_key: str):
-        """Initialize the OpenAI client"""
-        self.client = OpenAI(api_key=api_key)
+        """Attach the shared OpenAI client for this API key"""
+        self.client = get_openai_client(api_key)
 
     @abstractmethod
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process input and return results"""
         pass
 
+    def create_chat_completion(self, messages: List[Dict[str, str]], max_tokens: int = 1000,
+                               temperature: float = 0.1, model: Optional[str] = None, **kwargs):
+        """
+        Chat completion through the shared per-model rate limiter (429s and 5xx are retried with backoff).
+        Identical requests already in flight (same model, messages and params) share that one call.
+        `model` overrides the agent's default model for this request.
+        """
+        client = self.client
+        model = model or self.model_name
+        # Clients are one per API key, so different tenants never share a call
+        key = request_key(model, messages, client=id(client),
+                          max_tokens=max_tokens, temperature=temperature, **kwargs)
+        return get_request_coalescer().do(key, lambda: call_with_rate_limit(
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **kwargs
+            ),
+            model,
+            estimate_tokens(messages, max_tokens)
+        ))
+
     def generate_response(self, prompt: str, max_tokens: int = 1000) -> str:
         """Generate response using OpenAI model"""
         if not self.client:
             return "Error: OpenAI client not initialized"
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
+            response = self.create_chat_completion(
+                [{"role": "user", "content": prompt}],
                 max_tokens=max_tokens,
                 temperature=0.1  # Lower temperature for more consistent results
             )
@@ -46,6 +70,19 @@ class BaseAgent(ABC):
 
     def analyze_dataframe(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Analyze DataFrame and return basic statistics"""
+        executor = get_profiling_executor()
+        if executor.should_parallelize(df):
+            # Wide tables: per-column statistics computed across the worker pool
+            column_stats = executor.describe(df)
+            return {
+                'shape': df.shape,
+                'columns': list(df.columns),
+                'dtypes': df.dtypes.to_dict(),
+                'missing_values': column_stats['missing_values'],
+                'summary': column_stats['summary'],
+                'sample_data': df.head().to_dict()
+            }
+
         return {
             'shape': df.shape,
             'columns': list(df.columns),
@@ -0,0 +1,163 @@
+# Chart Worker Pool
+"""
+Figure construction off the calling (UI / request) thread. The charts of one response are
+built in parallel on a shared thread pool, each under a time budget counted from submission.
+A chart still building when its budget runs out (or whose builder fails) is replaced by its
+fallback - a cheap variant over pre-aggregated data - so one slow figure never holds up the
+response. Fallbacks run on a pool of their own, since running builds can't be interrupted and
+may still occupy every build worker. An over-budget build is cancelled if it hasn't started;
+otherwise it finishes in the background and is discarded. While the build workers are all busy
+with such abandoned builds, new charts go straight to their fallback instead of queueing.
+"""
+from typing import Dict, Any, List, Optional, Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import os
+import threading
+import time
+
+
+class ChartJob:
+    """One chart to build: the full figure builder and an optional cheap fallback builder"""
+
+    def __init__(self, build: Callable[[], Any], fallback: Optional[Callable[[], Any]] = None, name: str = 'chart'):
+        self.build = build
+        self.fallback = fallback
+        self.name = name
+
+
+class ChartPool:
+    """
+    Thread pool for figure builders. Threads rather than processes: plotly figures and the
+    frames they are built from stay in this process, and the pandas / numpy kernels doing the
+    heavy lifting release the GIL.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, budget: Optional[float] = None,
+                 fallback_budget: Optional[float] = None):
+        self.max_workers = max_workers or int(os.getenv("CHART_WORKERS", "4"))
+        self.budget = budget if budget is not None else float(os.getenv("CHART_BUDGET_SECONDS", "5"))
+        self.fallback_budget = fallback_budget if fallback_budget is not None else \
+            float(os.getenv("CHART_FALLBACK_BUDGET_SECONDS", "5"))
+        self._pool = None
+        self._fallback_pool = None
+        self._abandoned = set()   # Over-budget builds still running on a build worker
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="chart")
+            return self._pool
+
+    def _get_fallback_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._fallback_pool is None:
+                self._fallback_pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="chart-fallback")
+            return self._fallback_pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            for pool in (self._pool, self._fallback_pool):
+                if pool is not None:
+                    pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._fallback_pool = None
+            self._abandoned.clear()
+
+    def _abandon(self, future):
+        """Forget an over-budget build; one already running is tracked until it finishes"""
+        if future.cancel():
+            return
+        with self._pool_lock:
+            self._abandoned.add(future)
+        future.add_done_callback(self._finish_abandoned)
+
+    def _finish_abandoned(self, future):
+        with self._pool_lock:
+            self._abandoned.discard(future)
+
+    @property
+    def saturated(self) -> bool:
+        """Every build worker is tied up by an abandoned build"""
+        with self._pool_lock:
+            return len(self._abandoned) >= self.max_workers
+
+    @staticmethod
+    def _wait(future, deadline: float):
+        """(figure, error) once the future finishes, or raises FutureTimeout at the deadline"""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic())), None
+        except FutureTimeout:
+            raise
+        except Exception as e:
+            return None, e
+
+    def render(self, jobs: Sequence[ChartJob], budget: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Build every job in parallel. Returns one entry per job, in order: the figure (None if it
+        failed), its status ('built', 'fallback', 'failed' or 'timeout') and the seconds it took.
+        """
+        budget = self.budget if budget is None else budget
+        fallback_pool = self._get_fallback_pool()
+        started = time.monotonic()
+        if self.saturated:
+            # Full builds would only queue behind the abandoned ones and time out
+            print("⏱️ Chart workers busy with over-budget builds, using aggregated variants")
+            futures = [None] * len(jobs)
+        else:
+            pool = self._get_pool()
+            futures = [pool.submit(job.build) for job in jobs]
+
+        results: List[Dict[str, Any]] = []
+        fallbacks = {}
+        for index, (job, future) in enumerate(zip(jobs, futures)):
+            try:
+                if future is None:
+                    raise FutureTimeout()
+                figure, error = self._wait(future, started + budget)
+            except FutureTimeout:
+                if future is not None:
+                    self._abandon(future)
+                    print(f"⏱️ Chart '{job.name}' over its {budget:.1f}s budget, using the aggregated variant")
+                if job.fallback is not None:
+                    fallbacks[index] = fallback_pool.submit(job.fallback)
+                results.append({'name': job.name, 'figure': None, 'status': 'timeout', 'seconds': budget})
+                continue
+            if error is not None:
+                print(f"⚠️ Chart '{job.name}' failed: {error}")
+                if job.fallback is not None:
+                    fallbacks[index] = fallback_pool.submit(job.fallback)
+            results.append({'name': job.name, 'figure': figure, 'status': 'built' if error is None else 'failed',
+                            'seconds': round(time.monotonic() - started, 3)})
+
+        fallback_started = time.monotonic()
+        for index, future in fallbacks.items():
+            try:
+                figure, error = self._wait(future, fallback_started + self.fallback_budget)
+            except FutureTimeout:
+                future.cancel()
+                print(f"⏱️ Aggregated chart '{jobs[index].name}' over budget too, leaving it out")
+                continue
+            if error is not None:
+                print(f"⚠️ Aggregated chart '{jobs[index].name}' failed: {error}")
+                continue
+            results[index].update({'figure': figure, 'status': 'fallback',
+                                   'seconds': round(time.monotonic() - started, 3)})
+        return results
+
+    def render_one(self, build: Callable[[], Any], fallback: Optional[Callable[[], Any]] = None,
+                   name: str = 'chart', budget: Optional[float] = None) -> Any:
+        """Figure from one builder under the budget (the fallback's figure when it runs over or fails), or None"""
+        return self.render([ChartJob(build, fallback, name)], budget)[0]['figure']
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_chart_pool() -> ChartPool:
+    """Process-wide chart pool so the worker threads are started once and reused"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ChartPool()
+        return _default_pool
@@ -0,0 +1,55 @@
+# Shared OpenAI Client Pool
+from typing import Dict
+import hashlib
+import os
+import threading
+
+_clients: Dict[str, object] = {}
+_clients_lock = threading.Lock()
+
+
+def _connection_settings() -> Dict[str, float]:
+    return {
+        'max_connections': int(os.getenv("OPENAI_MAX_CONNECTIONS", "50")),
+        'max_keepalive_connections': int(os.getenv("OPENAI_MAX_KEEPALIVE", "20")),
+        'keepalive_expiry': float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "120")),
+        'timeout': float(os.getenv("OPENAI_TIMEOUT", "60"))
+    }
+
+
+def _build_client(api_key: str):
+    from openai import OpenAI
+
+    settings = _connection_settings()
+    try:
+        import httpx
+        from openai import DefaultHttpxClient
+    except ImportError:
+        # SDK without the httpx hooks: still one client (and one pool) per key, default limits
+        return OpenAI(api_key=api_key, timeout=settings['timeout'], max_retries=0)
+
+    # Keep-alive connections are reused by every agent and session, so TLS is negotiated once
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=int(settings['max_connections']),
+            max_keepalive_connections=int(settings['max_keepalive_connections']),
+            keepalive_expiry=settings['keepalive_expiry']
+        ),
+        timeout=httpx.Timeout(settings['timeout'], connect=10.0)
+    )
+    # Retries are done by agents.rate_limiter, which also honours the per-model budgets
+    return OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+
+
+def get_openai_client(api_key: str):
+    """
+    Process-wide OpenAI client for an API key. The client is thread-safe, so every agent,
+    rerun and session shares one HTTP connection pool instead of opening its own.
+    """
+    key = hashlib.sha256((api_key or "").encode()).hexdigest()  # never keep raw keys as dict keys
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _build_client(api_key)
+            _clients[key] = client
+        return client
@@ -1,16 +1,12 @@
 # Code Execution Agent
 from .base_agent import BaseAgent
+from .dataset_store import shared_view
 from typing import Dict, Any, List, Optional
 import pandas as pd
 import io
 import sys
-import subprocess
-import tempfile
-import os
 import re
 import traceback
-import plotly.graph_objects as go
-import plotly.express as px
 import numpy as np
 
 class CodeExecutionAgent(BaseAgent):
@@ -40,15 +36,18 @@ class CodeExecutionAgent(BaseAgent):
         code = input_data.get('code', '')
         df = input_data.get('dataframe')
         command = input_data.get('command', '')
+        progress = input_data.get('progress') or (lambda fraction, stage: None)
 
         if not code:
             # Generate code if not provided
+            progress(0.1, "Generating code")
             code = self.generate_code(command, df)
 
         if not code:
             return {'error': 'No code to execute'}
 
         try:
+            progress(0.5, "Running code")
             result = self.execute_code_safely(code, df)
             return {
                 'success': result['success'],
@@ -83,7 +82,7 @@ class CodeExecutionAgent(BaseAgent):
         - Shape: {data_info['shape']}
         - Columns: {', '.join(data_info['columns'][:10])}
         - Numeric columns: {', '.join([col for col in data_info['columns'] if col in df.select_dtypes(include=['number']).columns][:5])}
-        - Categorical columns: {', '.join([col for col in data_info['columns'] if col in df.select_dtypes(include=['object']).columns][:5])}
+        - Categorical columns: {', '.join([col for col in data_info['columns'] if col in df.select_dtypes(include=['object', 'string', 'category']).columns][:5])}
 
         Requirements:
         1. The dataframe is available as 'df'
@@ -131,6 +130,10 @@ class CodeExecutionAgent(BaseAgent):
                 'error': 'Code contains potentially unsafe operations'
             }
 
+        import plotly.express as px
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+
         # Capture output
         output_buffer = io.StringIO()
         old_stdout = sys.stdout
@@ -163,12 +166,12 @@ class CodeExecutionAgent(BaseAgent):
                 'round': round,
                 'sorted': sorted
             },
-            'df': df.copy() if df is not None else None,
+            'df': shared_view(df) if df is not None else None,  # Writes copy only the touched columns
             'pd': pd,
             'np': np,
             'px': px,
             'go': go,
-            'make_subplots': __import__('plotly.subplots', fromlist=['make_subplots']).make_subplots
+            'make_subplots': make_subplots
         }
 
         exec_locals = {}
@@ -262,7 +265,7 @@ class CodeExecutionAgent(BaseAgent):
             return templates
 
         numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-        categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
+        categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
 
         # Basic statistics template
         templates['statistics'] = """
@@ -293,7 +296,7 @@ fig.show()
 import plotly.express as px
 
 # Group data
-grouped = df.groupby('{categorical_cols[0]}')['{numeric_cols[0]}'].mean().reset_index()
+grouped = df.groupby('{categorical_cols[0]}', observed=True)['{numeric_cols[0]}'].mean().reset_index()
 
 fig = px.bar(grouped, x='{categorical_cols[0]}', y='{numeric_cols[0]}',
              title='Average {numeric_cols[0]} by {categorical_cols[0]}')
@@ -0,0 +1,263 @@
+# Column Sketches
+from typing import Dict, Any, List, Optional
+import math
+import numpy as np
+import pandas as pd
+from .incremental_profile import IncrementalDataProfile
+from .dtype_optimizer import observed_counts
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    """64-bit hashes of the non-null values of a column"""
+    values = values.dropna()
+    if values.empty:
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Vectorized int.bit_length() for uint64 arrays (split in 32-bit halves so floats stay exact)"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    _, high_exp = np.frexp(high)
+    _, low_exp = np.frexp(low)
+    return np.where(high > 0, 32 + high_exp, low_exp)
+
+
+class HyperLogLog:
+    """Distinct-count sketch: fixed memory (2^precision registers), mergeable by register max"""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = np.zeros(self.num_registers, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        if hashes.size == 0:
+            return
+        suffix_bits = 64 - self.precision
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        rank = (suffix_bits - _bit_length(suffix) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def update(self, values: pd.Series):
+        self.add_hashes(hash_values(values))
+
+    def merge(self, other: 'HyperLogLog'):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = self.num_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty_registers = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and empty_registers > 0:
+            # Linear counting is more accurate for small cardinalities
+            raw = m * math.log(m / empty_registers)
+        return int(round(raw))
+
+
+class KLLSketch:
+    """Quantile sketch (Karnin-Lang-Liberty): bounded number of retained items, mergeable"""
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = k
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += values.size
+        self._compress()
+
+    def merge(self, other: 'KLLSketch'):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+
+    def _compress(self):
+        compacted = True
+        while compacted:
+            compacted = False
+            for level in range(len(self.levels)):
+                items = self.levels[level]
+                if items.size <= self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+
+                items = np.sort(items)
+                # An odd item stays behind so the retained weight is preserved exactly
+                keep = items[-1:] if items.size % 2 else items[:0]
+                pairs = items[:items.size - keep.size]
+                promoted = pairs[int(self.rng.integers(2))::2]
+
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                compacted = True
+
+    def quantiles(self, qs: List[float]) -> List[float]:
+        if self.count == 0:
+            return [float('nan')] * len(qs)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level_items.size, 2.0 ** level) for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1], side='left')
+        return [float(items[min(pos, items.size - 1)]) for pos in positions]
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+
+class MisraGries:
+    """Heavy-hitter sketch keeping at most k counters; counts are lower bounds off by at most `error`"""
+
+    def __init__(self, k: int = 64):
+        self.k = k
+        self.counters = pd.Series(dtype='int64')
+        self.count = 0
+        self.error = 0
+
+    @property
+    def exact(self) -> bool:
+        """True while no counter has been evicted, i.e. counts and distinct values are exact"""
+        return self.error == 0
+
+    def update(self, values: pd.Series):
+        self.update_counts(observed_counts(values))
+
+    def update_counts(self, counts: pd.Series):
+        """Fold pre-aggregated value counts (e.g. one chunk's value_counts) into the sketch"""
+        self.count += int(counts.sum())
+        self._combine(counts)
+
+    def merge(self, other: 'MisraGries'):
+        self.count += other.count
+        self.error += other.error
+        self._combine(other.counters)
+
+    def _combine(self, counts: pd.Series):
+        if counts.empty:
+            return
+        if len(counts) > 2 * self.k + 1:
+            # Values outside the chunk's top 2k+1 can never survive the merge below:
+            # at least k+1 candidates already have a count at least as large
+            counts = counts.nlargest(2 * self.k + 1)
+        merged = counts if self.counters.empty else pd.concat([self.counters, counts]).groupby(level=0, sort=False).sum()
+        if len(merged) > self.k:
+            # Subtract the (k+1)-th largest count from every counter and drop the non-positive ones
+            threshold = int(merged.nlargest(self.k + 1).iloc[-1])
+            merged = merged[merged > threshold] - threshold
+            self.error += threshold
+        self.counters = merged.astype('int64')
+
+    def top(self, n: int = 5) -> Dict[Any, int]:
+        return {key: int(value) for key, value in self.counters.sort_values(ascending=False, kind='stable').head(n).items()}
+
+
+class SketchDataProfile(IncrementalDataProfile):
+    """
+    Incremental profile backed by fixed-size sketches instead of exact value counts.
+    Rows are consumed in chunks in a single pass, memory per column is bounded, and two
+    profiles of the same schema (other chunks, other processes) can be merged.
+    """
+
+    def __init__(self, chunk_size: int = 100_000, hll_precision: int = 12, kll_k: int = 200, top_k: int = 64):
+        super().__init__()
+        self.chunk_size = chunk_size
+        self.hll_precision = hll_precision
+        self.kll_k = kll_k
+        self.top_k = top_k
+        self.distinct: Dict[str, HyperLogLog] = {}
+        self.quantile_sketches: Dict[str, KLLSketch] = {}
+        self.heavy_hitters: Dict[str, MisraGries] = {}
+
+    def set_schema(self, df: pd.DataFrame):
+        super().set_schema(df)
+        self.category_counts = {}  # replaced by heavy_hitters + distinct
+        for col in self.columns:
+            self.distinct[col] = HyperLogLog(self.hll_precision)
+        for col in self.numeric_columns:
+            self.quantile_sketches[col] = KLLSketch(self.kll_k)
+        for col in self.categorical_columns:
+            self.heavy_hitters[col] = MisraGries(self.top_k)
+
+    def update(self, new_rows: pd.DataFrame):
+        if new_rows is None or new_rows.empty:
+            return
+        for start in range(0, len(new_rows), self.chunk_size):
+            chunk = new_rows.iloc[start:start + self.chunk_size]
+            super().update(chunk)
+            for col in self.numeric_columns + self.date_columns:
+                self.distinct[col].update(chunk[col])
+            for col in self.numeric_columns:
+                self.quantile_sketches[col].update(pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan))
+
+    def update_categorical(self, col: str, values: pd.Series):
+        # One value_counts pass feeds both sketches; only the chunk's distinct values are hashed
+        counts = observed_counts(values)
+        self.heavy_hitters[col].update_counts(counts)
+        self.distinct[col].update(counts.index.to_series())
+
+    def merge(self, other: 'SketchDataProfile'):
+        self.total_rows += other.total_rows
+        for col in self.numeric_columns:
+            self.numeric_stats[col].merge(other.numeric_stats[col])
+            self.quantile_sketches[col].merge(other.quantile_sketches[col])
+        for col in self.categorical_columns:
+            self.heavy_hitters[col].merge(other.heavy_hitters[col])
+            self.category_missing[col] += other.category_missing[col]
+        for col in self.date_columns:
+            self.merge_date_range(col, other.date_ranges[col])
+        for col in self.columns:
+            self.distinct[col].merge(other.distinct[col])
+
+    def unique_count(self, col: str) -> int:
+        heavy_hitters = self.heavy_hitters.get(col)
+        if heavy_hitters is not None and heavy_hitters.exact:
+            return len(heavy_hitters.counters)
+        return self.distinct[col].estimate()
+
+    def top_values(self, col: str, n: int = 5) -> Dict[Any, int]:
+        heavy_hitters = self.heavy_hitters.get(col)
+        return heavy_hitters.top(n) if heavy_hitters is not None else {}
+
+    def quantiles(self, col: str, qs: List[float] = (0.25, 0.5, 0.75)) -> Dict[float, float]:
+        return dict(zip(qs, self.quantile_sketches[col].quantiles(list(qs))))
+
+    def to_data_profile(self, extra_date_columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        data_profile = super().to_data_profile(extra_date_columns)
+        for col, analysis in data_profile['numeric_analysis'].items():
+            q25, median, q75 = self.quantile_sketches[col].quantiles([0.25, 0.5, 0.75])
+            analysis.update({'q25': q25, 'median': median, 'q75': q75})
+        data_profile['approximate'] = True
+        return data_profile
+
+
+def approximate_unique_counts(df: pd.DataFrame, exact_row_limit: int = 100_000, precision: int = 12) -> Dict[str, int]:
+    """Distinct counts per column: exact for small frames, HyperLogLog estimates for large ones"""
+    if len(df) <= exact_row_limit:
+        return {col: int(df[col].nunique()) for col in df.columns}
+
+    counts = {}
+    for col in df.columns:
+        sketch = HyperLogLog(precision)
+        sketch.update(df[col])
+        counts[col] = sketch.estimate()
+    return counts
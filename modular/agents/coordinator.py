@@ -1,10 +1,12 @@
 # Agent Coordinator
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable
 import pandas as pd
 from .data_agent import DataAnalysisAgent
 from .meta_prompt_agent import MetaPromptAgent
 from .visualization_agent import VisualizationAgent
 from .code_execution_agent import CodeExecutionAgent
+from .fast_path import get_fast_path
+from .result_handle import ResultHandle
 
 class AgentCoordinator:
     """Coordinates communication between different agents"""
@@ -22,13 +24,19 @@ class AgentCoordinator:
         for agent in [self.data_agent, self.meta_prompt_agent, self.visualization_agent, self.code_execution_agent]:
             agent.initialize_model(openai_api_key)
 
-    def process_command(self, command: str, df: pd.DataFrame) -> Dict[str, Any]:
-        """Process user command through multi-agent workflow with enhanced error handling"""
+    def process_command(self, command: str, df: pd.DataFrame,
+                        progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+        """
+        Process user command through multi-agent workflow with enhanced error handling.
+        progress(fraction, stage) is called at each step (see job_queue.JobContext.progress).
+        """
         print(f"🔄 Processing command: '{command}'")
+        progress = progress or (lambda fraction, stage: None)
 
         try:
             # Step 1: Meta-prompt agent analyzes context and creates prompts
             print("📋 Step 1: Meta-prompt analysis...")
+            progress(0.05, "Analyzing the request")
             meta_input = {
                 'command': command,
                 'dataframe': df,
@@ -37,14 +45,25 @@ class AgentCoordinator:
             meta_result = self.meta_prompt_agent.process(meta_input)
             print(f"✅ Meta analysis complete. Intent: {meta_result.get('context', {}).get('intent', 'unknown')}")
 
-            # Step 2: Data analysis agent processes the command
+            # Step 2: Data analysis agent processes the command (fully specified questions are computed directly)
             print("🔍 Step 2: Data analysis...")
-            data_input = {
-                'command': command,
-                'dataframe': df,
-                'context': meta_result.get('context', {})
-            }
-            data_result = self.data_agent.process(data_input)
+            progress(0.25, "Analyzing the data")
+            fast_answer = get_fast_path().answer(command, df)
+            if fast_answer is not None:
+                print(f"⚡ Answered from data ({fast_answer['query']['kind']}), skipping LLM parsing and insights")
+                data_result = {
+                    'success': True,
+                    'operation': fast_answer['operation'],
+                    'result': {'data': fast_answer['data'], 'operation_details': fast_answer['narrative']},
+                    'explanation': fast_answer['narrative'].split("\n")[0].strip('*')
+                }
+            else:
+                data_input = {
+                    'command': command,
+                    'dataframe': df,
+                    'context': meta_result.get('context', {})
+                }
+                data_result = self.data_agent.process(data_input)
 
             if not data_result.get('success', False):
                 error_msg = data_result.get('error', 'Data analysis failed')
@@ -58,6 +77,7 @@ class AgentCoordinator:
 
             # Step 3: Visualization agent creates interactive options or charts
             print("📊 Step 3: Creating visualizations...")
+            progress(0.5, "Creating visualizations")
             viz_result = {'success': False, 'charts': [], 'explanation': ''}
 
             try:
@@ -84,17 +104,24 @@ class AgentCoordinator:
                 print(f"⚠️ Visualization error: {viz_error}, continuing without charts")
 
             # Step 4: Generate AI insights
-            print("🧠 Step 4: Generating AI insights...")
-            ai_insights = self.generate_ai_insights(command, data_result, df)
+            if fast_answer is not None:
+                ai_insights = fast_answer['narrative']
+            else:
+                print("🧠 Step 4: Generating AI insights...")
+                progress(0.75, "Generating insights")
+                ai_insights = self.generate_ai_insights(command, data_result, df)
 
             # Step 5: Combine results
             print("🔗 Step 5: Combining results...")
-            result_data = data_result.get('result', {}).get('data')
+            progress(0.95, "Combining results")
+            # Filters and sorts come back as handles over df; the rest is wrapped so callers page and export alike
+            result_data = ResultHandle.wrap(data_result.get('result', {}).get('data'))
             final_result = {
                 'explanation': data_result.get('explanation', 'Analysis completed successfully'),
                 'ai_insights': ai_insights,
                 'data': result_data,
                 'operation': data_result.get('operation', {}),
+                'fast_path': fast_answer is not None,
                 'workflow_success': True
             }
 
@@ -128,11 +155,13 @@ class AgentCoordinator:
                 'workflow_success': False
             }
 
-    def execute_code(self, code: str, df: pd.DataFrame) -> Dict[str, Any]:
+    def execute_code(self, code: str, df: pd.DataFrame,
+                     progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
         """Execute code through code execution agent"""
         code_input = {
             'code': code,
-            'dataframe': df
+            'dataframe': df,
+            'progress': progress
         }
 
         return self.code_execution_agent.process(code_input)
@@ -219,7 +248,7 @@ class AgentCoordinator:
 
         # Get column information for more specific insights
         numeric_cols = original_df.select_dtypes(include=['number']).columns.tolist()
-        categorical_cols = original_df.select_dtypes(include=['object', 'string']).columns.tolist()
+        categorical_cols = original_df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
         date_cols = original_df.select_dtypes(include=['datetime64']).columns.tolist()
 
         # Extract specific column insights
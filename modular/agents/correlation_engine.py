@@ -0,0 +1,199 @@
+# Correlation Engine
+from typing import List, Optional, Tuple
+from collections import OrderedDict
+import threading
+import numpy as np
+import pandas as pd
+from .fingerprint import frame_fingerprint
+
+
+class CorrelationAccumulator:
+    """
+    Pairwise-complete Pearson co-moments for a fixed set of numeric columns.
+    Values are shifted by the first batch's column means to keep the raw sums well conditioned,
+    so appended rows (or another accumulator) can be folded in without rescanning old data.
+    """
+
+    def __init__(self, columns: List[str], dtype=np.float64, block_rows: int = 65_536):
+        self.columns = list(columns)
+        self.dtype = np.dtype(dtype)
+        self.block_rows = block_rows
+        size = len(self.columns)
+        self.shift: Optional[np.ndarray] = None
+        self.n = np.zeros((size, size))        # rows where both columns are present
+        self.sum_x = np.zeros((size, size))    # sum of column i over those rows
+        self.sum_xx = np.zeros((size, size))   # sum of squares of column i over those rows
+        self.sum_xy = np.zeros((size, size))   # cross products
+
+    def copy(self) -> 'CorrelationAccumulator':
+        clone = CorrelationAccumulator(self.columns, self.dtype, self.block_rows)
+        clone.shift = None if self.shift is None else self.shift.copy()
+        clone.n, clone.sum_x = self.n.copy(), self.sum_x.copy()
+        clone.sum_xx, clone.sum_xy = self.sum_xx.copy(), self.sum_xy.copy()
+        return clone
+
+    def update(self, df: pd.DataFrame):
+        """Fold new rows into the co-moments, block by block to bound temporary memory"""
+        for start in range(0, len(df), self.block_rows):
+            block = df.iloc[start:start + self.block_rows][self.columns].to_numpy(dtype='float64', na_value=np.nan)
+            if self.shift is None:
+                with np.errstate(all='ignore'):
+                    shift = np.nanmean(block, axis=0) if len(block) else np.zeros(len(self.columns))
+                self.shift = np.nan_to_num(shift)
+            self._update_block(block)
+
+    def _update_block(self, block: np.ndarray):
+        valid = ~np.isnan(block)
+        values = np.where(valid, block - self.shift, 0.0).astype(self.dtype, copy=False)
+
+        self.sum_xy += values.T @ values
+        if valid.all():
+            # Dense block: every pair sees every row, the pairwise sums collapse to column sums
+            self.n += len(block)
+            self.sum_x += values.sum(axis=0, dtype=np.float64)[:, None]
+            self.sum_xx += (values * values).sum(axis=0, dtype=np.float64)[:, None]
+        else:
+            mask = valid.astype(self.dtype)
+            self.n += mask.T @ mask
+            self.sum_x += values.T @ mask
+            self.sum_xx += (values * values).T @ mask
+
+    def merge(self, other: 'CorrelationAccumulator'):
+        """Combine with an accumulator over other rows of the same columns"""
+        if other.shift is None:
+            return
+        if self.shift is None:
+            self.shift = other.shift.copy()
+        delta = other.shift - self.shift
+        if np.any(delta):
+            # Re-express the other sums around this accumulator's shift
+            dx, dy = delta[:, None], delta[None, :]
+            other_sum_y = other.sum_x.T
+            sum_xy = other.sum_xy + dy * other.sum_x + dx * other_sum_y + dx * dy * other.n
+            sum_xx = other.sum_xx + 2 * dx * other.sum_x + dx * dx * other.n
+            sum_x = other.sum_x + dx * other.n
+        else:
+            sum_xy, sum_xx, sum_x = other.sum_xy, other.sum_xx, other.sum_x
+        self.n += other.n
+        self.sum_x += sum_x
+        self.sum_xx += sum_xx
+        self.sum_xy += sum_xy
+
+    def matrix(self, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Correlation matrix with pandas semantics (pairwise complete, NaN for < 2 rows or zero variance)"""
+        n, sum_x, sum_xx, sum_xy = self.n, self.sum_x, self.sum_xx, self.sum_xy
+        if indices is not None:
+            grid = np.ix_(indices, indices)
+            n, sum_x, sum_xx, sum_xy = n[grid], sum_x[grid], sum_xx[grid], sum_xy[grid]
+
+        sum_y, sum_yy = sum_x.T, sum_xx.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = sum_xy - sum_x * sum_y / n
+            var_x = sum_xx - sum_x * sum_x / n
+            var_y = sum_yy - sum_y * sum_y / n
+            corr = cov / np.sqrt(var_x * var_y)
+
+        tolerance = np.finfo(self.dtype).eps * 64
+        degenerate = (n < 2) | (var_x <= tolerance * sum_xx) | (var_y <= tolerance * sum_yy)
+        corr[degenerate] = np.nan
+        np.clip(corr, -1.0, 1.0, out=corr)
+        diagonal = np.diag_indices_from(corr)
+        corr[diagonal] = np.where(np.isnan(corr[diagonal]), np.nan, 1.0)
+        return corr
+
+
+class CorrelationResult:
+    """Correlation matrix for a set of columns plus vectorized strong-pair extraction"""
+
+    def __init__(self, columns: List[str], matrix: np.ndarray):
+        self.columns = list(columns)
+        self.matrix = matrix
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.matrix, index=self.columns, columns=self.columns)
+
+    def strong_pairs(self, threshold: float = 0.5) -> List[Tuple[str, str, float]]:
+        """(col1, col2, r) for every column pair with |r| > threshold, in row-major upper-triangle order"""
+        rows, cols = np.triu_indices(len(self.columns), k=1)
+        values = self.matrix[rows, cols]
+        with np.errstate(invalid='ignore'):
+            selected = np.flatnonzero(np.abs(values) > threshold)
+        return [(self.columns[rows[i]], self.columns[cols[i]], float(values[i])) for i in selected]
+
+
+class CorrelationEngine:
+    """
+    Computes correlation once per dataset version and caches the co-moments, keyed by a
+    content fingerprint of the numeric columns. Column subsets are sliced out of the cached
+    accumulator and appended rows update it incrementally.
+    """
+
+    def __init__(self, max_entries: int = 8, dtype=np.float64, block_rows: int = 65_536):
+        self.max_entries = max_entries
+        self.dtype = dtype
+        self.block_rows = block_rows
+        self._cache: 'OrderedDict[str, CorrelationAccumulator]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def numeric_frame(df: pd.DataFrame) -> pd.DataFrame:
+        return df.select_dtypes(include=['number'])
+
+    def _lookup(self, key: str) -> Optional[CorrelationAccumulator]:
+        with self._lock:
+            accumulator = self._cache.get(key)
+            if accumulator is not None:
+                self._cache.move_to_end(key)
+            return accumulator
+
+    def _store(self, key: str, accumulator: CorrelationAccumulator):
+        with self._lock:
+            self._cache[key] = accumulator
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def accumulator(self, df: pd.DataFrame) -> CorrelationAccumulator:
+        """Cached co-moments for all numeric columns of df (computed on first use)"""
+        numeric_df = self.numeric_frame(df)
+        key = frame_fingerprint(numeric_df)
+        accumulator = self._lookup(key)
+        if accumulator is None:
+            accumulator = CorrelationAccumulator(numeric_df.columns, self.dtype, self.block_rows)
+            accumulator.update(numeric_df)
+            self._store(key, accumulator)
+        return accumulator
+
+    def correlation(self, df: pd.DataFrame, columns: Optional[List[str]] = None) -> CorrelationResult:
+        """Correlation matrix of df's numeric columns, optionally restricted to `columns`"""
+        accumulator = self.accumulator(df)
+        if columns is None:
+            return CorrelationResult(accumulator.columns, accumulator.matrix())
+
+        positions = {col: i for i, col in enumerate(accumulator.columns)}
+        selected = [col for col in columns if col in positions]
+        indices = np.array([positions[col] for col in selected], dtype=np.intp)
+        return CorrelationResult(selected, accumulator.matrix(indices))
+
+    def append(self, previous: pd.DataFrame, new_rows: pd.DataFrame, combined: pd.DataFrame):
+        """Carry the cached co-moments of `previous` over to `combined` by folding in only `new_rows`"""
+        previous_accumulator = self._lookup(frame_fingerprint(self.numeric_frame(previous)))
+        if previous_accumulator is None:
+            return  # Nothing cached yet, the combined frame is computed lazily on first use
+
+        accumulator = previous_accumulator.copy()
+        accumulator.update(new_rows)
+        self._store(frame_fingerprint(self.numeric_frame(combined)), accumulator)
+
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_correlation_engine() -> CorrelationEngine:
+    """Process-wide engine so every agent shares the same correlation cache"""
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = CorrelationEngine()
+        return _default_engine
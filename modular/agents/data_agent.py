@@ -1,5 +1,10 @@
 # Data Analysis Agent
 from .base_agent import BaseAgent
+from .correlation_engine import get_correlation_engine
+from .result_handle import ResultHandle
+from .aggregation_engine import AGGREGATIONS, aggregate, group_aggregate
+from .fast_path import AGGREGATION_WORDS
+from .top_n import top_n, top_n_per_group, top_values, top_values_per_group
 from typing import Dict, Any, List
 import pandas as pd
 import numpy as np
@@ -26,6 +31,11 @@ class DataAnalysisAgent(BaseAgent):
 
         # Analyze the command to determine operation type
         operation = self.parse_command(command)
+        if operation['type'] == 'group':
+            operation['parameters'] = {**self.group_request(command, df), **operation.get('parameters', {})}
+        elif operation['type'] in ('top', 'bottom'):
+            operation['type'] = 'top'
+            operation['parameters'] = {**self.ranking_request(command, df), **operation.get('parameters', {})}
 
         try:
             result = self.execute_operation(operation, df)
@@ -51,7 +61,7 @@ class DataAnalysisAgent(BaseAgent):
             'parameters': {}
         }
 
-        # Define patterns for different operations
+        # Define patterns for different operations (rankings before sorts: "top 5 orders by sales")
         patterns = {
             'filter': [
                 r'filter.*by.*(\w+)',
@@ -60,6 +70,14 @@ class DataAnalysisAgent(BaseAgent):
                 r'(\w+).*greater than.*(\d+)',
                 r'(\w+).*less than.*(\d+)'
             ],
+            'top': [
+                r'top.*(\d+).*(\w+)',
+                r'highest.*(\d+).*(\w+)',
+                r'largest.*(\d+).*(\w+)',
+                r'bottom.*(\d+).*(\w+)',
+                r'lowest.*(\d+).*(\w+)',
+                r'smallest.*(\d+).*(\w+)'
+            ],
             'sort': [
                 r'sort.*by.*(\w+)',
                 r'order.*by.*(\w+)',
@@ -70,11 +88,6 @@ class DataAnalysisAgent(BaseAgent):
                 r'grouped.*by.*(\w+)',
                 r'break.*down.*by.*(\w+)'
             ],
-            'top': [
-                r'top.*(\d+).*(\w+)',
-                r'highest.*(\d+).*(\w+)',
-                r'largest.*(\d+).*(\w+)'
-            ],
             'correlation': [
                 r'correlation.*between.*(\w+).*and.*(\w+)',
                 r'relationship.*between.*(\w+).*and.*(\w+)',
@@ -159,7 +172,7 @@ class DataAnalysisAgent(BaseAgent):
         command_lower = command.lower()
 
         # Enhanced fallback patterns
-        if any(word in command_lower for word in ['top', 'highest', 'best', 'largest']):
+        if any(word in command_lower for word in ['top', 'highest', 'best', 'largest', 'bottom', 'lowest', 'worst', 'smallest']):
             return {'type': 'top', 'parameters': {'n': 5}}
         elif any(word in command_lower for word in ['group', 'by', 'breakdown']):
             return {'type': 'group', 'parameters': {}}
@@ -200,8 +213,8 @@ class DataAnalysisAgent(BaseAgent):
             return self.statistics_analysis(df, {})
 
     def filter_data(self, df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Filter dataframe based on parameters"""
-        filtered_df = df.copy()
+        """Filter dataframe based on parameters (returns a handle over df, not a copy)"""
+        filtered = ResultHandle(df)
 
         # Simple filtering logic - can be enhanced
         if 'matches' in params and len(params['matches']) >= 2:
@@ -212,130 +225,201 @@ class DataAnalysisAgent(BaseAgent):
                 if pd.api.types.is_numeric_dtype(df[column]):
                     try:
                         numeric_value = float(value)
-                        filtered_df = df[df[column] == numeric_value]
+                        filtered = ResultHandle.from_mask(df, df[column] == numeric_value)
                     except:
-                        filtered_df = df[df[column].astype(str).str.contains(value, case=False, na=False)]
+                        filtered = ResultHandle.from_mask(df, df[column].astype(str).str.contains(value, case=False, na=False))
                 else:
-                    filtered_df = df[df[column].astype(str).str.contains(value, case=False, na=False)]
+                    filtered = ResultHandle.from_mask(df, df[column].astype(str).str.contains(value, case=False, na=False))
 
         return {
-            'data': filtered_df,
+            'data': filtered,
             'operation_details': f"Filtered by {params}"
         }
 
     def sort_data(self, df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Sort dataframe"""
+        """Sort dataframe (returns a handle holding the row order, not a sorted copy)"""
         if 'matches' in params and len(params['matches']) > 0:
             column = params['matches'][0]
             if column in df.columns:
-                sorted_df = df.sort_values(by=column, ascending=False)
                 return {
-                    'data': sorted_df,
+                    'data': ResultHandle.sorted_by(df, column, ascending=False),
                     'operation_details': f"Sorted by {column} (descending)"
                 }
 
         # Default sort by first numeric column
         numeric_cols = df.select_dtypes(include=['number']).columns
         if len(numeric_cols) > 0:
-            sorted_df = df.sort_values(by=numeric_cols[0], ascending=False)
             return {
-                'data': sorted_df,
+                'data': ResultHandle.sorted_by(df, numeric_cols[0], ascending=False),
                 'operation_details': f"Sorted by {numeric_cols[0]} (descending)"
             }
 
-        return {'data': df, 'operation_details': "No sorting applied"}
+        return {'data': ResultHandle(df), 'operation_details': "No sorting applied"}
+
+    def group_request(self, command: str, df: pd.DataFrame) -> Dict[str, Any]:
+        """Group column, metric columns and aggregations named in a command ("average sales by region")"""
+        command_lower = command.lower()
+        head, _, tail = command_lower.rpartition(' by ')
+        names = {col: str(col).lower().replace('_', ' ') for col in df.columns}
+        request = {}
+        group_by = [col for col in df.columns if tail and names[col] in tail]
+        if group_by:
+            request['group_by'] = group_by[0]
+        metrics = [col for col in df.select_dtypes(include=['number']).columns
+                   if names[col] in (head or command_lower) and col not in group_by[:1]]
+        if metrics:
+            request['metrics'] = metrics
+        aggregations = [agg for pattern, agg in AGGREGATION_WORDS if re.search(pattern, command_lower)]
+        if aggregations:
+            request['aggregations'] = aggregations
+        return request
 
     def group_data(self, df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Group dataframe"""
-        if 'matches' in params and len(params['matches']) > 0:
+        """Group dataframe, computing only the requested metrics (count/mean/sum of every numeric column if none are named)"""
+        group_column = params.get('group_by')
+        if group_column not in df.columns and params.get('matches'):
             group_column = params['matches'][0]
-            if group_column in df.columns:
-                numeric_cols = df.select_dtypes(include=['number']).columns
-                if len(numeric_cols) > 0:
-                    grouped = df.groupby(group_column)[numeric_cols].agg(['count', 'mean', 'sum']).round(2)
-                    grouped = grouped.reset_index()
-                    return {
-                        'data': grouped,
-                        'operation_details': f"Grouped by {group_column}"
-                    }
+        if group_column in df.columns:
+            numeric_cols = [col for col in df.select_dtypes(include=['number']).columns if col != group_column]
+            metrics = params.get('metrics') or ([params['column']] if params.get('column') else [])
+            metrics = [col for col in metrics if col in numeric_cols] or numeric_cols
+            aggregations = params.get('aggregations') or ([params['aggregation']] if params.get('aggregation') else [])
+            aggregations = [agg for agg in aggregations if agg in AGGREGATIONS and agg != 'size'] or ['count', 'mean', 'sum']
+            if metrics:
+                grouped = aggregate(df, group_column, {col: aggregations for col in metrics}).round(2)
+                return {
+                    'data': grouped,
+                    'operation_details': f"Grouped by {group_column}: {', '.join(aggregations)} of {', '.join(map(str, metrics))}"
+                }
 
         return {'data': df.head(10), 'operation_details': "No grouping applied"}
 
+    def ranking_request(self, command: str, df: pd.DataFrame) -> Dict[str, Any]:
+        """N, direction, metric, ranked entity and per-group column named in a ranking command"""
+        command_lower = command.lower()
+        names = {col: str(col).lower().replace('_', ' ') for col in df.columns}
+        request = {}
+        number = re.search(r'\b(?:top|bottom|highest|lowest|best|worst|largest|smallest|first|last)\s+(\d+)', command_lower)
+        if number:
+            request['n'] = int(number.group(1))
+        if re.search(r'\b(?:bottom|lowest|worst|smallest|least)\b', command_lower):
+            request['criteria'] = 'lowest'
+
+        # "top 3 products per region by sales": region groups, products are ranked by sales
+        per = re.search(r'\b(?:per|for each|for every|in each|within each|within)\s+(.+)$', command_lower)
+        head = command_lower[:per.start()] + ' ' + command_lower[per.end(1):] if per else command_lower
+        if per:
+            group_by = [col for col in df.columns if names[col] in per.group(1).split(' by ')[0]]
+            if group_by:
+                request['per_group'] = group_by[0]
+                head = command_lower[:per.start()] + ' ' + ' by '.join(per.group(1).split(' by ')[1:])
+        metrics = [col for col in df.select_dtypes(include=['number']).columns if names[col] in head]
+        if metrics:
+            request['column'] = metrics[0]
+        entities = [col for col in df.columns if names[col] in head and col not in metrics
+                    and col != request.get('per_group') and not pd.api.types.is_numeric_dtype(df[col])]
+        if entities:
+            request['entity'] = entities[0]
+        return request
+
     def top_data(self, df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Get top N records"""
+        """
+        Top (or bottom) N records, values ("top 5 products by sales") or N per group ("top 3 products
+        per region"). Results are bounded: at most N rows, or N per group, up to top_n.DEFAULT_LIMIT.
+        """
         n = 5  # default
-        column = None
+        column = params.get('column') if params.get('column') in df.columns else None
 
         if 'matches' in params:
             matches = params['matches']
             if len(matches) >= 2:
                 try:
                     n = int(matches[0])
-                    column = matches[1]
+                    column = matches[1] if matches[1] in df.columns else column
                 except:
-                    column = matches[0] if matches[0] in df.columns else None
+                    column = matches[0] if matches[0] in df.columns else column
             elif len(matches) == 1:
                 if matches[0].isdigit():
                     n = int(matches[0])
                 else:
-                    column = matches[0] if matches[0] in df.columns else None
+                    column = matches[0] if matches[0] in df.columns else column
+        try:
+            n = max(1, int(params.get('n', n)))
+        except (TypeError, ValueError):
+            pass
+        ascending = params.get('criteria') == 'lowest'
+        group_by = params.get('per_group') if params.get('per_group') in df.columns else None
+        entity = params.get('entity') if params.get('entity') in df.columns else None
+        ties = params.get('ties', 'first')
+        direction = 'Bottom' if ascending else 'Top'
 
         # If no column specified, use first numeric column
         if column is None:
             numeric_cols = df.select_dtypes(include=['number']).columns
             column = numeric_cols[0] if len(numeric_cols) > 0 else df.columns[0]
 
-        if column in df.columns:
-            if pd.api.types.is_numeric_dtype(df[column]):
-                top_data = df.nlargest(n, column)
-            else:
-                # For non-numeric, get top by frequency
-                top_values = df[column].value_counts().head(n)
-                top_data = df[df[column].isin(top_values.index)]
-
-            # Add more specific business context
-            context_info = f"Top {n} records by {column}"
-            if pd.api.types.is_numeric_dtype(df[column]):
-                max_val = top_data[column].max()
-                min_val = top_data[column].min()
-                context_info += f" (range: {min_val:.1f} to {max_val:.1f})"
-
-                # Add quarterly/time context if date columns exist
-                date_cols = df.select_dtypes(include=['datetime64']).columns
-                if len(date_cols) > 0:
-                    date_col = date_cols[0]
-                    if date_col in top_data.columns:
-                        # Get time period info
-                        try:
-                            latest_date = top_data[date_col].max()
-                            earliest_date = top_data[date_col].min()
-                            context_info += f" (time period: {earliest_date.strftime('%Y-%m') if hasattr(earliest_date, 'strftime') else str(earliest_date)} to {latest_date.strftime('%Y-%m') if hasattr(latest_date, 'strftime') else str(latest_date)})"
-                        except:
-                            pass
-
-            return {
-                'data': top_data,
-                'operation_details': context_info
-            }
+        if column not in df.columns:
+            return {'data': df.head(n), 'operation_details': f"Top {n} records"}
+
+        numeric = pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])
+        if not numeric:
+            # Most (least) frequent values of a text column, one row per value
+            top_data = top_values_per_group(df, group_by, column, n, ascending=ascending, ties=ties) if group_by \
+                else top_values(df, column, n, ascending=ascending, ties=ties)
+            per = f" per {group_by}" if group_by else ""
+            return {'data': top_data, 'operation_details': f"{direction} {n} {column} values by frequency{per}"}
+
+        if entity is not None:
+            # Values of the entity ranked by their total of the metric
+            top_data = top_values_per_group(df, group_by, entity, n, column, ascending=ascending, ties=ties) if group_by \
+                else top_values(df, entity, n, column, ascending=ascending, ties=ties)
+            per = f" per {group_by}" if group_by else ""
+            return {'data': top_data, 'operation_details': f"{direction} {n} {entity} by total {column}{per}"}
+
+        if group_by is not None:
+            top_data = top_n_per_group(df, group_by, column, n, ascending=ascending, ties=ties)
+            context_info = f"{direction} {n} records by {column} per {group_by}"
+        else:
+            top_data = top_n(df, column, n, ascending=ascending, ties=ties)
+            context_info = f"{direction} {n} records by {column}"
+
+        # Add more specific business context
+        if len(top_data):
+            max_val = top_data[column].max()
+            min_val = top_data[column].min()
+            context_info += f" (range: {min_val:.1f} to {max_val:.1f})"
+
+            # Add quarterly/time context if date columns exist
+            date_cols = df.select_dtypes(include=['datetime64']).columns
+            if len(date_cols) > 0:
+                date_col = date_cols[0]
+                if date_col in top_data.columns:
+                    # Get time period info
+                    try:
+                        latest_date = top_data[date_col].max()
+                        earliest_date = top_data[date_col].min()
+                        context_info += f" (time period: {earliest_date.strftime('%Y-%m') if hasattr(earliest_date, 'strftime') else str(earliest_date)} to {latest_date.strftime('%Y-%m') if hasattr(latest_date, 'strftime') else str(latest_date)})"
+                    except:
+                        pass
 
-        return {'data': df.head(n), 'operation_details': f"Top {n} records"}
+        return {
+            'data': top_data,
+            'operation_details': context_info
+        }
 
     def correlation_analysis(self, df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
         """Perform detailed correlation analysis with specific insights"""
         numeric_df = df.select_dtypes(include=['number'])
 
         if len(numeric_df.columns) >= 2:
-            correlation_matrix = numeric_df.corr()
+            correlation = get_correlation_engine().correlation(df)
+            correlation_matrix = correlation.to_frame()
 
             # Find strongest correlations
-            strongest_correlations = []
-            for i in range(len(correlation_matrix.columns)):
-                for j in range(i+1, len(correlation_matrix.columns)):
-                    col1 = correlation_matrix.columns[i]
-                    col2 = correlation_matrix.columns[j]
-                    corr_val = correlation_matrix.iloc[i, j]
-                    if abs(corr_val) > 0.5:  # Strong correlation threshold
-                        strongest_correlations.append(f"{col1} vs {col2}: {corr_val:.3f}")
+            strongest_correlations = [
+                f"{col1} vs {col2}: {corr_val:.3f}"
+                for col1, col2, corr_val in correlation.strong_pairs(0.5)  # Strong correlation threshold
+            ]
 
             correlation_details = f"Analyzed {len(numeric_df.columns)} numeric columns"
             if strongest_correlations:
@@ -362,7 +446,8 @@ class DataAnalysisAgent(BaseAgent):
             for col in df.columns:
                 if 'date' in col.lower() or 'time' in col.lower():
                     try:
-                        df[col] = pd.to_datetime(df[col])
+                        # Convert on a local frame - the caller's (shared) data stays untouched
+                        df = df.assign(**{col: pd.to_datetime(df[col])})
                         date_cols = [col]
                         break
                     except:
@@ -372,13 +457,11 @@ class DataAnalysisAgent(BaseAgent):
             date_col = date_cols[0]
             numeric_col = df.select_dtypes(include=['number']).columns[0]
 
-            # Extract time components
-            df_seasonal = df.copy()
-            df_seasonal['month'] = pd.to_datetime(df_seasonal[date_col]).dt.month
-            df_seasonal['quarter'] = pd.to_datetime(df_seasonal[date_col]).dt.quarter
-            df_seasonal['year'] = pd.to_datetime(df_seasonal[date_col]).dt.year
-
-            seasonal_data = df_seasonal.groupby(['year', 'month'])[numeric_col].sum().reset_index()
+            # Group by time components directly instead of adding them to a copy of the frame
+            dates = pd.to_datetime(df[date_col])
+            seasonal_data = group_aggregate(
+                df, [dates.dt.year.rename('year'), dates.dt.month.rename('month')], numeric_col, 'sum'
+            ).reset_index()
 
             return {
                 'data': seasonal_data,
@@ -403,7 +486,7 @@ class DataAnalysisAgent(BaseAgent):
 
         # For non-numeric data, show value counts
         categorical_stats = {}
-        for col in df.select_dtypes(include=['object']).columns[:3]:  # First 3 categorical columns
+        for col in df.select_dtypes(include=['object', 'string', 'category']).columns[:3]:  # First 3 categorical columns
             categorical_stats[col] = df[col].value_counts().head(10)
 
         if categorical_stats:
@@ -431,7 +514,7 @@ class DataAnalysisAgent(BaseAgent):
 
             # Add specific column information
             numeric_cols = data.select_dtypes(include=['number']).columns.tolist()
-            categorical_cols = data.select_dtypes(include=['object', 'string']).columns.tolist()
+            categorical_cols = data.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
 
             if numeric_cols:
                 top_numeric = numeric_cols[0]
@@ -1,7 +1,16 @@
 # Model 1: Data Analyst Chatbot
 from .base_agent import BaseAgent
 from .visualization_agent import VisualizationAgent
+from .model_router import get_model_router
+from .fast_path import get_fast_path, build_chart
+from .aggregation_engine import group_aggregate
+from .semantic_cache import get_semantic_cache
+from .fingerprint import frame_fingerprint
+from .chart_pool import ChartJob, get_chart_pool
+from .figure_codec import compact_figure, as_figure
+from functools import partial
 from typing import Dict, Any, List
+import time
 import pandas as pd
 import numpy as np
 
@@ -13,8 +22,11 @@ class DataAnalystChatbot(BaseAgent):
     """
 
     def __init__(self):
-        super().__init__("DataAnalystChatbot", "gpt-4")  # Using GPT-4 for better analysis
+        super().__init__("DataAnalystChatbot", "gpt-4")  # Default; each question is routed by ModelRouter
         self.conversation_history = []
+        self.last_route = None
+        self.last_response_fallback = False
+        self.data_key = None  # Dataset fingerprint, keys the semantic answer cache
         self.current_data = None
         self.context_prompt = ""
         self.viz_agent = VisualizationAgent()
@@ -35,16 +47,25 @@ class DataAnalystChatbot(BaseAgent):
                 'response': 'Failed to process message'
             }
 
-    def set_context_and_data(self, system_prompt: str, data: pd.DataFrame, api_key: str):
+    def set_context_and_data(self, system_prompt: str, data: pd.DataFrame, api_key: str, data_key: str = None):
         """Set the dynamic context from Model 2 and data access"""
         self.context_prompt = system_prompt
         self.current_data = data
+        self.data_key = data_key
         self.initialize_model(api_key)
         if self.viz_agent:
             self.viz_agent.initialize_model(api_key)
 
         print("💬 Model 1: Data Analyst Chatbot initialized with context")
 
+    def update_data(self, data: pd.DataFrame, system_prompt: str = None, data_key: str = None):
+        """Point the chatbot at a grown dataset, keeping the conversation and client"""
+        self.current_data = data
+        self.data_key = data_key
+        if system_prompt:
+            self.context_prompt = system_prompt
+            print("💬 Model 1: Context refreshed")
+
     def chat(self, user_message: str) -> Dict[str, Any]:
         """
         Main chat method - responds like a data analyst to stakeholder questions
@@ -58,6 +79,19 @@ class DataAnalystChatbot(BaseAgent):
             # Analyze the question to determine response strategy
             response_strategy = self.analyze_question_intent(user_message)
 
+            # Fully specified questions are computed directly, without an LLM round trip
+            fast_answer = get_fast_path().answer(user_message, self.current_data, response_strategy)
+            if fast_answer is not None:
+                return self.fast_path_response(fast_answer, response_strategy)
+
+            # Rephrasings of a question already answered on this dataset reuse that answer
+            cache = get_semantic_cache()
+            columns = list(self.current_data.columns) if self.current_data is not None else []
+            if self.current_data is not None:
+                cached = cache.lookup(self.dataset_key(), user_message, response_strategy, columns)
+                if cached is not None:
+                    return self.cached_response(cached, response_strategy)
+
             # Generate analytical response
             analytical_response = self.generate_analyst_response(user_message, response_strategy)
 
@@ -67,12 +101,24 @@ class DataAnalystChatbot(BaseAgent):
             # Add assistant response to history
             self.conversation_history.append({"role": "assistant", "content": analytical_response})
 
+            follow_ups = self.generate_follow_up_questions(response_strategy)
+            if self.current_data is not None and not self.last_response_fallback:
+                cache.store(self.dataset_key(), user_message, response_strategy, columns, {
+                    'response': analytical_response,
+                    # Figures are kept compact; every hit decodes its own, independently mutable copy
+                    'figures': [{'chart': compact_figure(viz['chart']), 'type': viz['type'], 'description': viz['description']}
+                                for viz in visualizations if viz.get('chart') is not None],
+                    'follow_up_suggestions': follow_ups,
+                    'route': self.last_route
+                })
+
             return {
                 'success': True,
                 'response': analytical_response,
                 'visualizations': visualizations,
-                'follow_up_suggestions': self.generate_follow_up_questions(response_strategy),
-                'strategy': response_strategy
+                'follow_up_suggestions': follow_ups,
+                'strategy': response_strategy,
+                'route': self.last_route
             }
 
         except Exception as e:
@@ -85,6 +131,55 @@ class DataAnalystChatbot(BaseAgent):
                 'visualizations': []
             }
 
+    def fast_path_response(self, answer: Dict[str, Any], strategy: Dict[str, Any]) -> Dict[str, Any]:
+        """Chat result for a question answered by the deterministic fast path"""
+        print(f"⚡ Model 1: Answered from data ({answer['query']['kind']}), no LLM call")
+        self.last_route = {'tier': 'fast_path', 'model': None}
+        self.conversation_history.append({"role": "assistant", "content": answer['narrative']})
+
+        visualizations = []
+        chart = build_chart(answer)
+        if chart is not None:
+            visualizations.append({
+                'chart': chart,
+                'type': strategy['type'],
+                'description': answer['chart_spec']['title']
+            })
+
+        return {
+            'success': True,
+            'response': answer['narrative'],
+            'visualizations': visualizations,
+            'follow_up_suggestions': self.generate_follow_up_questions(strategy),
+            'strategy': strategy,
+            'route': self.last_route,
+            'data': answer['data']
+        }
+
+    def cached_response(self, cached: Dict[str, Any], strategy: Dict[str, Any]) -> Dict[str, Any]:
+        """Chat result for a question answered from the semantic cache"""
+        print(f"♻️ Model 1: Reusing answer to '{cached['cached_question']}' (similarity {cached['similarity']})")
+        self.last_route = {'tier': 'semantic_cache', 'model': None}
+        self.conversation_history.append({"role": "assistant", "content": cached['response']})
+
+        return {
+            'success': True,
+            'response': cached['response'],
+            'visualizations': [{'chart': as_figure(figure['chart']), 'type': figure['type'],
+                                'description': figure['description']} for figure in cached['figures']],
+            'follow_up_suggestions': cached['follow_up_suggestions'],
+            'strategy': strategy,
+            'route': self.last_route,
+            'cache': {'question': cached['cached_question'], 'similarity': cached['similarity'],
+                      'route': cached['route']}
+        }
+
+    def dataset_key(self) -> str:
+        """Fingerprint of the current data (given by the coordinator, else computed once)"""
+        if self.data_key is None:
+            self.data_key = frame_fingerprint(self.current_data)
+        return self.data_key
+
     def analyze_question_intent(self, question: str) -> Dict[str, Any]:
         """Analyze user question to determine the best response strategy"""
         question_lower = question.lower()
@@ -157,18 +252,25 @@ class DataAnalystChatbot(BaseAgent):
 
         messages.append({"role": "user", "content": guided_question})
 
+        # Simple questions go to a faster tier; large prompts and harder analyses to the stronger model
+        router = get_model_router()
+        route = router.route(strategy, messages)
+        self.last_route = {'tier': route['tier'], 'model': route['model']}
+        print(f"🧭 Model 1: routed {strategy['type']} to {route['tier']} tier ({route['model']})")
+
         # Generate response
+        started = time.monotonic()
+        self.last_response_fallback = False
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                max_tokens=600,
-                temperature=0.1
-            )
+            response = self.create_chat_completion(messages, max_tokens=route['max_tokens'],
+                                                   temperature=0.1, model=route['model'])
+            router.record_latency(route['tier'], time.monotonic() - started)
 
             return response.choices[0].message.content.strip()
 
         except Exception as e:
+            router.record_latency(route['tier'], time.monotonic() - started, success=False)
+            self.last_response_fallback = True
             return self.generate_fallback_response(question, strategy)
 
     def get_analysis_guidance(self, strategy: Dict[str, Any]) -> str:
@@ -239,23 +341,20 @@ class DataAnalystChatbot(BaseAgent):
                         'description': f"Visualization for {question}"
                     } for chart in charts]
 
-            # Always try to create a fallback chart if the main process fails or produces no charts
+            # Always try to create a fallback chart if the main process fails or produces no charts.
+            # The comparison chart is built on the chart pool, and the basic overview only runs when it
+            # fails, runs over budget or finds no columns to compare
             print("🔄 Creating fallback visualization...")
-            fallback_chart = self.create_simple_comparison_chart(question)
-            if fallback_chart:
-                return [{
-                    'chart': fallback_chart,
-                    'type': 'fallback_comparison',
-                    'description': f"Data visualization for {question}"
-                }]
-
-            # If all else fails, create a basic chart
-            basic_chart = self.create_basic_data_chart()
-            if basic_chart:
+            result = get_chart_pool().render([
+                ChartJob(partial(self.build_comparison_chart, question), self.create_basic_data_chart,
+                         name='fallback_comparison')
+            ])[0]
+            if result['figure'] is not None:
+                overview = result['status'] == 'fallback'
                 return [{
-                    'chart': basic_chart,
-                    'type': 'basic_overview',
-                    'description': f"Data overview chart"
+                    'chart': result['figure'],
+                    'type': 'basic_overview' if overview else 'fallback_comparison',
+                    'description': "Data overview chart" if overview else f"Data visualization for {question}"
                 }]
 
         except Exception as e:
@@ -314,7 +413,7 @@ class DataAnalystChatbot(BaseAgent):
 
             # Find appropriate columns based on question
             numeric_cols = self.current_data.select_dtypes(include=['number']).columns.tolist()
-            categorical_cols = self.current_data.select_dtypes(include=['object']).columns.tolist()
+            categorical_cols = self.current_data.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
 
             # Revenue/sales column
             revenue_col = None
@@ -344,7 +443,7 @@ class DataAnalystChatbot(BaseAgent):
 
             if revenue_col and category_col:
                 # Create comparison chart
-                grouped_data = self.current_data.groupby(category_col)[revenue_col].sum().sort_values(ascending=False)
+                grouped_data = group_aggregate(self.current_data, category_col, revenue_col, 'sum').sort_values(ascending=False)
 
                 fig = px.bar(
                     x=grouped_data.index,
@@ -370,6 +469,13 @@ class DataAnalystChatbot(BaseAgent):
 
         return None
 
+    def build_comparison_chart(self, question: str):
+        """Comparison chart for the chart pool; raises when there is none so the pool runs the fallback"""
+        fig = self.create_simple_comparison_chart(question)
+        if fig is None:
+            raise ValueError("no columns to compare")
+        return fig
+
     def create_basic_data_chart(self):
         """Create a basic overview chart when all else fails"""
         try:
@@ -381,7 +487,7 @@ class DataAnalystChatbot(BaseAgent):
 
             # Find the best columns for a basic chart
             numeric_cols = self.current_data.select_dtypes(include=['number']).columns.tolist()
-            categorical_cols = self.current_data.select_dtypes(include=['object']).columns.tolist()
+            categorical_cols = self.current_data.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
 
             if len(numeric_cols) >= 1:
                 # Create a histogram of the first numeric column
@@ -476,7 +582,7 @@ class DataAnalystChatbot(BaseAgent):
 
         # Provide basic data summary
         numeric_cols = self.current_data.select_dtypes(include=['number']).columns
-        categorical_cols = self.current_data.select_dtypes(include=['object']).columns
+        categorical_cols = self.current_data.select_dtypes(include=['object', 'string', 'category']).columns
 
         response = f"""I understand you're asking about: "{question}"
 
@@ -499,6 +605,24 @@ class DataAnalystChatbot(BaseAgent):
 
         return response
 
+    def clone(self) -> 'DataAnalystChatbot':
+        """Independent chatbot with this one's context, data and client but a fresh conversation"""
+        chatbot = DataAnalystChatbot()
+        chatbot.context_prompt = self.context_prompt
+        chatbot.current_data = self.current_data
+        chatbot.data_key = self.data_key
+        chatbot.client = self.client
+        chatbot.viz_agent.client = self.viz_agent.client
+        return chatbot
+
+    def record_feedback(self, positive: bool, route: Dict[str, Any] = None) -> bool:
+        """Stakeholder rating of an answer (default: the latest one), credited to the tier that produced it"""
+        route = route or self.last_route
+        if not route:
+            return False
+        get_model_router().record_feedback(route['tier'], positive)
+        return True
+
     def reset_conversation(self):
         """Reset conversation history"""
         self.conversation_history = []
@@ -1,6 +1,10 @@
 # Model 2: Data Context Analyzer
 from .base_agent import BaseAgent
-from typing import Dict, Any, List
+from .incremental_profile import IncrementalDataProfile
+from .column_sketches import SketchDataProfile
+from .parallel_profiler import get_profiling_executor
+from .correlation_engine import get_correlation_engine
+from typing import Dict, Any, List, Optional
 import pandas as pd
 import numpy as np
 
@@ -12,6 +16,11 @@ class DataContextAnalyzer(BaseAgent):
 
     def __init__(self):
         super().__init__("DataContextAnalyzer", "gpt-3.5-turbo")
+        self.profile = None            # IncrementalDataProfile of the loaded dataset
+        self.potential_date_cols = []  # Text columns that look like dates
+        self.prompt_snapshot = None    # Profile summary the current system prompt was built from
+        self.stats_backend = 'auto'    # 'exact', 'sketch' or 'auto' (sketch above sketch_row_threshold)
+        self.sketch_row_threshold = 1_000_000
 
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Required abstract method implementation - delegates to analyze_data_and_generate_context"""
@@ -50,55 +59,144 @@ class DataContextAnalyzer(BaseAgent):
 
         # Step 4: Generate dynamic system prompt for Model 1
         system_prompt = self.generate_system_prompt(data_profile, key_insights, business_context)
+        self.prompt_snapshot = self.profile.snapshot()
 
         print("✅ Model 2: Context analysis complete, system prompt generated")
         return system_prompt
 
+    def analyze_sample_and_generate_context(self, df: pd.DataFrame, sample_size: int = 20_000, seed: int = 42) -> str:
+        """
+        Fast path: builds a provisional system prompt from a stratified sample so Model 1 can
+        start answering while the exact profile is computed. Statistics carry 95% error bounds.
+        Does not touch the exact profile used for incremental appends.
+        """
+        print(f"⚡ Model 2: Profiling a stratified sample of {min(sample_size, len(df))} / {len(df)} rows...")
+
+        sample, strata_col = self.stratified_sample(df, sample_size, seed)
+        sample_profile = IncrementalDataProfile.from_dataframe(sample)
+        data_profile = sample_profile.to_data_profile(self.detect_potential_date_columns(sample))
+
+        # Scale counts back to the full dataset
+        scale = len(df) / len(sample) if len(sample) else 1.0
+        data_profile['total_rows'] = len(df)
+        for info in data_profile['categorical_analysis'].values():
+            info['top_values'] = {value: int(round(count * scale)) for value, count in info['top_values'].items()}
+
+        sampling = {
+            'sample_rows': len(sample),
+            'total_rows': len(df),
+            'strata_column': strata_col,
+            'error_bounds': self.estimate_error_bounds(sample_profile, len(df))
+        }
+
+        key_insights = self.extract_key_insights(sample)
+        business_context = self.detect_business_context(df)  # column names and dtypes only
+
+        system_prompt = self.generate_system_prompt(data_profile, key_insights, business_context, sampling)
+        print("✅ Model 2: Provisional context ready")
+        return system_prompt
+
+    def stratified_sample(self, df: pd.DataFrame, sample_size: int, seed: int = 42):
+        """Proportional stratified sample over a low-cardinality categorical column (random if none)"""
+        if len(df) <= sample_size:
+            return df, None
+
+        # Pick the strata column from a small probe instead of a full nunique scan
+        probe = df.sample(n=min(2000, len(df)), random_state=seed)
+        strata_col = None
+        for col in probe.select_dtypes(include=['object', 'string', 'category']).columns:
+            if 2 <= probe[col].nunique() <= 50:
+                strata_col = col
+                break
+
+        fraction = sample_size / len(df)
+        if strata_col is None:
+            return df.sample(n=sample_size, random_state=seed), None
+
+        sample = df.groupby(strata_col, group_keys=False, observed=True, dropna=False).sample(frac=fraction, random_state=seed)
+        return sample, strata_col
+
+    def estimate_error_bounds(self, sample_profile: IncrementalDataProfile, population_rows: int, z: float = 1.96) -> Dict[str, Any]:
+        """95% confidence half-widths for sampled means and top-category shares"""
+        sample_rows = sample_profile.total_rows
+        # Finite population correction: the bounds shrink to zero as the sample covers the data
+        fpc = np.sqrt(max(population_rows - sample_rows, 0) / max(population_rows - 1, 1))
+
+        bounds = {'means': {}, 'top_shares': {}}
+        for col, stats in sample_profile.numeric_stats.items():
+            if stats.count > 1:
+                bounds['means'][col] = float(z * stats.std / np.sqrt(stats.count) * fpc)
+
+        for col in sample_profile.categorical_columns:
+            top = sample_profile.top_values(col, 1)
+            if top and sample_rows:
+                share = next(iter(top.values())) / sample_rows
+                bounds['top_shares'][col] = {
+                    'share': float(share),
+                    'margin': float(z * np.sqrt(share * (1 - share) / sample_rows) * fpc)
+                }
+        return bounds
+
+    def update_context(self, new_rows: pd.DataFrame, full_df: pd.DataFrame, tolerance: float = 0.05) -> Optional[str]:
+        """
+        Fold appended rows into the running profile. Returns a regenerated system prompt
+        when the summary moved materially, otherwise None (the current prompt stays valid).
+        """
+        if self.profile is None:
+            return self.analyze_data_and_generate_context(full_df)
+
+        self.profile.update(new_rows)
+
+        if not self.profile.has_material_change(self.prompt_snapshot, tolerance):
+            print(f"📎 Model 2: Appended {len(new_rows)} rows, summary unchanged - keeping system prompt")
+            return None
+
+        print(f"🔍 Model 2: Appended {len(new_rows)} rows moved the summary, regenerating context...")
+        data_profile = self.profile.to_data_profile(self.potential_date_cols)
+        key_insights = self.extract_key_insights(full_df)
+        business_context = self.detect_business_context(full_df)
+
+        system_prompt = self.generate_system_prompt(data_profile, key_insights, business_context)
+        self.prompt_snapshot = self.profile.snapshot()
+        return system_prompt
+
     def analyze_data_structure(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Analyze basic data structure and characteristics"""
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-        categorical_cols = df.select_dtypes(include=['object', 'string']).columns.tolist()
-        date_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
-
-        # Try to detect date columns that aren't properly typed
+        potential_date_cols = self.detect_potential_date_columns(df)
+
+        # Numeric moments and categorical counts are kept in a mergeable profile so
+        # appended rows can update them without rescanning the whole dataset.
+        # Large datasets use fixed-memory sketches computed chunk by chunk.
+        # Wide tables are profiled column-partitioned across a process pool.
+        executor = get_profiling_executor()
+        if self.use_sketch_backend(df):
+            self.profile = SketchDataProfile.from_dataframe(df)
+        elif executor.should_parallelize(df):
+            self.profile = executor.build_profile(df)
+        else:
+            self.profile = IncrementalDataProfile.from_dataframe(df)
+        self.potential_date_cols = potential_date_cols
+
+        return self.profile.to_data_profile(potential_date_cols)
+
+    def detect_potential_date_columns(self, df: pd.DataFrame) -> List[str]:
+        """Try to detect date columns that aren't properly typed"""
         potential_date_cols = []
-        for col in categorical_cols:
+        for col in df.select_dtypes(include=['object', 'string', 'category']).columns:
             if any(keyword in col.lower() for keyword in ['date', 'time', 'year', 'month']):
                 # Sample a few values to check if they look like dates
                 sample_vals = df[col].dropna().head(3).astype(str).tolist()
                 if any(self.looks_like_date(val) for val in sample_vals):
                     potential_date_cols.append(col)
+        return potential_date_cols
 
-        # Analyze numeric columns
-        numeric_analysis = {}
-        for col in numeric_cols:
-            numeric_analysis[col] = {
-                'min': float(df[col].min()),
-                'max': float(df[col].max()),
-                'mean': float(df[col].mean()),
-                'std': float(df[col].std()),
-                'missing_pct': float(df[col].isnull().sum() / len(df) * 100)
-            }
-
-        # Analyze categorical columns
-        categorical_analysis = {}
-        for col in categorical_cols:
-            top_values = df[col].value_counts().head(5)
-            categorical_analysis[col] = {
-                'unique_count': df[col].nunique(),
-                'top_values': top_values.to_dict(),
-                'missing_pct': float(df[col].isnull().sum() / len(df) * 100)
-            }
-
-        return {
-            'total_rows': len(df),
-            'total_columns': len(df.columns),
-            'numeric_columns': numeric_cols,
-            'categorical_columns': categorical_cols,
-            'date_columns': date_cols + potential_date_cols,
-            'numeric_analysis': numeric_analysis,
-            'categorical_analysis': categorical_analysis
-        }
+    def use_sketch_backend(self, df: pd.DataFrame) -> bool:
+        """Decide between exact and sketch-based column statistics"""
+        if self.stats_backend == 'sketch':
+            return True
+        if self.stats_backend == 'exact':
+            return False
+        return len(df) >= self.sketch_row_threshold
 
     def extract_key_insights(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Extract key patterns and insights from the data"""
@@ -117,21 +215,15 @@ class DataContextAnalyzer(BaseAgent):
 
         # Find correlations between numeric variables
         if len(numeric_cols) >= 2:
-            corr_matrix = df[numeric_cols].corr()
-            strong_correlations = []
-
-            for i in range(len(numeric_cols)):
-                for j in range(i+1, len(numeric_cols)):
-                    col1, col2 = numeric_cols[i], numeric_cols[j]
-                    corr_val = corr_matrix.loc[col1, col2]
-                    if abs(corr_val) > 0.5:
-                        strong_correlations.append({
-                            'columns': [col1, col2],
-                            'correlation': float(corr_val),
-                            'strength': 'strong' if abs(corr_val) > 0.7 else 'moderate'
-                        })
-
-            insights['correlations'] = strong_correlations
+            correlation = get_correlation_engine().correlation(df)
+            insights['correlations'] = [
+                {
+                    'columns': [col1, col2],
+                    'correlation': corr_val,
+                    'strength': 'strong' if abs(corr_val) > 0.7 else 'moderate'
+                }
+                for col1, col2, corr_val in correlation.strong_pairs(0.5)
+            ]
 
         # Analyze trends if date columns exist
         date_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
@@ -198,14 +290,14 @@ class DataContextAnalyzer(BaseAgent):
 
         # Identify metrics and dimensions
         numeric_cols = df.select_dtypes(include=['number']).columns
-        categorical_cols = df.select_dtypes(include=['object']).columns
+        categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
 
         context['metrics'] = numeric_cols.tolist()
         context['dimensions'] = categorical_cols.tolist()
 
         return context
 
-    def generate_system_prompt(self, data_profile: Dict, insights: Dict, business_context: Dict) -> str:
+    def generate_system_prompt(self, data_profile: Dict, insights: Dict, business_context: Dict, sampling: Optional[Dict] = None) -> str:
         """Generate dynamic system prompt for Model 1 (Data Analyst Chatbot)"""
 
         # Build comprehensive system prompt
@@ -250,6 +342,10 @@ Key dimensions: {', '.join(business_context['dimensions'][:5])}
                 top_val = list(info['top_values'].keys())[0] if info['top_values'] else 'N/A'
                 system_prompt += f"- **{col}**: {info['unique_count']} categories, most common is '{top_val}'\n"
 
+        # Flag sampled statistics so Model 1 communicates their uncertainty
+        if sampling:
+            system_prompt += self.describe_sampling(sampling)
+
         # Add behavioral instructions
         system_prompt += f"""
 
@@ -284,6 +380,21 @@ Remember: You have full access to this {business_context['domain']} dataset and
 
         return system_prompt
 
+    def describe_sampling(self, sampling: Dict) -> str:
+        """Prompt section explaining that the statistics above are sample estimates"""
+        strata = f", stratified by {sampling['strata_column']}" if sampling.get('strata_column') else ""
+        section = f"""
+**Provisional Profile (sample-based):**
+- Statistics above are estimated from {sampling['sample_rows']:,} of {sampling['total_rows']:,} rows{strata}; category counts are scaled estimates
+- When quoting these figures, present them as approximate (95% margins below); exact values will replace them shortly
+"""
+        error_bounds = sampling.get('error_bounds', {})
+        for col, margin in list(error_bounds.get('means', {}).items())[:3]:
+            section += f"- **{col}** average: ±{margin:.3g}\n"
+        for col, share in list(error_bounds.get('top_shares', {}).items())[:2]:
+            section += f"- **{col}** top category share: {share['share'] * 100:.1f}% ±{share['margin'] * 100:.1f} pts\n"
+        return section
+
     def looks_like_date(self, value: str) -> bool:
         """Simple heuristic to check if a string looks like a date"""
         date_patterns = ['-', '/', '2019', '2020', '2021', '2022', '2023', '2024']
@@ -0,0 +1,199 @@
+# Data Preview
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import threading
+import numpy as np
+import pandas as pd
+from .incremental_profile import IncrementalDataProfile
+from .column_sketches import approximate_unique_counts
+from .dataset_store import get_dataset_store
+
+FILTER_OPERATORS = ('>=', '<=', '!=', '>', '<', '=')
+
+
+def parse_filter(series: pd.Series, expression: str) -> pd.Series:
+    """
+    Boolean mask for a filter expression on one column.
+    Numeric and date columns: '>100', '<=2024-06-30', '=3', '!=0', '10..20' (inclusive), or a value.
+    Other columns: case-insensitive substring match.
+    """
+    expression = expression.strip()
+    is_date = pd.api.types.is_datetime64_any_dtype(series)
+    if not (pd.api.types.is_numeric_dtype(series) or is_date) or pd.api.types.is_bool_dtype(series):
+        return series.astype(str).str.contains(expression, case=False, regex=False, na=False)
+
+    def convert(value: str):
+        value = value.strip()
+        try:
+            return pd.Timestamp(value) if is_date else float(value)
+        except ValueError:
+            raise ValueError(f"'{value}' is not a valid {'date' if is_date else 'number'} for {series.name}")
+
+    if '..' in expression:
+        low, high = expression.split('..', 1)
+        return series.between(convert(low), convert(high))
+    for operator in FILTER_OPERATORS:
+        if expression.startswith(operator):
+            value = convert(expression[len(operator):])
+            return {
+                '>=': series >= value, '<=': series <= value, '!=': series != value,
+                '>': series > value, '<': series < value, '=': series == value
+            }[operator]
+    return series == convert(expression)
+
+
+class DataPreview:
+    """
+    Paged, sorted and filtered access to one dataset. Only the requested page is materialised;
+    row orderings (filter + sort) and the column summary are computed once and cached, so
+    paging and reruns don't rescan the frame.
+    """
+
+    def __init__(self, df: pd.DataFrame, profile: Optional[IncrementalDataProfile] = None, max_cached_orders: int = 8):
+        self.df = df
+        self.max_cached_orders = max_cached_orders
+        self._profile = profile if self.profile_matches(profile) else None
+        self._orders: 'OrderedDict[Tuple, np.ndarray]' = OrderedDict()
+        self._column_info = None
+        self._summary = None
+        self._lock = threading.Lock()
+
+    def profile_matches(self, profile: Optional[IncrementalDataProfile]) -> bool:
+        """A profile can only stand in for the data if it covers exactly these rows and columns"""
+        return profile is not None and profile.total_rows == len(self.df) and profile.columns == list(self.df.columns)
+
+    @property
+    def profile(self) -> IncrementalDataProfile:
+        if self._profile is None:
+            self._profile = IncrementalDataProfile.from_dataframe(self.df)
+        return self._profile
+
+    def summary(self) -> Dict[str, int]:
+        """Rows, columns, numeric columns and missing values, taken from the profile"""
+        with self._lock:
+            if self._summary is None:
+                self._summary = {
+                    'rows': len(self.df),
+                    'columns': len(self.df.columns),
+                    'numeric_columns': len(self.profile.numeric_columns),
+                    'missing_values': int(self.column_info()['Missing'].sum())
+                }
+            return self._summary
+
+    def column_info(self) -> pd.DataFrame:
+        """Type, non-null and distinct counts per column; profiled columns are not rescanned"""
+        if self._column_info is not None:
+            return self._column_info
+
+        profile = self.profile
+        rows = len(self.df)
+        missing: Dict[str, int] = {}
+        for col, stats in profile.numeric_stats.items():
+            missing[col] = stats.missing
+        missing.update(profile.category_missing)
+        for col, date_range in profile.date_ranges.items():
+            missing[col] = date_range['missing']
+
+        # Columns the profile keeps no distinct count for (numeric/date/bool of an exact profile)
+        distinct_from_profile = set(profile.categorical_columns) | set(getattr(profile, 'distinct', {}))
+        uncounted = [col for col in self.df.columns if col not in distinct_from_profile]
+        counted = approximate_unique_counts(self.df[uncounted]) if uncounted else {}
+        for col in self.df.columns:
+            if col not in missing:
+                missing[col] = int(self.df[col].isnull().sum())
+
+        self._column_info = pd.DataFrame({
+            'Column': list(self.df.columns),
+            'Type': [str(dtype) for dtype in self.df.dtypes],
+            'Non-Null Count': [rows - missing[col] for col in self.df.columns],
+            'Missing': [missing[col] for col in self.df.columns],
+            'Unique Values': [counted[col] if col in counted else profile.unique_count(col) for col in self.df.columns]
+        })
+        return self._column_info
+
+    def row_order(self, filters: Optional[Dict[str, str]] = None, sort_by: Optional[str] = None,
+                  ascending: bool = True) -> np.ndarray:
+        """Positions of the filtered rows in display order (cached per filter/sort combination)"""
+        filters = {col: expr for col, expr in (filters or {}).items() if expr and str(expr).strip()}
+        key = (tuple(sorted(filters.items())), sort_by, ascending)
+        with self._lock:
+            if key in self._orders:
+                self._orders.move_to_end(key)
+                return self._orders[key]
+
+        for col in list(filters) + ([sort_by] if sort_by else []):
+            if col not in self.df.columns:
+                raise KeyError(f"Unknown column: {col}")
+
+        positions = np.arange(len(self.df))
+        if filters:
+            mask = np.ones(len(self.df), dtype=bool)
+            for col, expression in filters.items():
+                mask &= parse_filter(self.df[col], str(expression)).to_numpy(dtype=bool, na_value=False)
+            positions = positions[mask]
+
+        if sort_by:
+            values = self.df[sort_by].iloc[positions].reset_index(drop=True)
+            order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+            positions = positions[order]
+
+        with self._lock:
+            self._orders[key] = positions
+            while len(self._orders) > self.max_cached_orders:
+                self._orders.popitem(last=False)
+        return positions
+
+    def page(self, page: int = 0, page_size: int = 25, sort_by: Optional[str] = None, ascending: bool = True,
+             filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """One page of rows plus paging metadata"""
+        positions = self.row_order(filters, sort_by, ascending)
+        page_size = max(1, int(page_size))
+        pages = max(1, -(-len(positions) // page_size))
+        page = min(max(0, int(page)), pages - 1)
+        start = page * page_size
+        return {
+            'data': self.df.iloc[positions[start:start + page_size]],
+            'page': page,
+            'pages': pages,
+            'page_size': page_size,
+            'start': start,
+            'matching_rows': len(positions),
+            'total_rows': len(self.df)
+        }
+
+
+_previews: 'OrderedDict[str, DataPreview]' = OrderedDict()
+_previews_lock = threading.Lock()
+_listening = False
+
+
+def drop_data_preview(key: str):
+    """Forget the preview of a dataset (called when the dataset store evicts it)"""
+    with _previews_lock:
+        _previews.pop(key, None)
+
+
+def get_data_preview(df: pd.DataFrame, key: str, profile: Optional[IncrementalDataProfile] = None,
+                     max_previews: int = 16) -> DataPreview:
+    """
+    Preview shared by every session showing the dataset with this key (dataset store fingerprint).
+    Previews live only as long as their dataset is in the store, so they never keep an evicted
+    frame alive; a dataset the store doesn't hold gets an uncached preview.
+    """
+    global _listening
+    store = get_dataset_store()
+    if not store.contains(key):
+        return DataPreview(df, profile)
+    with _previews_lock:
+        if not _listening:
+            store.add_evict_listener(drop_data_preview)
+            _listening = True
+        preview = _previews.get(key)
+        if preview is None:
+            preview = _previews[key] = DataPreview(df, profile)
+            while len(_previews) > max_previews:
+                _previews.popitem(last=False)
+        elif preview._profile is None and preview.profile_matches(profile):
+            preview._profile = profile  # A profile computed meanwhile (e.g. by Model 2) saves a rescan
+        _previews.move_to_end(key)
+        return preview
@@ -0,0 +1,207 @@
+# Shared Dataset Store
+from typing import Dict, Any, Optional, List, Callable
+from collections import OrderedDict
+import os
+import threading
+import weakref
+import pandas as pd
+from .fingerprint import frame_fingerprint
+
+
+def enable_copy_on_write():
+    """
+    Turn on pandas copy-on-write (always on in pandas 3, opt-in on 2.x). Called by the app entry
+    points rather than on import, since it changes pandas behaviour for the whole process
+    """
+    if not copy_on_write():
+        pd.set_option("mode.copy_on_write", True)
+
+
+def copy_on_write() -> bool:
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.get_option("mode.copy_on_write") is True
+
+
+def shared_view(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    A frame that can be modified without touching `df`. Under copy-on-write only the columns
+    written to get copied; without it (pandas 2.x in a host that didn't opt in) it is a deep copy
+    """
+    return df.copy(deep=not copy_on_write())
+
+
+class DatasetHandle:
+    """A session's reference to a dataset in the store; released explicitly or when garbage collected"""
+
+    def __init__(self, store: 'DatasetStore', key: str):
+        self.key = key
+        self._store = store
+        self._view = None
+        self._finalizer = weakref.finalize(self, store._release, key)
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """This handle's view of the shared frame (no data is copied under copy-on-write)"""
+        if self._view is None:
+            self._view = self._store._view(self.key)
+        return self._view
+
+    @property
+    def released(self) -> bool:
+        return not self._finalizer.alive
+
+    def release(self):
+        self._view = None
+        self._finalizer()  # Runs at most once
+
+
+class DatasetStore:
+    """
+    Process-wide store holding one copy of each distinct dataset, keyed by content fingerprint.
+    Sessions hold DatasetHandles; datasets nobody references are kept in an LRU up to
+    `max_idle_bytes` so a re-upload or new session of the same file is still a hit.
+    """
+
+    def __init__(self, max_idle_bytes: Optional[int] = None):
+        self.max_idle_bytes = max_idle_bytes if max_idle_bytes is not None else \
+            int(os.getenv("DATASET_STORE_IDLE_BYTES", str(1 << 30)))
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._sizes: Dict[str, int] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._idle: 'OrderedDict[str, None]' = OrderedDict()   # unreferenced keys, oldest first
+        self._views: 'weakref.WeakValueDictionary[int, pd.DataFrame]' = weakref.WeakValueDictionary()
+        self._view_keys: Dict[int, str] = {}
+        self._evict_listeners: List[Callable[[str], None]] = []
+        self._lock = threading.RLock()
+
+    def add_evict_listener(self, callback: Callable[[str], None]):
+        """Call callback(key) whenever a dataset leaves the store, so caches built on it go too"""
+        with self._lock:
+            self._evict_listeners.append(callback)
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._frames
+
+    def put(self, df: pd.DataFrame) -> DatasetHandle:
+        """Store df (or find the identical dataset already stored) and return a handle to it"""
+        key = self._key_of_view(df)
+        if key is None:
+            key = frame_fingerprint(df)
+
+        with self._lock:
+            if key not in self._frames:
+                # The store keeps its own frame so later writes to `df` don't leak in
+                self._frames[key] = shared_view(df)
+                self._sizes[key] = int(df.memory_usage(index=True, deep=True).sum())
+                self._refcounts[key] = 0
+                print(f"🗄️ Dataset store: added {len(df)} rows ({self._sizes[key] / 1e6:.1f} MB)")
+            return self._acquire_locked(key)
+
+    def find(self, df: pd.DataFrame) -> Optional[DatasetHandle]:
+        """New handle for a frame this store handed out (recognised without hashing), else None"""
+        with self._lock:
+            key = self._key_of_view(df)
+            return self._acquire_locked(key) if key is not None else None
+
+    def acquire(self, key: str) -> Optional[DatasetHandle]:
+        """New handle for an already stored dataset, or None if it was evicted"""
+        with self._lock:
+            if key not in self._frames:
+                return None
+            return self._acquire_locked(key)
+
+    def _acquire_locked(self, key: str) -> DatasetHandle:
+        self._refcounts[key] += 1
+        self._idle.pop(key, None)
+        return DatasetHandle(self, key)
+
+    def _release(self, key: str):
+        evicted = []
+        with self._lock:
+            if key not in self._refcounts:
+                return
+            self._refcounts[key] -= 1
+            if self._refcounts[key] <= 0:
+                self._idle[key] = None
+                evicted = self._evict_idle()
+            listeners = list(self._evict_listeners)
+        # Listeners run outside the store lock (they take their own locks)
+        for evicted_key in evicted:
+            for callback in listeners:
+                callback(evicted_key)
+
+    def _evict_idle(self) -> List[str]:
+        evicted = []
+        idle_bytes = sum(self._sizes[key] for key in self._idle)
+        while self._idle and idle_bytes > self.max_idle_bytes:
+            key, _ = self._idle.popitem(last=False)
+            idle_bytes -= self._sizes[key]
+            del self._frames[key], self._sizes[key], self._refcounts[key]
+            evicted.append(key)
+            print(f"🗄️ Dataset store: evicted idle dataset {key[:8]}")
+        return evicted
+
+    def _view(self, key: str) -> pd.DataFrame:
+        with self._lock:
+            view = shared_view(self._frames[key])
+            self._views[id(view)] = view
+            self._view_keys[id(view)] = key
+            weakref.finalize(view, self._forget_view, id(view))
+            return view
+
+    def _forget_view(self, view_id: int):
+        with self._lock:
+            self._view_keys.pop(view_id, None)
+
+    def _key_of_view(self, df: pd.DataFrame) -> Optional[str]:
+        """Frames handed out by this store are recognised without re-hashing them"""
+        with self._lock:
+            if self._views.get(id(df)) is not df:
+                return None
+            key = self._view_keys.get(id(df))
+            frame = self._frames.get(key)
+            # A view that gained or lost columns/rows since it was handed out is a new dataset
+            if frame is None or df.shape != frame.shape or not df.columns.equals(frame.columns):
+                return None
+            return key
+
+    def key_of(self, df: pd.DataFrame) -> Optional[str]:
+        """Key of the stored dataset df is a view of, or None"""
+        return self._key_of_view(df)
+
+    def is_stored(self, df: pd.DataFrame) -> bool:
+        """Whether df is a view of a stored dataset (its memory is accounted here, not by the caller)"""
+        return self._key_of_view(df) is not None
+
+    def memory(self) -> Dict[str, Dict[str, Any]]:
+        """Deep size, rows and open handles per stored dataset"""
+        with self._lock:
+            return {
+                key[:12]: {'bytes': self._sizes[key], 'rows': len(self._frames[key]), 'handles': self._refcounts[key]}
+                for key in self._frames
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'datasets': len(self._frames),
+                'referenced': sum(1 for count in self._refcounts.values() if count > 0),
+                'handles': sum(self._refcounts.values()),
+                'bytes': sum(self._sizes.values()),
+                'idle_bytes': sum(self._sizes[key] for key in self._idle)
+            }
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_dataset_store() -> DatasetStore:
+    """Process-wide store shared by every session"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = DatasetStore()
+        return _default_store
@@ -0,0 +1,187 @@
+# Dtype Optimizer
+"""
+Shrinks loaded frames without changing their values:
+- integers stay int64 by default: numpy arithmetic wraps silently, and the product of two
+  int32 columns overflows long before their values look large. min_int_bits=32 (or lower)
+  opts into narrowing; floats stay float64 unless downcast_floats is set, since float32 sums
+  accumulate in float32, and then only where every value survives the round trip
+- low-cardinality text becomes `category`, the remaining text pyarrow-backed strings
+- true/false text becomes bool, and date text (with a 4-digit year) is parsed once into datetime64
+"""
+from typing import Dict, Any, Optional, Tuple
+import warnings
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 - only needed for the arrow-backed string dtype
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+INTEGER_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+# Text only counts as dates with a 4-digit year in every value, and years in this range.
+# Without it time-of-day text ("10:30") parses as today and sizes or ranges ("1/2", "3-4")
+# as dates in year 1
+YEAR_PATTERN = r'(?<!\d)\d{4}(?!\d)'
+DATE_YEARS = (1900, 2100)
+
+
+def arrow_string_dtype():
+    """pyarrow-backed strings with NaN as missing value (the pandas 3 default), or None without pyarrow"""
+    if not HAS_PYARROW:
+        return None
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:
+        try:
+            return pd.StringDtype('pyarrow_numpy')  # pandas 2.1 / 2.2 spelling
+        except (TypeError, ValueError):
+            return None
+
+
+def observed_counts(values: pd.Series) -> pd.Series:
+    """value_counts that treats category columns like text: no zero-count categories, plain index"""
+    counts = values.value_counts()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        counts = counts[counts > 0]
+        counts.index = pd.Index(counts.index.astype(values.dtype.categories.dtype), name=counts.index.name)
+    return counts
+
+
+def concat_rows(reference: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+    """pd.concat that keeps category columns categorical when the new rows bring new categories"""
+    reference = reference.copy(deep=False)
+    new_rows = new_rows.copy(deep=False)
+    for col in reference.columns:
+        if isinstance(reference[col].dtype, pd.CategoricalDtype) and col in new_rows.columns:
+            extra = pd.Index(new_rows[col].dropna().unique()).difference(reference[col].cat.categories)
+            categories = reference[col].cat.categories.append(extra) if len(extra) else reference[col].cat.categories
+            if len(extra):
+                reference[col] = reference[col].cat.set_categories(categories)
+            new_rows[col] = new_rows[col].astype(pd.CategoricalDtype(categories))
+    return pd.concat([reference, new_rows], ignore_index=True)
+
+
+def _downcast_integer(values: pd.Series, min_bits: int) -> Optional[Any]:
+    """Narrowest integer dtype (at least min_bits wide) holding every value, or None if none is narrower"""
+    if values.isnull().all():
+        return None
+    current_bits = values.dtype.itemsize * 8
+    low, high = values.min(), values.max()
+    for dtype in INTEGER_TYPES:
+        info = np.iinfo(dtype)
+        if min_bits <= info.bits < current_bits and info.min <= low and high <= info.max:
+            # Nullable integer columns stay nullable
+            return f"Int{info.bits}" if pd.api.types.is_extension_array_dtype(values) else dtype
+    return None
+
+
+def _downcast_float(values: pd.Series) -> Optional[Any]:
+    if values.dtype != np.float64:
+        return None
+    array = values.to_numpy()
+    finite = np.isfinite(array)
+    narrowed = array.astype(np.float32)
+    if not np.all(np.abs(array[finite]) <= np.finfo(np.float32).max):
+        return None
+    return np.float32 if np.array_equal(narrowed.astype(np.float64), array, equal_nan=True) else None
+
+
+def _is_date_sample(sample: pd.Series) -> bool:
+    """Whether the (non-empty, str) sample values all look like and parse as dates"""
+    if sample.empty or sample.str.fullmatch(r'[+-]?\d+(\.\d+)?').all() or not sample.str.contains(YEAR_PATTERN).all():
+        return False  # Numeric codes aren't dates, and neither are times, sizes or words like "March"
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return not pd.to_datetime(sample, errors='coerce').isnull().any()
+
+
+def _parse_dates(values: pd.Series, sample_size: int = 1000) -> Optional[pd.Series]:
+    """The column as datetime64 if every non-empty value parses as a date, else None"""
+    # Most text columns are rejected on their first values, before any pass over the whole column
+    head = values.iloc[:sample_size]
+    head = head[head.notnull()].astype(str)
+    head = head[head.str.strip() != '']
+    if not head.empty and not _is_date_sample(head):
+        return None
+
+    text = values.astype(str)
+    present_mask = values.notnull() & (text.str.strip() != '')
+    present = text[present_mask]
+    if present.empty or (head.empty and not _is_date_sample(present.iloc[:sample_size])):
+        return None
+    if not present.str.contains(YEAR_PATTERN).all():
+        return None  # Every value (not just the sample) carries a year
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        parsed = pd.to_datetime(values.where(present_mask), errors='coerce')
+    if parsed.notnull().sum() != len(present):
+        return None
+    years = parsed.dt.year
+    return parsed if DATE_YEARS[0] <= years.min() and years.max() <= DATE_YEARS[1] else None
+
+
+def optimize_dtypes(df: pd.DataFrame, category_ratio: float = 0.5, max_categories: int = 100_000,
+                    min_int_bits: int = 64, downcast_floats: bool = False,
+                    parse_dates: bool = True) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Compact dtypes for df. Returns the optimized frame (df itself when nothing changes) and a
+    report with memory before/after and the conversion of each changed column.
+    """
+    memory_before = int(df.memory_usage(index=True, deep=True).sum())
+    string_dtype = arrow_string_dtype()
+    rows = len(df)
+    converted: Dict[str, pd.Series] = {}
+    conversions: Dict[str, str] = {}
+
+    for col in df.columns:
+        values = df[col]
+        dtype = values.dtype
+        new_values = None
+
+        if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype) \
+                or pd.api.types.is_datetime64_any_dtype(dtype):
+            continue
+        elif pd.api.types.is_integer_dtype(dtype):
+            target = _downcast_integer(values, min_int_bits)
+            new_values = values.astype(target) if target is not None else None
+        elif pd.api.types.is_float_dtype(dtype) and downcast_floats:
+            target = _downcast_float(values)
+            new_values = values.astype(target) if target is not None else None
+        elif not pd.api.types.is_numeric_dtype(dtype) and pd.api.types.infer_dtype(values, skipna=True) == 'string':
+            unique_count = values.nunique(dropna=True)
+            # Only a column of at most two distinct values can be true/false text
+            lowered = {str(value).lower() for value in values.dropna().unique()} if unique_count <= 2 else set()
+            if lowered and lowered <= {'true', 'false'} and not values.isnull().any():
+                new_values = values.astype(str).str.lower() == 'true'
+            elif parse_dates:
+                new_values = _parse_dates(values)
+            if new_values is None and rows and unique_count <= max_categories and unique_count <= rows * category_ratio:
+                new_values = values.astype('category')
+            elif new_values is None and string_dtype is not None and dtype != string_dtype:
+                new_values = values.astype(string_dtype)
+
+        if new_values is not None:
+            converted[col] = new_values
+            conversions[str(col)] = f"{dtype} -> {new_values.dtype}"
+
+    if not converted:
+        optimized = df
+    else:
+        optimized = df.copy(deep=False)
+        for col, new_values in converted.items():
+            optimized[col] = new_values
+
+    memory_after = int(optimized.memory_usage(index=True, deep=True).sum())
+    report = {
+        'memory_before': memory_before,
+        'memory_after': memory_after,
+        'reduction': round(memory_before / memory_after, 2) if memory_after else None,
+        'conversions': conversions
+    }
+    if conversions:
+        print(f"🗜️ Dtypes optimized: {memory_before / 1e6:.1f} MB -> {memory_after / 1e6:.1f} MB "
+              f"({len(conversions)} columns)")
+    return optimized, report
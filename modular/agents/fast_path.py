@@ -0,0 +1,358 @@
+# Deterministic Fast Path
+"""
+Answers fully specified questions ("top 5 products by sales", "average discount by region",
+"total revenue", "how many orders") straight from pandas with a template narrative.
+Once the columns, aggregation, ranking and grouping words are taken out, only the words in
+STOP_WORDS may be left; anything else ("were returned", "unless cancelled") means an open-ended,
+filtered or ambiguous question, which returns None and goes to the LLM as before.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+import re
+import pandas as pd
+from .aggregation_engine import group_aggregate
+from .top_n import top_n, top_positions, top_values_per_group
+
+AGGREGATION_WORDS = [
+    (r'\b(?:average|mean|avg)\b', 'mean'),
+    (r'\bmedian\b', 'median'),
+    (r'\b(?:total|sum)\b', 'sum'),
+    (r'\b(?:minimum|min)\b', 'min'),
+    (r'\b(?:maximum|max)\b', 'max'),
+    (r'\b(?:how many|number of|count)\b', 'count'),
+]
+AGGREGATION_LABELS = {'mean': 'Average', 'median': 'Median', 'sum': 'Total', 'min': 'Minimum',
+                      'max': 'Maximum', 'count': 'Count'}
+
+RANKING_PATTERN = re.compile(r'\b(top|bottom|highest|lowest|best|worst|largest|smallest|most|least)\b(?:\s+(\d+))?')
+DESCENDING_WORDS = {'top', 'highest', 'best', 'largest', 'most'}
+
+# Questions that need reasoning, filtering or time handling are left to the LLM
+OPEN_ENDED_PATTERN = re.compile(
+    r'\b(?:why|how come|explain|insight|recommend|should|suggest|trend|over time|season|forecast|predict|'
+    r'correlat|relationship|compare|comparison|versus|vs|difference|cause|impact|drive|driver|improve|'
+    r'strategy|anomal|outlier|growth|change|where|only|except|excluding|between|above|below|greater|less than|'
+    r'more than|after|before|during|since|last|previous|this|per cent|percentage|ratio|share)'
+)
+
+GROUP_WORDS = re.compile(r'\b(?:by|per|for each|for every|across|in each)\b')
+
+# Words a fully specified question may contain besides its columns, aggregation, ranking and grouping
+STOP_WORDS = {
+    'what', "what's", 'whats', 'which', 'who', 'how', 'is', 'are', 'was', 'were', 'do', 'does', 'has', 'have',
+    'the', 'a', 'an', 'of', 'in', 'for', 'each', 'every', 'within', 'all', 'overall', 'and',
+    'show', 'list', 'give', 'get', 'find', 'tell', 'display', 'calculate', 'compute', 'me', 'us', 'please',
+    'can', 'could', 'you', 'i', 'we', 'our', 'my', 'there',
+    'value', 'values', 'record', 'records', 'row', 'rows', 'entry', 'entries', 'data', 'dataset', 'table',
+    # Nouns for "a row" in count questions ("how many orders")
+    'order', 'orders', 'transaction', 'transactions',
+}
+
+# "top 3 products per region": the words naming the dimension each ranking is made within
+PER_GROUP_PATTERN = re.compile(r'\b(?:per|for each|for every|in each|within each)\s+(\w+(?:\s\w+)?)')
+
+# "average sales in North", "total units for laptops": a category value filter we don't parse
+VALUE_FILTER_PATTERN = re.compile(
+    r'\b(?:in|for|from|at|on|of|with|without)\s+'
+    r'(?!(?:the\s+)?(?:data|dataset|table|file|records|rows|each|every|all|by|per|across|(?:for|in)\s+(?:each|every))\b)\w+'
+)
+
+
+def _format_number(value: Any) -> str:
+    if pd.isna(value):
+        return "n/a"
+    value = float(value)
+    if value.is_integer() and abs(value) < 1e15:
+        return f"{value:,.0f}"
+    return f"{value:,.2f}"
+
+
+def _normalise(text: str) -> str:
+    return ' '.join(re.sub(r'[_\-]+', ' ', str(text).lower()).split())
+
+
+def _aliases(column: str) -> List[str]:
+    """Ways a question may name a column: 'Unit_Price' -> unit price / unit prices ..."""
+    name = _normalise(column)
+    aliases = {name}
+    if name.endswith('ies'):
+        aliases.add(name[:-3] + 'y')
+    elif name.endswith('s'):
+        aliases.add(name[:-1])
+    else:
+        aliases.update({name + 's', name + 'es'})
+        if name.endswith('y'):
+            aliases.add(name[:-1] + 'ies')
+    return [alias for alias in aliases if alias]
+
+
+class FastPathEngine:
+    """Rule/template engine for questions that pandas can answer exactly"""
+
+    # Strategies (DataAnalystChatbot.analyze_question_intent) the fast path may take over
+    SUPPORTED_STRATEGIES = {'performance_analysis', 'overview_analysis', 'general_analysis'}
+
+    def match_columns(self, question: str, df: pd.DataFrame) -> Tuple[List[str], str]:
+        """Columns named in the question (longest names first) and the question with them removed"""
+        candidates = []
+        for column in df.columns:
+            for alias in _aliases(column):
+                candidates.append((len(alias), alias, column))
+        candidates.sort(reverse=True)
+
+        remaining = question
+        found: List[Tuple[int, str]] = []
+        for _, alias, column in candidates:
+            match = re.search(r'\b' + re.escape(alias) + r'\b', remaining)
+            if match and column not in [col for _, col in found]:
+                found.append((match.start(), column))
+                remaining = remaining[:match.start()] + ' ' * len(alias) + remaining[match.end():]
+        found.sort()
+        return [column for _, column in found], remaining
+
+    def per_group_dimension(self, text: str, dimensions: List[str]) -> Optional[str]:
+        """The dimension named right after 'per' / 'for each' / 'in each', if any"""
+        match = PER_GROUP_PATTERN.search(text)
+        if match is None:
+            return None
+        for column in dimensions:
+            if any(re.match(re.escape(alias) + r'\b', match.group(1)) for alias in _aliases(column)):
+                return column
+        return None
+
+    def parse(self, question: str, df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+        """Structured query for a fully specified question, or None"""
+        text = _normalise(question).rstrip('?.! ')
+        if not text:
+            return None
+
+        # Column names are removed before the checks below so e.g. a 'Growth' column doesn't block
+        columns, remaining = self.match_columns(text, df)
+        if OPEN_ENDED_PATTERN.search(remaining):
+            return None
+        numeric = [col for col in columns if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+        dimensions = [col for col in columns if col not in numeric]
+        per_group = None
+        if len(dimensions) == 2 and RANKING_PATTERN.search(remaining):
+            per_group = self.per_group_dimension(text, dimensions)
+            dimensions = [col for col in dimensions if col != per_group]
+        if len(numeric) > 1 or len(dimensions) > 1:
+            return None  # Several metrics or groupings: not a single template
+
+        ranking = RANKING_PATTERN.search(remaining)
+        n = None
+        if ranking:
+            if ranking.group(2) is None and ranking.group(1) in ('top', 'bottom'):
+                return None  # "top products": how many is the LLM's call
+            n = int(ranking.group(2)) if ranking.group(2) else 1
+            remaining = remaining[:ranking.start()] + remaining[ranking.end():]
+        if re.search(r'\d', remaining):
+            return None  # Numbers other than N are filters / thresholds
+        if VALUE_FILTER_PATTERN.search(re.sub(r'\b(?:how many|number of)\b', ' ', remaining)):
+            return None
+
+        aggregation = None
+        for pattern, name in AGGREGATION_WORDS:
+            if re.search(pattern, remaining):
+                aggregation = name
+                break
+
+        leftover = GROUP_WORDS.sub(' ', remaining)
+        for pattern, _ in AGGREGATION_WORDS:
+            leftover = re.sub(pattern, ' ', leftover)
+        if any(word not in STOP_WORDS for word in re.findall(r"[a-z']+", leftover)):
+            return None  # Conditions, filters or wording we don't understand
+
+        metric = numeric[0] if numeric else None
+        dimension = dimensions[0] if dimensions else None
+
+        if ranking:
+            if metric is None:
+                return None
+            if per_group is not None:
+                return {'kind': 'group_ranking', 'metric': metric, 'dimension': dimension, 'group': per_group, 'n': n,
+                        'aggregation': aggregation if aggregation not in (None, 'count') else 'sum',
+                        'ascending': ranking.group(1) not in DESCENDING_WORDS}
+            if dimension is None:
+                return {'kind': 'top_rows', 'metric': metric, 'n': n,
+                        'ascending': ranking.group(1) not in DESCENDING_WORDS}
+            return {'kind': 'ranking', 'metric': metric, 'dimension': dimension, 'n': n,
+                    'aggregation': aggregation if aggregation not in (None, 'count') else 'sum',
+                    'ascending': ranking.group(1) not in DESCENDING_WORDS}
+
+        if aggregation is None:
+            return None
+        if aggregation == 'count' and metric is not None:
+            return None  # "number of orders" over a numeric Orders column: rows or sum? Ambiguous
+        if dimension is not None:
+            if not GROUP_WORDS.search(remaining):
+                return None  # "average sales North" - a value filter we don't parse
+            if metric is None and aggregation != 'count':
+                return None
+            return {'kind': 'group', 'metric': metric, 'dimension': dimension, 'aggregation': aggregation}
+        if aggregation == 'count' and metric is None:
+            return {'kind': 'count'}
+        if metric is None:
+            return None
+        return {'kind': 'scalar', 'metric': metric, 'aggregation': aggregation}
+
+    def answer(self, question: str, df: pd.DataFrame,
+               strategy: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Computed answer (table, narrative, operation) or None when the LLM is needed"""
+        if df is None or df.empty:
+            return None
+        if strategy is not None and strategy.get('type') not in self.SUPPORTED_STRATEGIES:
+            return None
+
+        query = self.parse(question, df)
+        if query is None:
+            return None
+
+        try:
+            handler = getattr(self, f"_answer_{query['kind']}")
+            result = handler(df, query)
+        except (TypeError, ValueError, KeyError) as e:
+            print(f"⚠️ Fast path skipped: {e}")
+            return None
+
+        result['query'] = query
+        return result
+
+    # Templates
+
+    def _group_values(self, df: pd.DataFrame, query: Dict[str, Any]) -> pd.Series:
+        return group_aggregate(df, query['dimension'], query['metric'], query['aggregation'], dropna=False)
+
+    def _answer_ranking(self, df: pd.DataFrame, query: Dict[str, Any]) -> Dict[str, Any]:
+        metric, dimension, n = query['metric'], query['dimension'], query['n']
+        values = self._group_values(df, query)
+        ranked = values.iloc[top_positions(values, n, query['ascending'])]
+        label = f"{AGGREGATION_LABELS[query['aggregation']].lower()} {metric}"
+        direction = 'Bottom' if query['ascending'] else 'Top'
+        table = ranked.rename(f"{AGGREGATION_LABELS[query['aggregation']]} {metric}").reset_index()
+
+        lines = [f"**{direction} {len(ranked)} {dimension} by {label}**", ""]
+        total = values.sum() if query['aggregation'] == 'sum' else None
+        for rank, (name, value) in enumerate(ranked.items(), start=1):
+            share = f" ({value / total:.1%} of total)" if total else ""
+            lines.append(f"{rank}. **{name}**: {_format_number(value)}{share}")
+        if total:
+            lines += ["", f"Together these {len(ranked)} of {len(values)} {dimension} values account for "
+                          f"{ranked.sum() / total:.1%} of total {metric} ({_format_number(total)})."]
+        else:
+            lines += ["", f"Ranked across {len(values)} {dimension} values."]
+
+        return {
+            'narrative': "\n".join(lines),
+            'data': table,
+            'chart_spec': {'x': dimension, 'y': table.columns[1], 'title': f"{direction} {len(ranked)} {dimension} by {label}"},
+            'operation': {'type': 'top', 'parameters': {'n': n, 'column': metric, 'group_by': dimension,
+                                                        'aggregation': query['aggregation'],
+                                                        'criteria': 'lowest' if query['ascending'] else 'highest'}}
+        }
+
+    def _answer_top_rows(self, df: pd.DataFrame, query: Dict[str, Any]) -> Dict[str, Any]:
+        metric, n = query['metric'], query['n']
+        rows = top_n(df, metric, n, query['ascending']).to_frame()
+        direction = 'Bottom' if query['ascending'] else 'Top'
+        labels = [col for col in df.columns
+                  if col != metric and not pd.api.types.is_numeric_dtype(df[col])][:2]
+
+        lines = [f"**{direction} {len(rows)} records by {metric}**", ""]
+        for rank, (_, row) in enumerate(rows.iterrows(), start=1):
+            label = ", ".join(str(row[col]) for col in labels) if labels else f"row {row.name}"
+            lines.append(f"{rank}. {label}: {_format_number(row[metric])}")
+        lines += ["", f"{metric} ranges from {_format_number(df[metric].min())} to {_format_number(df[metric].max())} "
+                      f"across all {len(df):,} records."]
+
+        return {
+            'narrative': "\n".join(lines),
+            'data': rows,
+            'chart_spec': None,
+            'operation': {'type': 'top', 'parameters': {'n': n, 'column': metric,
+                                                        'criteria': 'lowest' if query['ascending'] else 'highest'}}
+        }
+
+    def _answer_group(self, df: pd.DataFrame, query: Dict[str, Any]) -> Dict[str, Any]:
+        metric, dimension, aggregation = query['metric'], query['dimension'], query['aggregation']
+        values = self._group_values(df, query).sort_values(ascending=False)
+        value_label = f"{AGGREGATION_LABELS[aggregation]} {metric}" if metric else "Count"
+        table = values.rename(value_label).reset_index()
+
+        title = f"{value_label} by {dimension}"
+        lines = [f"**{title}**", ""]
+        for name, value in values.head(20).items():
+            lines.append(f"- **{name}**: {_format_number(value)}")
+        if len(values) > 20:
+            lines.append(f"- ... and {len(values) - 20} more")
+        if len(values) > 1:
+            overall = len(df) if metric is None else df[metric].agg(aggregation)
+            lines += ["", f"Highest: {values.index[0]} ({_format_number(values.iloc[0])}), "
+                          f"lowest: {values.index[-1]} ({_format_number(values.iloc[-1])}); "
+                          f"overall {value_label.lower()}: {_format_number(overall)}."]
+
+        return {
+            'narrative': "\n".join(lines),
+            'data': table,
+            'chart_spec': {'x': dimension, 'y': value_label, 'title': title},
+            'operation': {'type': 'group', 'parameters': {'group_by': dimension, 'column': metric,
+                                                          'aggregation': aggregation}}
+        }
+
+    def _answer_group_ranking(self, df: pd.DataFrame, query: Dict[str, Any]) -> Dict[str, Any]:
+        metric, dimension, group, n = query['metric'], query['dimension'], query['group'], query['n']
+        value_label = f"{AGGREGATION_LABELS[query['aggregation']]} {metric}"
+        table = top_values_per_group(df, group, dimension, n, metric, query['aggregation'], query['ascending'])
+        table = table.rename(columns={table.columns[-1]: value_label})
+        direction = 'Bottom' if query['ascending'] else 'Top'
+        title = f"{direction} {n} {dimension} per {group} by {AGGREGATION_LABELS[query['aggregation']].lower()} {metric}"
+
+        lines = [f"**{title}**", ""]
+        for key, rows in table.groupby(group, observed=True, sort=False):
+            ranked = ", ".join(f"{name} ({_format_number(value)})" for name, value in zip(rows[dimension], rows[value_label]))
+            lines.append(f"- **{key}**: {ranked}")
+        return {
+            'narrative': "\n".join(lines),
+            'data': table,
+            'chart_spec': {'x': group, 'y': value_label, 'color': dimension, 'title': title},
+            'operation': {'type': 'top', 'parameters': {'n': n, 'column': metric, 'entity': dimension, 'per_group': group,
+                                                        'aggregation': query['aggregation'],
+                                                        'criteria': 'lowest' if query['ascending'] else 'highest'}}
+        }
+
+    def _answer_scalar(self, df: pd.DataFrame, query: Dict[str, Any]) -> Dict[str, Any]:
+        metric, aggregation = query['metric'], query['aggregation']
+        value = df[metric].agg(aggregation)
+        label = f"{AGGREGATION_LABELS[aggregation]} {metric}"
+        narrative = (f"The {label.lower()} across all {len(df):,} records is **{_format_number(value)}** "
+                     f"(values range from {_format_number(df[metric].min())} to {_format_number(df[metric].max())}).")
+        return {
+            'narrative': narrative,
+            'data': pd.DataFrame({label: [value]}),
+            'chart_spec': None,
+            'operation': {'type': 'statistics', 'parameters': {'column': metric, 'aggregation': aggregation}}
+        }
+
+    def _answer_count(self, df: pd.DataFrame, query: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'narrative': f"The dataset has **{len(df):,}** records across {len(df.columns)} columns.",
+            'data': pd.DataFrame({'Count': [len(df)]}),
+            'chart_spec': None,
+            'operation': {'type': 'statistics', 'parameters': {'aggregation': 'count'}}
+        }
+
+
+def build_chart(answer: Dict[str, Any]):
+    """Bar chart for grouped answers (None for scalars and row lists)"""
+    spec = answer.get('chart_spec')
+    if not spec:
+        return None
+    import plotly.express as px
+    return px.bar(answer['data'], x=spec['x'], y=spec['y'], color=spec.get('color'), barmode='group', title=spec['title'])
+
+
+_default_engine = FastPathEngine()
+
+
+def get_fast_path() -> FastPathEngine:
+    """Shared stateless engine"""
+    return _default_engine
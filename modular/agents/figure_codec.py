@@ -0,0 +1,170 @@
+# Figure Codec
+"""
+Compact figure encoding. Trace arrays are written as plotly.js typed arrays ({'dtype', 'bdata'},
+base64 of the raw values) instead of per-point JSON: integers in their narrowest type, floats
+as float64 (float32 only on request, and only where every value survives the round trip),
+datetimes on x/y as float64 epoch milliseconds on a date axis (plotly would otherwise send
+every timestamp as an ISO string). Stored figures are FigureRef
+objects - that JSON, zlib-compressed - and are only rebuilt into a plotly figure for display.
+Rebuilding a figure from typed arrays needs plotly 6 or later (5.x rejects them as values).
+"""
+from typing import Dict, Any, Optional
+import base64
+import json
+import zlib
+import numpy as np
+from .lazy_imports import lazy_import
+
+go = lazy_import('plotly.graph_objects')
+pio = lazy_import('plotly.io')
+
+# With narrow_floats, arrays shorter than this keep float64 (too small for float32 to matter)
+FLOAT32_MIN_POINTS = 1000
+
+# Trace types whose x / y go on cartesian axes, where datetimes can be sent as epoch milliseconds
+DATE_AXIS_TRACES = ('scatter', 'scattergl', 'bar', 'histogram', 'box', 'violin', 'heatmap', 'histogram2d')
+
+# Keys plotly itself never turns into typed arrays
+SKIPPED_KEYS = ('geojson', 'layer', 'layers', 'range')
+
+INTEGER_CODES = [(np.int8, 'i1'), (np.uint8, 'u1'), (np.int16, 'i2'), (np.uint16, 'u2'),
+                 (np.int32, 'i4'), (np.uint32, 'u4')]
+
+TYPED_ARRAY_DTYPES = {'i1': np.int8, 'u1': np.uint8, 'u1c': np.uint8, 'i2': np.int16, 'u2': np.uint16,
+                      'i4': np.int32, 'u4': np.uint32, 'f4': np.float32, 'f8': np.float64}
+
+
+def _typed_array(values: np.ndarray, dtype: Any, code: str) -> Dict[str, str]:
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    spec = {'dtype': code, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+    if array.ndim > 1:
+        spec['shape'] = ', '.join(str(size) for size in array.shape)
+    return spec
+
+
+def encode_array(values: np.ndarray, narrow_floats: bool = False) -> Any:
+    """Typed-array spec for a numeric, boolean or datetime numpy array; other values pass through"""
+    if not isinstance(values, np.ndarray) or values.size == 0:
+        return values
+    kind = values.dtype.kind
+    if kind == 'b':
+        return _typed_array(values, np.uint8, 'u1')
+    if kind in 'iu':
+        low, high = values.min(), values.max()
+        for dtype, code in INTEGER_CODES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return _typed_array(values, dtype, code)
+        return _typed_array(values, np.float64, 'f8')  # plotly.js has no 64-bit integer arrays
+    if kind == 'f':
+        if narrow_floats and values.size >= FLOAT32_MIN_POINTS:
+            # Only lossless narrowing: epoch seconds or amounts in the millions don't survive float32
+            with np.errstate(over='ignore'):
+                narrowed = values.astype(np.float32)
+            if np.array_equal(narrowed.astype(np.float64), values, equal_nan=True):
+                return _typed_array(narrowed, np.float32, 'f4')
+        return _typed_array(values, np.float64, 'f8')
+    if kind == 'M':
+        milliseconds = values.astype('datetime64[ms]')
+        return _typed_array(np.where(np.isnat(milliseconds), np.nan, milliseconds.astype(np.int64)), np.float64, 'f8')
+    return values
+
+
+def decode_array(spec: Dict[str, str]) -> np.ndarray:
+    """numpy array of a typed-array spec"""
+    dtype = np.dtype(TYPED_ARRAY_DTYPES[spec['dtype']]).newbyteorder('<')
+    values = np.frombuffer(base64.b64decode(spec['bdata']), dtype=dtype)
+    if 'shape' in spec:
+        values = values.reshape([int(size) for size in spec['shape'].split(',')])
+    return values
+
+
+def _is_typed_array(value: Any) -> bool:
+    return isinstance(value, dict) and 'bdata' in value and value.get('dtype') in TYPED_ARRAY_DTYPES
+
+
+def _encode_value(value: Any, narrow_floats: bool) -> Any:
+    if isinstance(value, np.ndarray):
+        return encode_array(value, narrow_floats) if value.dtype.kind != 'M' else value
+    if _is_typed_array(value):
+        # plotly already wrote float64 typed arrays (to_plotly_json); long ones are narrowed
+        if narrow_floats and value['dtype'] == 'f8' and len(value['bdata']) * 3 // 32 >= FLOAT32_MIN_POINTS:
+            return encode_array(decode_array(value), narrow_floats)
+        return value
+    if isinstance(value, dict):
+        return {key: item if key in SKIPPED_KEYS else _encode_value(item, narrow_floats) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and isinstance(value[0], dict):
+        return [_encode_value(item, narrow_floats) for item in value]
+    return value
+
+
+def _axis_key(trace: Dict[str, Any], axis: str) -> str:
+    """Layout key of a trace's x or y axis ('x2' -> 'xaxis2')"""
+    anchor = trace.get(f"{axis}axis") or axis
+    return f"{axis}axis{anchor[1:]}"
+
+
+def encode_figure(figure: Any, narrow_floats: bool = False) -> str:
+    """Plotly JSON for a figure (or figure dict) with every trace array as a typed array"""
+    spec = figure.to_plotly_json() if hasattr(figure, 'to_plotly_json') else figure
+    layout = dict(spec.get('layout') or {})
+    traces = []
+    for trace in spec.get('data') or []:
+        encoded = _encode_value(trace, narrow_floats)
+        if trace.get('type', 'scatter') in DATE_AXIS_TRACES:
+            for axis in ('x', 'y'):
+                values = trace.get(axis)
+                if isinstance(values, np.ndarray) and values.dtype.kind == 'M' and values.size:
+                    encoded[axis] = encode_array(values)
+                    axis_key = _axis_key(trace, axis)
+                    axis_layout = dict(layout.get(axis_key) or {})
+                    axis_layout.setdefault('type', 'date')
+                    layout[axis_key] = axis_layout
+        traces.append(encoded)
+    # pio.to_json serialises whatever is left (strings, datetimes in hover data, numpy scalars)
+    return pio.to_json({**spec, 'data': traces, 'layout': layout}, validate=False)
+
+
+def transport_figure(figure: Any) -> Any:
+    """A figure whose arrays are already typed arrays, so the browser payload is the compact one"""
+    return go.Figure(json.loads(encode_figure(figure)))
+
+
+class FigureRef:
+    """
+    A figure kept as compressed typed-array JSON. A few bytes per point instead of a live plotly
+    object; figure() rebuilds it for display, and every call returns an independent copy.
+    """
+
+    def __init__(self, blob: bytes, json_bytes: int):
+        self.blob = blob
+        self.json_bytes = json_bytes   # Size of the encoded JSON sent to the browser
+
+    @classmethod
+    def from_figure(cls, figure: Any, narrow_floats: bool = False) -> 'FigureRef':
+        encoded = encode_figure(figure, narrow_floats).encode('utf-8')
+        return cls(zlib.compress(encoded, 1), len(encoded))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.blob)
+
+    def spec(self) -> Dict[str, Any]:
+        """The figure as a JSON-compatible dict (typed arrays included)"""
+        return json.loads(zlib.decompress(self.blob))
+
+    def figure(self) -> Any:
+        return go.Figure(self.spec())
+
+    def __repr__(self):
+        return f"FigureRef({self.nbytes / 1e6:.2f} MB compressed, {self.json_bytes / 1e6:.2f} MB JSON)"
+
+
+def compact_figure(value: Any) -> Any:
+    """FigureRef for a plotly figure; anything else (including FigureRefs) passes through"""
+    return FigureRef.from_figure(value) if hasattr(value, 'to_plotly_json') else value
+
+
+def as_figure(value: Optional[Any]) -> Any:
+    """A plotly figure for display; figures and other values pass through"""
+    return value.figure() if isinstance(value, FigureRef) else value
@@ -0,0 +1,18 @@
+# Dataset Fingerprint
+import hashlib
+import pandas as pd
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a dataframe (schema + row values, index ignored) identifying one dataset version"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+    digest.update(str(len(df)).encode())
+    if len(df) and len(df.columns):
+        try:
+            row_hashes = pd.util.hash_pandas_object(df, index=False)
+        except TypeError:
+            # Unhashable cell values (lists, dicts) are hashed through their string form
+            row_hashes = pd.util.hash_pandas_object(df.astype(str), index=False)
+        digest.update(row_hashes.to_numpy().tobytes())
+    return digest.hexdigest()
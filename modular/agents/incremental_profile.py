@@ -0,0 +1,311 @@
+# Incremental Data Profile
+from typing import Dict, Any, List, Optional, Tuple
+import math
+import numpy as np
+import pandas as pd
+from .dtype_optimizer import observed_counts
+
+
+class RunningStats:
+    """Mergeable count/sum/min/max/moment accumulator for a single numeric column"""
+
+    def __init__(self):
+        self.count = 0      # non-null values seen
+        self.missing = 0    # null values seen
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self.m2 = 0.0       # sum of squared deviations from the mean
+
+    @classmethod
+    def from_values(cls, values) -> 'RunningStats':
+        """Build stats for a batch of values in one vectorized pass"""
+        arr = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        null_mask = np.isnan(arr)
+        valid = arr[~null_mask]
+
+        stats = cls()
+        stats.missing = int(null_mask.sum())
+        stats.count = int(valid.size)
+        if stats.count:
+            stats.total = float(valid.sum())
+            stats.min = float(valid.min())
+            stats.max = float(valid.max())
+            stats.mean = stats.total / stats.count
+            stats.m2 = float(((valid - stats.mean) ** 2).sum())
+        return stats
+
+    def update(self, values):
+        """Fold a new batch of values into the running statistics"""
+        self.merge(RunningStats.from_values(values))
+
+    def merge(self, other: 'RunningStats'):
+        """Combine with another accumulator (parallel variance formula)"""
+        self.missing += other.missing
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.total = other.count, other.total
+            self.min, self.max = other.min, other.max
+            self.mean, self.m2 = other.mean, other.m2
+            return
+
+        combined = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 = self.m2 + other.m2 + delta * delta * self.count * other.count / combined
+        self.mean = self.mean + delta * other.count / combined
+        self.count = combined
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1, matching pandas)"""
+        if self.count < 2:
+            return float('nan')
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def missing_pct(self, total_rows: int) -> float:
+        return float(self.missing / total_rows * 100) if total_rows else 0.0
+
+
+class IncrementalDataProfile:
+    """
+    Column profile that can be updated with appended rows without rescanning the full dataset.
+    Numeric columns keep mergeable moments, categorical columns keep value counts and
+    date columns keep their observed range.
+    """
+
+    def __init__(self):
+        self.total_rows = 0
+        self.columns: List[str] = []
+        self.dtypes: Dict[str, str] = {}
+        self.numeric_columns: List[str] = []
+        self.categorical_columns: List[str] = []
+        self.date_columns: List[str] = []
+        self.numeric_stats: Dict[str, RunningStats] = {}
+        self.category_counts: Dict[str, pd.Series] = {}
+        self.category_missing: Dict[str, int] = {}
+        self.date_ranges: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, **kwargs) -> 'IncrementalDataProfile':
+        """Profile a full dataframe and remember its schema"""
+        profile = cls(**kwargs)
+        profile.set_schema(df)
+        profile.update(df)
+        return profile
+
+    def set_schema(self, df: pd.DataFrame):
+        """Classify columns and create empty accumulators for each of them"""
+        self.columns = list(df.columns)
+        self.dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+        self.numeric_columns = df.select_dtypes(include=['number']).columns.tolist()
+        self.categorical_columns = df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
+        self.date_columns = df.select_dtypes(include=['datetime64']).columns.tolist()
+
+        for col in self.numeric_columns:
+            self.numeric_stats[col] = RunningStats()
+        for col in self.categorical_columns:
+            self.category_counts[col] = pd.Series(dtype='int64')
+            self.category_missing[col] = 0
+        for col in self.date_columns:
+            self.date_ranges[col] = {'min': None, 'max': None, 'missing': 0}
+
+    def update(self, new_rows: pd.DataFrame):
+        """Fold appended rows (already aligned to the schema) into the profile"""
+        if new_rows is None or new_rows.empty:
+            return
+
+        self.total_rows += len(new_rows)
+
+        for col in self.numeric_columns:
+            self.numeric_stats[col].update(new_rows[col])
+
+        for col in self.categorical_columns:
+            self.update_categorical(col, new_rows[col])
+            self.category_missing[col] += int(new_rows[col].isnull().sum())
+
+        for col in self.date_columns:
+            values = new_rows[col]
+            self.merge_date_range(col, {'min': values.min(), 'max': values.max(), 'missing': int(values.isnull().sum())})
+
+    def update_categorical(self, col: str, values: pd.Series):
+        """Add a batch of categorical values to the column's counts"""
+        counts = observed_counts(values)
+        self.category_counts[col] = self.category_counts[col].add(counts, fill_value=0).astype('int64')
+
+    def merge_date_range(self, col: str, other: Dict[str, Any]):
+        date_range = self.date_ranges[col]
+        date_range['missing'] += other['missing']
+        if other['min'] is not None and pd.notna(other['min']):
+            date_range['min'] = other['min'] if date_range['min'] is None else min(date_range['min'], other['min'])
+            date_range['max'] = other['max'] if date_range['max'] is None else max(date_range['max'], other['max'])
+
+    def merge(self, other: 'IncrementalDataProfile'):
+        """Combine with a profile of other rows of the same schema (e.g. another chunk or process)"""
+        self.total_rows += other.total_rows
+        for col in self.numeric_columns:
+            self.numeric_stats[col].merge(other.numeric_stats[col])
+        for col in self.categorical_columns:
+            self.category_counts[col] = self.category_counts[col].add(other.category_counts[col], fill_value=0).astype('int64')
+            self.category_missing[col] += other.category_missing[col]
+        for col in self.date_columns:
+            self.merge_date_range(col, other.date_ranges[col])
+
+    def unique_count(self, col: str) -> int:
+        """Number of distinct non-null values in a categorical column"""
+        return int((self.category_counts[col] > 0).sum())
+
+    def top_values(self, col: str, n: int = 5) -> Dict[Any, int]:
+        """Most frequent values of a categorical column"""
+        counts = self.category_counts.get(col)
+        if counts is None or counts.empty:
+            return {}
+        return {key: int(value) for key, value in counts.sort_values(ascending=False, kind='stable').head(n).items()}
+
+    def to_data_profile(self, extra_date_columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Render the profile in the shape produced by DataContextAnalyzer.analyze_data_structure"""
+        numeric_analysis = {}
+        for col in self.numeric_columns:
+            stats = self.numeric_stats[col]
+            numeric_analysis[col] = {
+                'min': float(stats.min) if stats.count else float('nan'),
+                'max': float(stats.max) if stats.count else float('nan'),
+                'mean': float(stats.mean) if stats.count else float('nan'),
+                'std': float(stats.std),
+                'missing_pct': stats.missing_pct(self.total_rows)
+            }
+
+        categorical_analysis = {}
+        for col in self.categorical_columns:
+            categorical_analysis[col] = {
+                'unique_count': self.unique_count(col),
+                'top_values': self.top_values(col),
+                'missing_pct': float(self.category_missing[col] / self.total_rows * 100) if self.total_rows else 0.0
+            }
+
+        return {
+            'total_rows': self.total_rows,
+            'total_columns': len(self.columns),
+            'numeric_columns': list(self.numeric_columns),
+            'categorical_columns': list(self.categorical_columns),
+            'date_columns': list(self.date_columns) + list(extra_date_columns or []),
+            'numeric_analysis': numeric_analysis,
+            'categorical_analysis': categorical_analysis
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Capture the summary values that feed the system prompt"""
+        return {
+            'total_rows': self.total_rows,
+            'numeric': {
+                col: {
+                    'min': stats.min, 'max': stats.max,
+                    'mean': stats.mean, 'std': stats.std
+                }
+                for col, stats in self.numeric_stats.items()
+            },
+            'categorical': {
+                col: {
+                    'unique_count': self.unique_count(col),
+                    'top_value': next(iter(self.top_values(col, 1)), None)
+                }
+                for col in self.categorical_columns
+            }
+        }
+
+    def has_material_change(self, previous: Optional[Dict[str, Any]], tolerance: float = 0.05) -> bool:
+        """Check whether the summary moved enough since `previous` to justify a new system prompt"""
+        if not previous:
+            return True
+
+        current = self.snapshot()
+
+        old_rows = previous.get('total_rows', 0)
+        if old_rows == 0 or abs(current['total_rows'] - old_rows) / old_rows > tolerance:
+            return True
+
+        for col, stats in current['numeric'].items():
+            old = previous['numeric'].get(col)
+            if old is None:
+                return True
+            old_range = old['max'] - old['min']
+            scale = old_range if old_range and math.isfinite(old_range) else max(abs(old['mean']), 1.0)
+            if stats['min'] < old['min'] - tolerance * scale or stats['max'] > old['max'] + tolerance * scale:
+                return True
+            spread = old['std'] if old['std'] and math.isfinite(old['std']) else scale
+            if abs(stats['mean'] - old['mean']) > tolerance * spread:
+                return True
+
+        for col, info in current['categorical'].items():
+            old = previous['categorical'].get(col)
+            if old is None or info['top_value'] != old['top_value']:
+                return True
+            old_unique = max(old['unique_count'], 1)
+            if abs(info['unique_count'] - old['unique_count']) / old_unique > tolerance:
+                return True
+
+        return False
+
+
+def align_to_schema(new_rows: pd.DataFrame, reference: pd.DataFrame) -> Tuple[Optional[pd.DataFrame], List[str]]:
+    """
+    Validate appended rows against the existing dataset and coerce them to its dtypes.
+    Returns the aligned rows (or None) and a list of validation errors.
+    """
+    errors = []
+
+    missing_cols = [col for col in reference.columns if col not in new_rows.columns]
+    extra_cols = [col for col in new_rows.columns if col not in reference.columns]
+    if missing_cols:
+        errors.append(f"Missing columns: {', '.join(map(str, missing_cols))}")
+    if extra_cols:
+        errors.append(f"Unexpected columns: {', '.join(map(str, extra_cols))}")
+    if errors:
+        return None, errors
+
+    aligned = new_rows[list(reference.columns)].copy()
+
+    for col in reference.columns:
+        target = reference[col].dtype
+        values = aligned[col]
+
+        if pd.api.types.is_numeric_dtype(target):
+            converted = pd.to_numeric(values, errors='coerce')
+            invalid = converted.isnull() & values.notnull()
+            if invalid.any():
+                errors.append(f"Column '{col}' expects numbers, got {int(invalid.sum())} non-numeric values")
+                continue
+            if pd.api.types.is_integer_dtype(target) and converted.notnull().all() and (converted % 1 == 0).all():
+                converted = converted.astype(target)
+            aligned[col] = converted
+
+        elif pd.api.types.is_datetime64_any_dtype(target):
+            converted = pd.to_datetime(values, errors='coerce')
+            invalid = converted.isnull() & values.notnull()
+            if invalid.any():
+                errors.append(f"Column '{col}' expects dates, got {int(invalid.sum())} unparseable values")
+                continue
+            aligned[col] = converted
+
+        elif isinstance(target, pd.CategoricalDtype):
+            # Values not among the categories yet stay as text; concat_rows extends the categories
+            aligned[col] = values.where(values.isnull(), values.astype(str))
+
+        elif pd.api.types.is_string_dtype(target):
+            # Match DataApp.clean_dataframe_for_display: text columns are stored as strings
+            aligned[col] = values.fillna('').astype(str)
+
+        else:
+            try:
+                aligned[col] = values.astype(target)
+            except (ValueError, TypeError):
+                errors.append(f"Column '{col}' could not be converted to {target}")
+
+    if errors:
+        return None, errors
+
+    return aligned, []
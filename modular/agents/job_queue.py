@@ -0,0 +1,320 @@
+# Background Job Queue
+"""
+Long-running analyses (data profiling, multi-agent commands, generated code) run on a worker
+pool instead of the request/UI thread. Each job has an id, records a progress event per
+pipeline stage, can be cancelled, and keeps its status and result in SQLite, so a refreshed
+page or another API client can poll it or reattach to it by id. Each app keeps its database
+in a private directory of its own, and results are stored as JSON (result_codec), never pickled.
+"""
+from typing import Dict, Any, List, Optional, Callable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import sqlite3
+import stat
+import threading
+import time
+import uuid
+from . import result_codec
+
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY, kind TEXT, owner TEXT, status TEXT, progress REAL, stage TEXT,
+    error TEXT, result BLOB, created_at REAL, updated_at REAL, pid INTEGER
+);
+CREATE TABLE IF NOT EXISTS job_events (job_id TEXT, at REAL, progress REAL, stage TEXT);
+CREATE INDEX IF NOT EXISTS job_events_by_job ON job_events (job_id);
+"""
+
+
+def private_directory(path: str) -> str:
+    """Create path as a directory only this user can enter (0700); refuse one owned by someone else"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or (hasattr(os, 'getuid') and info.st_uid != os.getuid()):
+        raise PermissionError(f"{path} is not a directory owned by this user")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def default_db_path(app: str) -> str:
+    """JOB_DB_PATH, else jobs.sqlite3 in the app's private directory under the user cache (XDG_CACHE_HOME)"""
+    if os.getenv("JOB_DB_PATH"):
+        return os.environ["JOB_DB_PATH"]
+    cache = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    private_directory(os.path.join(cache, "analysis"))
+    return os.path.join(private_directory(os.path.join(cache, "analysis", app)), "jobs.sqlite3")
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid or pid == os.getpid():
+        return False  # Unknown (a database from before pids were kept), or a pid reused by this process
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True   # Exists but belongs to someone else
+    return True
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a cancelled job at its next stage boundary. Derives from BaseException so
+    the agents' `except Exception` fallbacks don't turn a cancellation into an error result.
+    """
+
+
+class JobContext:
+    """Handed to a running job to report progress and notice cancellation"""
+
+    def __init__(self, queue: 'JobQueue', job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    @property
+    def cancelled(self) -> bool:
+        return self.queue._jobs[self.job_id]['cancel'].is_set()
+
+    def progress(self, fraction: float, stage: str):
+        """Record a progress event (fraction in 0..1); raises JobCancelled once the job is cancelled"""
+        if self.cancelled:
+            raise JobCancelled()
+        self.queue._record_progress(self.job_id, fraction, stage)
+
+
+class JobQueue:
+    """
+    Thread pool plus SQLite job table. Threads rather than processes: jobs work on the
+    session's coordinators and the shared dataset store, which live in this process.
+    Finished jobs stay in memory (with their live result) up to `max_finished_in_memory`;
+    older ones are served from the database. Several processes may share a database: each
+    row records the pid that runs it, and only jobs of processes that are gone are failed.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, workers: int = 2, max_finished_in_memory: int = 32,
+                 retention_seconds: float = 7 * 24 * 3600, app: str = 'app'):
+        self.db_path = db_path or default_db_path(app)
+        self.workers = workers
+        self.max_finished_in_memory = max_finished_in_memory
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job-worker")
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        # Created 0600 up front; SQLite gives its -wal / -shm files the same mode
+        os.close(os.open(self.db_path, os.O_RDWR | os.O_CREAT, 0o600))
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._db_lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            if 'pid' not in [row[1] for row in self._db.execute("PRAGMA table_info(jobs)")]:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN pid INTEGER")
+            # Jobs of a process that has exited can't resume; record them as interrupted
+            unfinished = self._db.execute("SELECT id, pid FROM jobs WHERE status NOT IN "
+                                          "('succeeded', 'failed', 'cancelled')").fetchall()
+            interrupted = [(time.time(), job_id) for job_id, pid in unfinished if not _process_alive(pid)]
+            self._db.executemany("UPDATE jobs SET status = 'failed', error = 'Interrupted by a restart', "
+                                 "updated_at = ? WHERE id = ?", interrupted)
+        self.purge(retention_seconds)
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, owner: Optional[str] = None,
+               memory_only: tuple = (), **kwargs) -> str:
+        """
+        Queue fn(context, *args, **kwargs) and return the job id. Keys of a dict result named in
+        memory_only (live objects such as coordinators) are not written to the database.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            'id': job_id, 'kind': kind, 'owner': owner, 'status': 'queued', 'progress': 0.0,
+            'stage': 'Queued', 'error': None, 'created_at': now, 'updated_at': now,
+            'events': [], 'result': None, 'cancel': threading.Event(), 'future': None,
+            'memory_only': tuple(memory_only)
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._execute(
+            "INSERT INTO jobs (id, kind, owner, status, progress, stage, created_at, updated_at, pid) "
+            "VALUES (?, ?, ?, 'queued', 0, 'Queued', ?, ?, ?)", (job_id, kind, owner, now, now, os.getpid())
+        )
+        job['future'] = self._executor.submit(self._run, job_id, fn, args, kwargs)
+        print(f"📥 Job {job_id[:8]} queued: {kind}")
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[..., Any], args, kwargs):
+        job = self._jobs[job_id]
+        if job['cancel'].is_set():
+            self._finish(job_id, 'cancelled', stage='Cancelled')
+            return
+        self._update(job_id, status='running', stage='Started')
+        try:
+            result = fn(JobContext(self, job_id), *args, **kwargs)
+        except JobCancelled:
+            self._finish(job_id, 'cancelled', stage='Cancelled')
+        except Exception as e:
+            print(f"❌ Job {job_id[:8]} failed: {e}")
+            self._finish(job_id, 'failed', stage='Failed', error=str(e))
+        else:
+            if job['cancel'].is_set():
+                self._finish(job_id, 'cancelled', stage='Cancelled')
+            else:
+                self._finish(job_id, 'succeeded', stage='Done', result=result)
+
+    def _record_progress(self, job_id: str, fraction: float, stage: str):
+        now = time.time()
+        fraction = min(max(float(fraction), 0.0), 1.0)
+        self._jobs[job_id]['events'].append({'at': now, 'progress': fraction, 'stage': stage})
+        self._execute("INSERT INTO job_events (job_id, at, progress, stage) VALUES (?, ?, ?, ?)",
+                      (job_id, now, fraction, stage))
+        self._update(job_id, progress=fraction, stage=stage)
+
+    def _update(self, job_id: str, **fields):
+        job = self._jobs[job_id]
+        job.update(fields, updated_at=time.time())
+        columns = ', '.join(f"{name} = ?" for name in [*fields, 'updated_at'])
+        self._execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job['updated_at'], job_id))
+
+    def _finish(self, job_id: str, status: str, stage: str, error: Optional[str] = None, result: Any = None):
+        job = self._jobs[job_id]
+        job['result'] = result
+        self._update(job_id, status=status, stage=stage, error=error,
+                     progress=1.0 if status == 'succeeded' else job['progress'])
+        if result is not None:
+            if isinstance(result, dict) and job['memory_only']:
+                result = {key: value for key, value in result.items() if key not in job['memory_only']}
+            self._execute("UPDATE jobs SET result = ? WHERE id = ?", (self._dump(result, job_id), job_id))
+        print(f"{'✅' if status == 'succeeded' else '⏹️'} Job {job_id[:8]} {status}")
+
+        with self._lock:
+            self._jobs.move_to_end(job_id)
+            finished = [jid for jid, other in self._jobs.items() if other['status'] in FINISHED_STATES]
+            for old_id in finished[:max(0, len(finished) - self.max_finished_in_memory)]:
+                del self._jobs[old_id]
+
+    @staticmethod
+    def _dump(result: Any, job_id: str) -> Optional[bytes]:
+        """JSON of the result; entries with no safe encoding (live clients, coordinators) are left out"""
+        if not isinstance(result, dict):
+            try:
+                return result_codec.dumps(result)
+            except (TypeError, ValueError):
+                print(f"⚠️ Job {job_id[:8]}: result can't be persisted, kept in memory only")
+                return None
+        kept = result_codec.encode_entries(result)
+        for key in result.keys() - kept.keys():
+            print(f"⚠️ Job {job_id[:8]}: '{key}' kept in memory only")
+        return json.dumps(kept).encode('utf-8')
+
+    @staticmethod
+    def _load(data: Optional[bytes]) -> Any:
+        if data is None:
+            return None
+        try:
+            return result_codec.loads(data)
+        except ValueError:
+            return None  # Not JSON: a result pickled by an older version, which is never unpickled
+
+    def _execute(self, sql: str, params=()) -> List[tuple]:
+        with self._db_lock, self._db:
+            return self._db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: job[key] for key in ('id', 'kind', 'owner', 'status', 'progress', 'stage', 'error',
+                                          'created_at', 'updated_at', 'events')}
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status, progress and events of a job (from memory, or the database for older jobs)"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return {**self._public(job), 'events': list(job['events'])}
+        rows = self._execute("SELECT id, kind, owner, status, progress, stage, error, created_at, updated_at "
+                             "FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        events = self._execute("SELECT at, progress, stage FROM job_events WHERE job_id = ? ORDER BY at", (job_id,))
+        status = dict(zip(('id', 'kind', 'owner', 'status', 'progress', 'stage', 'error', 'created_at', 'updated_at'), rows[0]))
+        status['events'] = [{'at': at, 'progress': progress, 'stage': stage} for at, progress, stage in events]
+        return status
+
+    def result(self, job_id: str) -> Any:
+        """Result of a succeeded job: the live object while in memory, else the persisted copy"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job['result']
+        rows = self._execute("SELECT result FROM jobs WHERE id = ? AND status = 'succeeded'", (job_id,))
+        return self._load(rows[0][0]) if rows else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; running jobs stop at their next stage boundary"""
+        job = self._jobs.get(job_id)
+        if job is None or job['status'] in FINISHED_STATES:
+            return False
+        job['cancel'].set()
+        if job['future'] is not None and job['future'].cancel():
+            self._finish(job_id, 'cancelled', stage='Cancelled')
+        else:
+            self._update(job_id, stage='Cancelling...')
+        return True
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until the job finishes (or timeout) and return its status"""
+        job = self._jobs.get(job_id)
+        if job is not None and job['future'] is not None:
+            try:
+                job['future'].result(timeout)
+            except Exception:
+                pass  # Cancelled futures and timeouts; the status says which
+        return self.status(job_id)
+
+    def jobs(self, owner: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs, optionally of one owner (without events)"""
+        sql = "SELECT id FROM jobs" + (" WHERE owner = ?" if owner else "") + " ORDER BY created_at DESC LIMIT ?"
+        rows = self._execute(sql, (owner, limit) if owner else (limit,))
+        statuses = [self.status(job_id) for (job_id,) in rows]
+        return [{key: value for key, value in status.items() if key != 'events'} for status in statuses if status]
+
+    def purge(self, max_age_seconds: float):
+        """Delete finished jobs older than max_age_seconds from the database"""
+        cutoff = time.time() - max_age_seconds
+        with self._db_lock, self._db:
+            self._db.execute("DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE updated_at < ? "
+                             "AND status IN ('succeeded', 'failed', 'cancelled'))", (cutoff,))
+            self._db.execute("DELETE FROM jobs WHERE updated_at < ? AND status IN ('succeeded', 'failed', 'cancelled')",
+                             (cutoff,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            states = [job['status'] for job in self._jobs.values()]
+        return {
+            'workers': self.workers,
+            'queued': states.count('queued'),
+            'running': states.count('running'),
+            'finished_in_memory': sum(state in FINISHED_STATES for state in states)
+        }
+
+    def shutdown(self):
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+        self._executor.shutdown(wait=True)
+        self._db.close()
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_job_queue(app: str = 'app') -> JobQueue:
+    """
+    Process-wide job queue; JOB_WORKERS sets the pool size (default 2). `app` names the private
+    directory of its database, so the Streamlit app and the API server never share one.
+    """
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue(workers=int(os.getenv("JOB_WORKERS", "2")), app=app)
+        return _default_queue
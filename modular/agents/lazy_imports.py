@@ -0,0 +1,32 @@
+# Lazy Imports
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that performs the real import on first attribute access"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module = None
+
+    def _load(self) -> types.ModuleType:
+        if self._lazy_module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    self._lazy_module = importlib.import_module(self.__name__)
+        return self._lazy_module
+
+    def __getattr__(self, attr: str):
+        # Only called for attributes not set in __init__, i.e. the real module's contents
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> LazyModule:
+    """`px = lazy_import('plotly.express')` defers loading plotly until px is first used"""
+    return LazyModule(name)
@@ -0,0 +1,224 @@
+# Memory Budget
+"""
+Deep memory accounting for datasets, derived results and sessions, with a per-session budget.
+A session over budget has its oldest figures and results pickled to disk and replaced by
+SpilledObject placeholders, which load them back when they are displayed again.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+import os
+import pickle
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+import numpy as np
+import pandas as pd
+from .result_handle import ResultHandle
+from .figure_codec import FigureRef
+
+
+def deep_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Approximate bytes held by obj, following containers, frames, arrays and plotly figures"""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, SpilledObject):
+        return sys.getsizeof(obj)
+    if isinstance(obj, FigureRef):
+        return sys.getsizeof(obj) + obj.nbytes
+    if isinstance(obj, ResultHandle):
+        # Row positions only, unless the handle owns its base frame (e.g. an aggregation result)
+        from .dataset_store import get_dataset_store
+        shared = get_dataset_store().is_stored(obj.base)
+        return sys.getsizeof(obj) + obj.nbytes + (0 if shared else deep_size(obj.base, seen))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(index=True, deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes) + (sum(deep_size(item, seen) for item in obj.flat) if obj.dtype == object else 0)
+    if hasattr(obj, 'to_plotly_json'):
+        return deep_size(obj.to_plotly_json(), seen)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """Resident and peak memory of this process in bytes (None where the platform doesn't say)"""
+    rss = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak if sys.platform == 'darwin' else peak * 1024  # macOS reports bytes, Linux KiB
+    except ImportError:
+        peak = None
+    return {'rss_bytes': rss, 'peak_rss_bytes': peak}
+
+
+class SpilledObject:
+    """Placeholder for an object pickled to disk; the file is deleted with the placeholder"""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size   # Bytes the object held in memory
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+
+    def load(self) -> Any:
+        with open(self.path, 'rb') as f:
+            return pickle.load(f)
+
+    def __repr__(self):
+        return f"SpilledObject({os.path.basename(self.path)}, {self.size / 1e6:.1f} MB)"
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def load_spilled(value: Any) -> Any:
+    """The object itself, loading it back from disk if it was spilled"""
+    return value.load() if isinstance(value, SpilledObject) else value
+
+
+class SpillStore:
+    """
+    Private per-process directory of pickled objects: a fresh 0700 directory (mkdtemp) inside
+    MEMORY_SPILL_DIR or the temp directory, removed with the store. A MEMORY_SPILL_DIR owned by
+    another user, or writable by others, is refused - whoever controls it could swap the files
+    that are unpickled when a chart is shown again.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        parent = directory or os.getenv("MEMORY_SPILL_DIR")
+        if parent:
+            os.makedirs(parent, mode=0o700, exist_ok=True)
+            info = os.stat(parent)
+            if (hasattr(os, 'getuid') and info.st_uid != os.getuid()) or stat.S_IMODE(info.st_mode) & 0o022:
+                raise PermissionError(f"Spill directory {parent} must be owned and only writable by this user")
+        self.directory = tempfile.mkdtemp(prefix="analysis_spill_", dir=parent)
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+        self._lock = threading.Lock()
+        self.spilled_objects = 0
+        self.spilled_bytes = 0
+
+    def spill(self, obj: Any, size: Optional[int] = None) -> SpilledObject:
+        path = os.path.join(self.directory, f"{uuid.uuid4().hex}.pkl")
+        with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        size = size if size is not None else deep_size(obj)
+        with self._lock:
+            self.spilled_objects += 1
+            self.spilled_bytes += size
+        return SpilledObject(path, size)
+
+
+class MemoryBudget:
+    """
+    Per-session memory budget (SESSION_MEMORY_BUDGET_MB, default 512). Callers describe a session
+    as fixed items (always in memory) and spillable slots - (container, key) pairs, oldest first.
+    enforce() measures both and spills slots until the session fits, then records the report.
+    """
+
+    def __init__(self, session_budget_bytes: Optional[int] = None, spill_store: Optional[SpillStore] = None,
+                 report_ttl_seconds: float = 3600):
+        self.session_budget_bytes = session_budget_bytes if session_budget_bytes is not None else \
+            int(float(os.getenv("SESSION_MEMORY_BUDGET_MB", "512")) * (1 << 20))
+        self._spill_store = spill_store
+        self.report_ttl_seconds = report_ttl_seconds
+        self._reports: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def spill_store(self) -> SpillStore:
+        if self._spill_store is None:
+            self._spill_store = SpillStore()
+        return self._spill_store
+
+    def enforce(self, session_id: str, items: Dict[str, Any],
+                spillable: List[Tuple[Any, Any]]) -> Dict[str, Any]:
+        """Spill the oldest slots until the session is within budget; returns the session's memory report"""
+        item_sizes = {name: deep_size(value) for name, value in items.items()}
+        slot_sizes = [deep_size(container[key]) for container, key in spillable]
+        total = sum(item_sizes.values()) + sum(slot_sizes)
+
+        spilled = 0
+        for (container, key), size in zip(spillable, slot_sizes):
+            if total <= self.session_budget_bytes:
+                break
+            if isinstance(container[key], SpilledObject):
+                continue
+            try:
+                container[key] = self.spill_store.spill(container[key], size)
+            except Exception as e:
+                print(f"⚠️ Could not spill {key}: {e}")
+                continue
+            total -= size
+            spilled += 1
+        if spilled:
+            print(f"💾 Session {session_id[:8]}: spilled {spilled} objects to disk, {total / 1e6:.1f} MB in memory")
+
+        report = {
+            'bytes': total,
+            'budget_bytes': self.session_budget_bytes,
+            'items': item_sizes,
+            'spillable_in_memory': sum(1 for container, key in spillable if not isinstance(container[key], SpilledObject)),
+            'spilled': sum(1 for container, key in spillable if isinstance(container[key], SpilledObject)),
+            'over_budget': total > self.session_budget_bytes,
+            'updated_at': time.time()
+        }
+        with self._lock:
+            self._reports[session_id] = report
+        return report
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._reports.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Process-wide view: sessions, datasets and spill totals"""
+        from .dataset_store import get_dataset_store
+
+        cutoff = time.time() - self.report_ttl_seconds
+        with self._lock:
+            for session_id in [sid for sid, report in self._reports.items() if report['updated_at'] < cutoff]:
+                del self._reports[session_id]
+            sessions = {sid[:8]: report['bytes'] for sid, report in self._reports.items()}
+        return {
+            **process_memory(),
+            'session_budget_bytes': self.session_budget_bytes,
+            'sessions': sessions,
+            'sessions_bytes': sum(sessions.values()),
+            'datasets': get_dataset_store().memory(),
+            'spilled_objects': self._spill_store.spilled_objects if self._spill_store else 0,
+            'spilled_bytes': self._spill_store.spilled_bytes if self._spill_store else 0
+        }
+
+
+_default_budget = None
+_default_budget_lock = threading.Lock()
+
+
+def get_memory_budget() -> MemoryBudget:
+    """Process-wide budget and memory report shared by every session"""
+    global _default_budget
+    with _default_budget_lock:
+        if _default_budget is None:
+            _default_budget = MemoryBudget()
+        return _default_budget
@@ -34,7 +34,7 @@ class MetaPromptAgent(BaseAgent):
             'data_shape': df.shape,
             'columns': list(df.columns),
             'numeric_columns': list(df.select_dtypes(include=['number']).columns),
-            'categorical_columns': list(df.select_dtypes(include=['object']).columns),
+            'categorical_columns': list(df.select_dtypes(include=['object', 'string', 'category']).columns),
             'date_columns': list(df.select_dtypes(include=['datetime64']).columns),
             'missing_values': df.isnull().sum().sum(),
             'sample_values': {}
@@ -192,7 +192,7 @@ class MetaPromptAgent(BaseAgent):
 
         # Basic suggestions based on data types
         numeric_cols = df.select_dtypes(include=['number']).columns
-        categorical_cols = df.select_dtypes(include=['object']).columns
+        categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
         date_cols = df.select_dtypes(include=['datetime64']).columns
 
         # Numeric data suggestions
@@ -0,0 +1,144 @@
+# Model Router
+from typing import Dict, Any, List, Optional
+from collections import deque
+import json
+import os
+import threading
+from .rate_limiter import estimate_tokens
+
+# Tiers from cheapest/fastest to most capable. A tier's `max_prompt_tokens` is the largest
+# prompt it is trusted with; bigger prompts move up to the next tier.
+DEFAULT_TIERS = {
+    'fast': {'model': 'gpt-3.5-turbo', 'max_tokens': 400, 'max_prompt_tokens': 3000},
+    'standard': {'model': 'gpt-4', 'max_tokens': 600, 'max_prompt_tokens': None},
+}
+
+# Question strategy (DataAnalystChatbot.analyze_question_intent) -> tier
+DEFAULT_ROUTES = {
+    'performance_analysis': 'fast',
+    'overview_analysis': 'fast',
+    'time_analysis': 'standard',
+    'comparative_analysis': 'standard',
+    'correlation_analysis': 'standard',
+    'general_analysis': 'standard',
+}
+DEFAULT_TIER = 'standard'
+
+
+class TierStats:
+    """Latency and stakeholder feedback for one tier"""
+
+    def __init__(self, window: int = 200):
+        self.calls = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)
+        self.positive = 0
+        self.negative = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        rated = self.positive + self.negative
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'latency_p50': round(latencies[len(latencies) // 2], 3) if latencies else None,
+            'latency_p95': round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+            'positive_feedback': self.positive,
+            'negative_feedback': self.negative,
+            'approval_rate': round(self.positive / rated, 3) if rated else None
+        }
+
+
+class ModelRouter:
+    """
+    Picks the model and completion budget per chat request from the question strategy and
+    prompt size, so ranking/overview questions don't wait on the slowest model.
+
+    Routing tables can be replaced with a JSON file named by MODEL_ROUTING_CONFIG:
+        {"tiers": {"fast": {"model": "gpt-4o-mini", "max_tokens": 400, "max_prompt_tokens": 6000}},
+         "routes": {"time_analysis": "fast"}, "default_tier": "standard"}
+    """
+
+    def __init__(self, tiers: Optional[Dict[str, Dict[str, Any]]] = None,
+                 routes: Optional[Dict[str, str]] = None, default_tier: str = DEFAULT_TIER):
+        self.tiers = {name: dict(tier) for name, tier in (tiers or DEFAULT_TIERS).items()}
+        self.routes = dict(routes or DEFAULT_ROUTES)
+        self.default_tier = default_tier if default_tier in self.tiers else list(self.tiers)[-1]
+        self._stats: Dict[str, TierStats] = {name: TierStats() for name in self.tiers}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path: str) -> 'ModelRouter':
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        tiers = {name: dict(tier) for name, tier in DEFAULT_TIERS.items()}
+        for name, tier in config.get('tiers', {}).items():
+            tiers[name] = {**tiers.get(name, {}), **tier}
+        return cls(tiers, {**DEFAULT_ROUTES, **config.get('routes', {})},
+                   config.get('default_tier', DEFAULT_TIER))
+
+    def route(self, strategy: Dict[str, Any], messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Tier, model and max_tokens for a request"""
+        tier_names = list(self.tiers)
+        tier = self.routes.get(strategy.get('type'), self.default_tier)
+        if tier not in self.tiers:
+            tier = self.default_tier
+
+        # Large prompts (long history, wide data context) escalate to a tier that accepts them
+        prompt_tokens = estimate_tokens(messages, 0)
+        position = tier_names.index(tier)
+        while position < len(tier_names) - 1:
+            limit = self.tiers[tier_names[position]].get('max_prompt_tokens')
+            if limit is None or prompt_tokens <= limit:
+                break
+            position += 1
+        tier = tier_names[position]
+
+        return {
+            'tier': tier,
+            'model': self.tiers[tier]['model'],
+            'max_tokens': self.tiers[tier]['max_tokens'],
+            'prompt_tokens': prompt_tokens
+        }
+
+    def record_latency(self, tier: str, seconds: float, success: bool = True):
+        with self._lock:
+            stats = self._stats.setdefault(tier, TierStats())
+            stats.calls += 1
+            if success:
+                stats.latencies.append(seconds)
+            else:
+                stats.errors += 1
+
+    def record_feedback(self, tier: str, positive: bool):
+        with self._lock:
+            stats = self._stats.setdefault(tier, TierStats())
+            if positive:
+                stats.positive += 1
+            else:
+                stats.negative += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {'model': self.tiers.get(name, {}).get('model'), **stats.to_dict()}
+                for name, stats in self._stats.items()
+            }
+
+
+_default_router = None
+_default_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Process-wide router; loads MODEL_ROUTING_CONFIG when set"""
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            path = os.getenv("MODEL_ROUTING_CONFIG")
+            try:
+                _default_router = ModelRouter.from_config(path) if path else ModelRouter()
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not load routing config {path}: {e}, using default routes")
+                _default_router = ModelRouter()
+        return _default_router
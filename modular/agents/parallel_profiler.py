@@ -0,0 +1,256 @@
+# Parallel Column Profiler
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import multiprocessing
+import threading
+import os
+import numpy as np
+import pandas as pd
+from .incremental_profile import IncrementalDataProfile, RunningStats
+from .dtype_optimizer import observed_counts
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # Categorical columns are then profiled in the parent process
+    pa = None
+    pc = None
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _numeric_column_stats(values: np.ndarray, with_quantiles: bool) -> Dict[str, Any]:
+    null_mask = np.isnan(values)
+    valid = values[~null_mask]
+    stats = {'count': int(valid.size), 'missing': int(null_mask.sum())}
+    if valid.size:
+        mean = float(valid.mean())
+        stats.update({
+            'total': float(valid.sum()),
+            'min': float(valid.min()),
+            'max': float(valid.max()),
+            'mean': mean,
+            'm2': float(((valid - mean) ** 2).sum())
+        })
+        if with_quantiles:
+            stats['quantiles'] = [float(q) for q in np.quantile(valid, QUANTILES)]
+    return stats
+
+
+def _profile_numeric_partition(shm_name: str, n_rows: int, n_columns: int, column_indices: List[int],
+                               with_quantiles: bool) -> List[Dict[str, Any]]:
+    """Worker: profile a slice of the column-major float64 block living in shared memory"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray((n_columns, n_rows), dtype=np.float64, buffer=shm.buf)
+        results = [_numeric_column_stats(block[i], with_quantiles) for i in column_indices]
+        del block  # Views must be released before the segment is closed
+        return results
+    finally:
+        shm.close()
+
+
+def _profile_arrow_partition(shm_name: str, size: int) -> List[Dict[str, Any]]:
+    """Worker: value counts for categorical columns shipped as an Arrow IPC stream in shared memory"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        reader = pa.ipc.open_stream(pa.py_buffer(shm.buf)[:size])
+        table = reader.read_all()
+        results = []
+        for column in table.columns:
+            counts = pc.value_counts(column.drop_null())
+            results.append({
+                'values': counts.field('values').to_pylist(),
+                'counts': counts.field('counts').to_pylist(),
+                'missing': int(column.null_count)
+            })
+        del reader, table, column, counts
+        return results
+    finally:
+        shm.close()
+
+
+class ColumnProfilingExecutor:
+    """
+    Profiles wide dataframes column-partitioned across worker processes.
+    Numeric columns are copied once into a shared-memory block and categorical columns are
+    written as Arrow IPC into shared memory, so the frame itself is never pickled.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, min_columns: int = 64, min_cells: int = 4_000_000):
+        self.max_workers = max_workers or int(os.getenv("PROFILE_WORKERS", "0")) or os.cpu_count() or 1
+        self.min_columns = min_columns
+        # Below this many cells profiling in-process beats starting (and feeding) the worker pool
+        self.min_cells = min_cells
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def should_parallelize(self, df: pd.DataFrame) -> bool:
+        return (self.max_workers > 1 and len(df.columns) >= self.min_columns
+                and len(df) * len(df.columns) >= self.min_cells)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a multi-threaded server process is not safe
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _partitions(self, items: List[Any]) -> List[List[Any]]:
+        count = min(self.max_workers, len(items))
+        return [chunk for chunk in (items[i::count] for i in range(count)) if chunk] if count else []
+
+    def profile_numeric(self, df: pd.DataFrame, columns: List[str], with_quantiles: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Moments and range for numeric columns (quartiles on request, they need a partial sort)"""
+        if not columns:
+            return {}
+
+        n_rows = len(df)
+        shm = shared_memory.SharedMemory(create=True, size=max(n_rows * len(columns) * 8, 1))
+        try:
+            block = np.ndarray((len(columns), n_rows), dtype=np.float64, buffer=shm.buf)
+            for i, col in enumerate(columns):
+                block[i] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+            del block
+
+            pool = self._get_pool()
+            partitions = self._partitions(list(range(len(columns))))
+            futures = [
+                pool.submit(_profile_numeric_partition, shm.name, n_rows, len(columns), indices, with_quantiles)
+                for indices in partitions
+            ]
+
+            results = {}
+            for indices, future in zip(partitions, futures):
+                for index, stats in zip(indices, future.result()):
+                    results[columns[index]] = stats
+            return results
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def profile_categorical(self, df: pd.DataFrame, columns: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Value counts and missing counts for categorical columns"""
+        if not columns:
+            return {}
+
+        if pa is None:
+            return {
+                col: {'counts': observed_counts(df[col]), 'missing': int(df[col].isnull().sum())}
+                for col in columns
+            }
+
+        pool = self._get_pool()
+        segments, jobs = [], []
+        try:
+            serial_columns = []
+            for partition in self._partitions(columns):
+                try:
+                    batch = pa.RecordBatch.from_pandas(df[partition], preserve_index=False)
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    # Mixed-type object columns cannot be shipped as Arrow; count them here
+                    serial_columns.extend(partition)
+                    continue
+
+                # Measure the stream first so it can be written straight into shared memory
+                mock_sink = pa.MockOutputStream()
+                with pa.ipc.new_stream(mock_sink, batch.schema) as writer:
+                    writer.write_batch(batch)
+                size = mock_sink.size()
+
+                shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+                segments.append(shm)
+                with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf)), batch.schema) as writer:
+                    writer.write_batch(batch)
+                del batch, writer
+
+                jobs.append((partition, pool.submit(_profile_arrow_partition, shm.name, size)))
+
+            results = {
+                col: {'counts': observed_counts(df[col]), 'missing': int(df[col].isnull().sum())}
+                for col in serial_columns
+            }
+            for partition, future in jobs:
+                for col, stats in zip(partition, future.result()):
+                    results[col] = {
+                        'counts': pd.Series(stats['counts'], index=stats['values'], dtype='int64'),
+                        'missing': stats['missing']
+                    }
+            return results
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+
+    def build_profile(self, df: pd.DataFrame) -> IncrementalDataProfile:
+        """Exact IncrementalDataProfile computed with the worker pool"""
+        profile = IncrementalDataProfile()
+        profile.set_schema(df)
+        profile.total_rows = len(df)
+
+        for col, stats in self.profile_numeric(df, profile.numeric_columns).items():
+            running = RunningStats()
+            running.count, running.missing = stats['count'], stats['missing']
+            if stats['count']:
+                running.total, running.min, running.max = stats['total'], stats['min'], stats['max']
+                running.mean, running.m2 = stats['mean'], stats['m2']
+            profile.numeric_stats[col] = running
+
+        for col, stats in self.profile_categorical(df, profile.categorical_columns).items():
+            profile.category_counts[col] = stats['counts']
+            profile.category_missing[col] = stats['missing']
+
+        for col in profile.date_columns:
+            values = df[col]
+            profile.merge_date_range(col, {'min': values.min(), 'max': values.max(), 'missing': int(values.isnull().sum())})
+
+        return profile
+
+    def describe(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Missing values per column and a DataFrame.describe()-shaped summary of numeric columns"""
+        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        numeric_stats = self.profile_numeric(df, numeric_cols, with_quantiles=True)
+
+        summary = {}
+        missing_values = {}
+        for col in df.columns:
+            if col in numeric_stats:
+                stats = numeric_stats[col]
+                missing_values[col] = stats['missing']
+                running = RunningStats()
+                running.count, running.m2 = stats['count'], stats.get('m2', 0.0)
+                q25, q50, q75 = stats.get('quantiles', [np.nan] * 3)
+                summary[col] = {
+                    'count': float(stats['count']),
+                    'mean': stats.get('mean', np.nan),
+                    'std': running.std,
+                    'min': stats.get('min', np.nan),
+                    '25%': q25,
+                    '50%': q50,
+                    '75%': q75,
+                    'max': stats.get('max', np.nan)
+                }
+            else:
+                missing_values[col] = int(df[col].isnull().sum())
+
+        return {'missing_values': missing_values, 'summary': summary}
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def get_profiling_executor() -> ColumnProfilingExecutor:
+    """Process-wide executor so the worker pool is started once and reused"""
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ColumnProfilingExecutor()
+        return _default_executor
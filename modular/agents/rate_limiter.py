@@ -0,0 +1,225 @@
+# OpenAI Rate Limiter
+from typing import Dict, Any, Callable, Optional
+import json
+import os
+import random
+import threading
+import time
+
+# Requests / tokens per minute per model; override with OPENAI_RATE_LIMITS='{"gpt-4": {"rpm": 500, "tpm": 30000}}'
+DEFAULT_LIMITS = {
+    'gpt-4': {'rpm': 500, 'tpm': 10_000},
+    'gpt-3.5-turbo': {'rpm': 3_500, 'tpm': 200_000},
+}
+FALLBACK_LIMITS = {'rpm': 500, 'tpm': 30_000}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Refills at `per_minute` / 60 per second up to `capacity`; reservations may go into debt"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take `amount` now and return how many seconds the caller must wait before using it"""
+        if self.rate <= 0:
+            return 0.0  # Unlimited
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            return max(-self.tokens / self.rate, 0.0)
+
+    def take(self, amount: float = 1):
+        """Blocking reserve"""
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+    def refund(self, amount: float):
+        """Give back (or, negative, charge) tokens once the real usage is known"""
+        if self.rate <= 0:
+            return
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: +1/limit per successful call (about +1 per round trip of calls),
+    halved on throttling at most once per `cooldown` seconds so one burst of 429s counts once
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 64, cooldown: float = 2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False, success: bool = True):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self._last_decrease = now
+            elif success:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class ModelRateLimiter:
+    """Request and token budgets plus adaptive concurrency for one model, shared by all agents"""
+
+    def __init__(self, model: str, rpm: float, tpm: float, max_concurrency: int = 64):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(initial=min(8, max_concurrency), maximum=max_concurrency)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled_calls = 0
+
+    def pause(self, seconds: float):
+        """Server asked us to back off (Retry-After): hold every new call for this model"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self, estimated_tokens: int):
+        with self._lock:
+            paused_for = self._paused_until - time.monotonic()
+        if paused_for > 0:
+            time.sleep(paused_for)
+        self.requests.take(1)
+        self.tokens.take(estimated_tokens)
+        self.concurrency.acquire()
+
+    def release(self, estimated_tokens: int, used_tokens: Optional[int], throttled: bool = False, success: bool = True):
+        if used_tokens is not None:
+            self.tokens.refund(estimated_tokens - used_tokens)
+        if throttled:
+            self.throttled_calls += 1
+        self.concurrency.release(throttled=throttled, success=success)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'model': self.model,
+            'concurrency_limit': round(self.concurrency.limit, 2),
+            'in_flight': self.concurrency.in_flight,
+            'throttled_calls': self.throttled_calls
+        }
+
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _configured_limits(model: str) -> Dict[str, float]:
+    limits = dict(DEFAULT_LIMITS.get(model, FALLBACK_LIMITS))
+    overrides = os.getenv("OPENAI_RATE_LIMITS")
+    if overrides:
+        try:
+            limits.update(json.loads(overrides).get(model, {}))
+        except (ValueError, AttributeError):
+            print("⚠️ OPENAI_RATE_LIMITS is not valid JSON, using default limits")
+    return limits
+
+
+def get_rate_limiter(model: str) -> ModelRateLimiter:
+    """Process-wide limiter per model"""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limits = _configured_limits(model)
+            limiter = ModelRateLimiter(model, limits['rpm'], limits['tpm'],
+                                       int(os.getenv("OPENAI_MAX_CONCURRENCY", "64")))
+            _limiters[model] = limiter
+        return limiter
+
+
+def estimate_tokens(messages: list, max_tokens: int) -> int:
+    """Rough budget for a call: ~4 characters per prompt token plus the completion allowance"""
+    prompt_chars = sum(len(str(message.get('content', ''))) for message in messages)
+    return prompt_chars // 4 + len(messages) * 4 + max_tokens
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None and getattr(error, 'response', None) is not None:
+        status = getattr(error.response, 'status_code', None)
+    return status
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the Retry-After / retry-after-ms headers of an API error, if present"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if type(error).__name__ in ('APIConnectionError', 'APITimeoutError'):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS
+
+
+def call_with_rate_limit(call: Callable[[], Any], model: str, estimated_tokens: int,
+                         max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0) -> Any:
+    """
+    Run an OpenAI call under the model's limiter, retrying transient failures with
+    full-jitter exponential backoff (or the server's Retry-After when it sends one)
+    """
+    limiter = get_rate_limiter(model)
+
+    for attempt in range(max_retries + 1):
+        limiter.acquire(estimated_tokens)
+        try:
+            response = call()
+        except Exception as e:
+            throttled = _status_code(e) == 429
+            limiter.release(estimated_tokens, None, throttled=throttled, success=False)
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+
+            delay = _retry_after(e)
+            if delay is None:
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if throttled:
+                limiter.pause(delay)
+            print(f"⏳ {model}: {type(e).__name__}, retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        usage = getattr(response, 'usage', None)
+        limiter.release(estimated_tokens, getattr(usage, 'total_tokens', None))
+        return response
@@ -0,0 +1,74 @@
+# LLM Request Coalescer
+from typing import Dict, Any, Callable
+from concurrent.futures import Future
+import hashlib
+import json
+import threading
+
+
+def request_key(model: str, messages: list, **params) -> str:
+    """Identity of a completion request: same model, messages and sampling params"""
+    payload = json.dumps({'model': model, 'messages': messages, 'params': params},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution: the first caller runs it,
+    the others wait on its future and get the same result (or exception). Nothing is
+    cached - once the call finishes the next caller with that key runs it again.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, call: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'in_flight': len(self._in_flight),
+                'executed': self.executed,
+                'coalesced': self.coalesced
+            }
+
+
+_default_flight = None
+_default_flight_lock = threading.Lock()
+
+
+def get_request_coalescer() -> SingleFlight:
+    """Process-wide coalescer shared by every agent and session"""
+    global _default_flight
+    with _default_flight_lock:
+        if _default_flight is None:
+            _default_flight = SingleFlight()
+        return _default_flight
@@ -0,0 +1,136 @@
+# Result Codec
+"""
+JSON encoding of job results for the job database, in place of pickle: loading a stored result
+never runs code. Plain JSON values pass through; result handles over a stored dataset are
+their dataset key and row positions, frames and series Arrow IPC streams, figures their
+compressed typed-array JSON (FigureRef), numpy arrays their raw bytes, and tuples, timestamps
+and non-string dict keys are tagged objects. Anything else raises TypeError, and the caller
+keeps that value in memory only.
+"""
+from typing import Any, Dict
+import base64
+import datetime
+import json
+import numpy as np
+import pandas as pd
+from .figure_codec import FigureRef
+from .result_handle import ResultHandle
+
+TYPE_KEY = '__type__'
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii')
+
+
+def _frame_to_arrow(df: pd.DataFrame) -> str:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return _b64(sink.getvalue().to_pybytes())
+
+
+def _arrow_to_frame(data: str) -> pd.DataFrame:
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(base64.b64decode(data)).read_pandas()
+
+
+def encode(value: Any) -> Any:
+    """JSON-compatible form of value; TypeError for types with no safe encoding"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic) and not isinstance(value, (np.datetime64, np.timedelta64)):
+        return value.item()
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value) and TYPE_KEY not in value:
+            return {key: encode(item) for key, item in value.items()}
+        return {TYPE_KEY: 'dict', 'items': [[encode(key), encode(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [encode(item) for item in value]
+    if isinstance(value, tuple):
+        return {TYPE_KEY: 'tuple', 'items': [encode(item) for item in value]}
+    if isinstance(value, ResultHandle):
+        key = value.dataset_key()
+        if key is not None:
+            # Rebound to the stored dataset on load instead of writing out its rows
+            return {TYPE_KEY: 'result_handle', 'dataset': key, 'rows': encode(value.rows),
+                    'columns': encode(value._columns), 'schema': encode(list(value.columns))}
+        return {TYPE_KEY: 'frame', 'arrow': _frame_to_arrow(value.to_frame().reset_index(drop=True)), 'handle': True}
+    if isinstance(value, pd.DataFrame):
+        return {TYPE_KEY: 'frame', 'arrow': _frame_to_arrow(value)}
+    if isinstance(value, pd.Series):
+        return {TYPE_KEY: 'series', 'name': encode(value.name), 'arrow': _frame_to_arrow(value.to_frame('values'))}
+    if isinstance(value, FigureRef):
+        return {TYPE_KEY: 'figure', 'blob': _b64(value.blob), 'json_bytes': value.json_bytes}
+    if hasattr(value, 'to_plotly_json'):
+        return encode(FigureRef.from_figure(value))
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'biufcmM':
+        return {TYPE_KEY: 'ndarray', 'dtype': value.dtype.str, 'shape': list(value.shape),
+                'data': _b64(np.ascontiguousarray(value).tobytes())}
+    if isinstance(value, (pd.Timestamp, datetime.datetime)):
+        return {TYPE_KEY: 'datetime', 'value': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {TYPE_KEY: 'date', 'value': value.isoformat()}
+    if isinstance(value, (pd.Timedelta, datetime.timedelta)):
+        return {TYPE_KEY: 'timedelta', 'value': pd.Timedelta(value).isoformat()}
+    raise TypeError(f"{type(value).__name__} can't be stored")
+
+
+def decode(value: Any) -> Any:
+    """Inverse of encode (frames and result handles come back as DataFrames / handles over them)"""
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    kind = value.get(TYPE_KEY)
+    if kind is None:
+        return {key: decode(item) for key, item in value.items()}
+    if kind == 'dict':
+        return {_hashable(decode(key)): decode(item) for key, item in value['items']}
+    if kind == 'tuple':
+        return tuple(decode(item) for item in value['items'])
+    if kind == 'frame':
+        frame = _arrow_to_frame(value['arrow'])
+        return ResultHandle(frame) if value.get('handle') else frame
+    if kind == 'result_handle':
+        return ResultHandle.rebind(value['dataset'], decode(value['rows']), decode(value['columns']), decode(value['schema']))
+    if kind == 'series':
+        return _arrow_to_frame(value['arrow'])['values'].rename(decode(value['name']))
+    if kind == 'figure':
+        return FigureRef(base64.b64decode(value['blob']), value['json_bytes'])
+    if kind == 'ndarray':
+        return np.frombuffer(base64.b64decode(value['data']), dtype=np.dtype(value['dtype'])).reshape(value['shape'])
+    if kind == 'datetime':
+        return pd.Timestamp(value['value'])
+    if kind == 'date':
+        return datetime.date.fromisoformat(value['value'])
+    if kind == 'timedelta':
+        return pd.Timedelta(value['value'])
+    raise ValueError(f"Unknown stored type '{kind}'")
+
+
+def _hashable(key: Any) -> Any:
+    return tuple(_hashable(item) for item in key) if isinstance(key, list) else key
+
+
+def dumps(value: Any) -> bytes:
+    return json.dumps(encode(value)).encode('utf-8')
+
+
+def loads(data: bytes) -> Any:
+    return decode(json.loads(data))
+
+
+def encode_entries(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Encoded entries of a dict result, leaving out the ones with no safe encoding"""
+    encoded = {}
+    for key, value in result.items():
+        try:
+            encoded[key] = encode(value)
+        except (TypeError, ValueError):
+            continue
+    return encoded
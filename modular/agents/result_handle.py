@@ -0,0 +1,187 @@
+# Result Handles
+"""
+Lazy results over a shared base frame: positions of the selected rows plus a column projection.
+Filters and sorts return a handle instead of a copy; only the slice a caller asks for (a page,
+a column, an export) is materialised. Persisting a handle (job results in SQLite, spilled
+session state) never writes the base frame: a handle over a dataset-store dataset keeps the
+dataset key and row positions and is rebound to the stored frame on load; any other handle
+keeps just its selected rows.
+"""
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, Union
+import io
+import numpy as np
+import pandas as pd
+from .dataset_store import get_dataset_store
+
+
+class ResultHandle:
+    """Row positions (None = all rows, in order) and columns (None = all) over `base`"""
+
+    def __init__(self, base: pd.DataFrame, rows: Optional[Sequence[int]] = None,
+                 columns: Optional[Sequence[Any]] = None):
+        self.base = base
+        # int32 positions halve the handle's size for any frame under 2**31 rows
+        position_type = np.int32 if len(base) < 2 ** 31 else np.int64
+        self.rows = None if rows is None else np.asarray(rows, dtype=position_type)
+        self._columns = None if columns is None else list(columns)
+        self._dataset = None  # Store handle keeping the base dataset alive (rebound handles)
+
+    @classmethod
+    def wrap(cls, value: Any) -> Any:
+        """Frames become handles over themselves; handles and other values pass through"""
+        return cls(value) if isinstance(value, pd.DataFrame) else value
+
+    @classmethod
+    def from_mask(cls, base: pd.DataFrame, mask: Union[pd.Series, np.ndarray]) -> 'ResultHandle':
+        mask = mask.to_numpy(dtype=bool, na_value=False) if isinstance(mask, pd.Series) else np.asarray(mask, dtype=bool)
+        return cls(base, np.flatnonzero(mask))
+
+    @classmethod
+    def sorted_by(cls, base: pd.DataFrame, column: Any, ascending: bool = True) -> 'ResultHandle':
+        """Handle over base ordered by column (stable, missing values last) - the frame isn't copied"""
+        order = base[column].reset_index(drop=True).sort_values(
+            ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        return cls(base, order)
+
+    @classmethod
+    def rebind(cls, key: str, rows: Optional[np.ndarray], columns: Optional[List[Any]],
+               schema: List[Any]) -> 'ResultHandle':
+        """Handle over the stored dataset `key` again; empty (with the same columns) if it was evicted"""
+        dataset = get_dataset_store().acquire(key)
+        if dataset is None:
+            print(f"⚠️ Result over dataset {key[:8]} is no longer available, the dataset was evicted")
+            return cls(pd.DataFrame(columns=schema))
+        handle = cls(dataset.data, rows, columns)
+        handle._dataset = dataset
+        return handle
+
+    def dataset_key(self) -> Optional[str]:
+        """Key of the stored dataset this handle is over, or None for a frame of its own"""
+        return get_dataset_store().key_of(self.base)
+
+    # Shape and schema, answered without materialising anything
+
+    def __len__(self) -> int:
+        return len(self.base) if self.rows is None else len(self.rows)
+
+    def count(self) -> int:
+        return len(self)
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.base.columns if self._columns is None else pd.Index(self._columns)
+
+    @property
+    def dtypes(self) -> pd.Series:
+        return self.base.dtypes if self._columns is None else self.base.dtypes[self._columns]
+
+    @property
+    def shape(self):
+        return len(self), len(self.columns)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0 or len(self.columns) == 0
+
+    @property
+    def nbytes(self) -> int:
+        """Memory the handle itself adds on top of the shared base frame"""
+        return self.rows.nbytes if self.rows is not None else 0
+
+    # Narrowing: new handles over the same base
+
+    def select(self, columns: Sequence[Any]) -> 'ResultHandle':
+        missing = [col for col in columns if col not in self.columns]
+        if missing:
+            raise KeyError(f"Unknown columns: {missing}")
+        return ResultHandle(self.base, self.rows, columns)
+
+    def select_dtypes(self, include=None, exclude=None) -> 'ResultHandle':
+        """Column projection by dtype, like DataFrame.select_dtypes (reads only the schema)"""
+        schema = self.base.iloc[:0][list(self.columns)]
+        return self.select(list(schema.select_dtypes(include=include, exclude=exclude).columns))
+
+    def take(self, positions: Sequence[int]) -> 'ResultHandle':
+        """Handle over some of this handle's rows (positions relative to the handle)"""
+        positions = np.asarray(positions, dtype=np.int64)
+        return ResultHandle(self.base, positions if self.rows is None else self.rows[positions], self._columns)
+
+    # Materialisation of exactly the requested slice
+
+    def _frame(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        frame = self.base if self._columns is None else self.base[self._columns]
+        if self.rows is None:
+            return frame.iloc[start:stop]
+        return frame.iloc[self.rows[start:stop]]
+
+    def __getitem__(self, column: Any) -> pd.Series:
+        """One column of the selected rows"""
+        if column not in self.columns:
+            raise KeyError(column)
+        values = self.base[column]
+        return values if self.rows is None else values.iloc[self.rows]
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        return self._frame(0, max(0, n))
+
+    def page(self, page: int = 0, page_size: int = 25) -> Dict[str, Any]:
+        """One page of rows plus paging metadata (same shape as DataPreview.page)"""
+        page_size = max(1, int(page_size))
+        pages = max(1, -(-len(self) // page_size))
+        page = min(max(0, int(page)), pages - 1)
+        start = page * page_size
+        return {
+            'data': self._frame(start, start + page_size),
+            'page': page,
+            'pages': pages,
+            'page_size': page_size,
+            'start': start,
+            'matching_rows': len(self),
+            'total_rows': len(self.base)
+        }
+
+    def iter_chunks(self, chunk_size: int = 50_000) -> Iterator[pd.DataFrame]:
+        for start in range(0, len(self), chunk_size):
+            yield self._frame(start, start + chunk_size)
+
+    def to_frame(self) -> pd.DataFrame:
+        """The whole result as a DataFrame (a copy of the selected rows; the base itself when unsliced)"""
+        return self._frame()
+
+    def to_csv(self, path_or_buf: Union[str, IO[str], None] = None, index: bool = False,
+               chunk_size: int = 50_000) -> Optional[str]:
+        """Write the result as CSV chunk by chunk (returns the text when no path or buffer is given)"""
+        if path_or_buf is None:
+            buffer = io.StringIO()
+            self.to_csv(buffer, index, chunk_size)
+            return buffer.getvalue()
+        if isinstance(path_or_buf, str):
+            with open(path_or_buf, 'w', encoding='utf-8', newline='') as f:
+                return self.to_csv(f, index, chunk_size)
+        self.head(0).to_csv(path_or_buf, index=index)
+        for chunk in self.iter_chunks(chunk_size):
+            chunk.to_csv(path_or_buf, index=index, header=False)
+        return None
+
+    def export(self, fmt: str = 'csv', chunk_size: int = 50_000) -> Union[str, List[Dict[str, Any]]]:
+        """The result as CSV text or JSON records, built chunk by chunk"""
+        if fmt == 'csv':
+            return self.to_csv(chunk_size=chunk_size)
+        if fmt == 'records':
+            return [record for chunk in self.iter_chunks(chunk_size) for record in chunk.to_dict('records')]
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    def __reduce__(self):
+        # Over a stored dataset: its key and the positions. Otherwise the selected slice only
+        key = self.dataset_key()
+        if key is not None:
+            return ResultHandle.rebind, (key, self.rows, self._columns, list(self.columns))
+        return ResultHandle, (self.to_frame().reset_index(drop=True),)
+
+    def __repr__(self):
+        return f"ResultHandle({len(self)} of {len(self.base)} rows, {len(self.columns)} columns)"
+
+
+def as_frame(value: Any) -> Any:
+    """A DataFrame for code that needs the full pandas API; other values pass through"""
+    return value.to_frame() if isinstance(value, ResultHandle) else value
@@ -0,0 +1,226 @@
+# Semantic Answer Cache
+"""
+Reuses analyst answers for rephrased questions ("revenue by region" / "how much did each
+region sell"). Questions are normalised (synonyms, stop words, word order), embedded as
+hashed character n-grams and looked up in a per-dataset random-hyperplane LSH index.
+A hit needs cosine similarity above the threshold *and* the same strategy type, named
+columns and numbers, so "top 5 by sales" never answers "top 10 by profit".
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+import os
+import re
+import threading
+import numpy as np
+
+# Business synonyms folded onto one term; a word is left alone when it names a column itself
+SYNONYMS = {
+    'revenue': 'sales', 'revenues': 'sales', 'sell': 'sales', 'sold': 'sales', 'selling': 'sales',
+    'turnover': 'sales', 'earn': 'sales', 'earned': 'sales',
+    'avg': 'average', 'mean': 'average',
+    'sum': 'total', 'overall': 'total',
+    'highest': 'top', 'best': 'top', 'largest': 'top', 'biggest': 'top', 'leading': 'top',
+    'lowest': 'bottom', 'worst': 'bottom', 'smallest': 'bottom',
+    'per': 'by', 'each': 'by', 'every': 'by', 'across': 'by',
+    'customers': 'customer', 'products': 'product', 'regions': 'region', 'categories': 'category',
+}
+
+STOP_WORDS = {
+    'a', 'an', 'the', 'of', 'for', 'to', 'in', 'on', 'is', 'are', 'was', 'were', 'be', 'do', 'does',
+    'did', 'me', 'us', 'our', 'we', 'i', 'you', 'please', 'show', 'give', 'tell', 'what', 'whats',
+    'which', 'how', 'much', 'many', 'can', 'could', 'would', 'list', 'display', 'get', 'find', 'have', 'has'
+}
+
+# Follow-ups that depend on the conversation ("what about them?") are never cached
+REFERENTIAL_PATTERN = re.compile(
+    r"^(?:and|also|what about|how about)\b|\b(?:it|its|that|those|them|this|these|they|same|previous|above|again)\b"
+)
+
+
+class QuestionNormalizer:
+    """Canonical form of a question: lower case, synonyms folded, stop words dropped, words sorted"""
+
+    def __init__(self, synonyms: Optional[Dict[str, str]] = None):
+        self.synonyms = synonyms if synonyms is not None else SYNONYMS
+
+    def normalize(self, question: str, columns: List[str] = ()) -> str:
+        column_words = {word for column in columns for word in re.split(r'[\W_]+', str(column).lower()) if word}
+        words = []
+        for word in re.findall(r"[a-z0-9]+", question.lower()):
+            if word in STOP_WORDS:
+                continue
+            if word not in column_words:
+                word = self.synonyms.get(word, word)
+            words.append(word)
+        return ' '.join(sorted(words))
+
+
+class LSHIndex:
+    """Random-hyperplane LSH over sparse vectors: `tables` hash tables of `bits`-bit signatures"""
+
+    def __init__(self, planes: np.ndarray, tables: int = 8, bits: int = 8):
+        assert planes.shape[1] == tables * bits
+        self.tables = tables
+        self.bits = bits
+        self.planes = planes  # (n_features, tables * bits), shared between indexes
+        self._weights = (1 << np.arange(bits)).astype(np.int64)
+        self._buckets: List[Dict[int, set]] = [{} for _ in range(tables)]
+
+    def signatures(self, vector) -> np.ndarray:
+        projected = np.asarray(vector @ self.planes).reshape(self.tables, self.bits) > 0
+        return projected.astype(np.int64) @ self._weights
+
+    def add(self, item_id: int, vector):
+        for table, signature in enumerate(self.signatures(vector)):
+            self._buckets[table].setdefault(int(signature), set()).add(item_id)
+
+    def remove(self, item_id: int, vector):
+        for table, signature in enumerate(self.signatures(vector)):
+            bucket = self._buckets[table].get(int(signature))
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del self._buckets[table][int(signature)]
+
+    def candidates(self, vector) -> set:
+        found = set()
+        for table, signature in enumerate(self.signatures(vector)):
+            found |= self._buckets[table].get(int(signature), set())
+        return found
+
+
+class _DatasetCache:
+    """Entries and index for one dataset fingerprint"""
+
+    def __init__(self, planes: np.ndarray):
+        self.entries: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self.index = LSHIndex(planes)
+        self.next_id = 0
+
+
+class SemanticCache:
+    """
+    Per-dataset cache of chatbot answers with approximate nearest-neighbour lookup.
+    Small caches are scanned exactly; from `exact_scan_limit` entries on, only LSH candidates are scored.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, max_entries: int = 1000, max_datasets: int = 64,
+                 n_features: int = 1 << 14, exact_scan_limit: int = 256):
+        self.threshold = threshold if threshold is not None else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+        self.max_entries = max_entries
+        self.max_datasets = max_datasets
+        self.n_features = n_features
+        self.exact_scan_limit = exact_scan_limit
+        self.normalizer = QuestionNormalizer()
+        self._vectorizer = None
+        self._planes = np.random.default_rng(0).standard_normal((n_features, 64)).astype(np.float32)
+        self._datasets: 'OrderedDict[str, _DatasetCache]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer  # Deferred: sklearn is slow to import
+            self._vectorizer = HashingVectorizer(analyzer='char_wb', ngram_range=(3, 5), n_features=self.n_features,
+                                                 alternate_sign=False, norm='l2')
+        return self._vectorizer
+
+    @staticmethod
+    def cacheable(question: str) -> bool:
+        return not REFERENTIAL_PATTERN.search(question.lower())
+
+    @staticmethod
+    def _guard(normalized: str, strategy: Dict[str, Any], columns: List[str]) -> Tuple:
+        """
+        What must match exactly besides the wording: strategy type, the columns named (after
+        synonym folding, so 'revenue' counts as a Sales column) and any numbers
+        """
+        words = set(normalized.split())
+        named = sorted(str(column) for column in columns
+                       if set(re.split(r'[\W_]+', str(column).lower())) - {''} <= words)
+        return (strategy.get('type'), tuple(named), tuple(sorted(re.findall(r'\d+(?:\.\d+)?', normalized))))
+
+    def _embed(self, question: str, strategy: Dict[str, Any], columns: List[str]):
+        normalized = self.normalizer.normalize(question, columns)
+        return self.vectorizer.transform([normalized]), self._guard(normalized, strategy, columns)
+
+    def lookup(self, dataset_key: str, question: str, strategy: Dict[str, Any],
+               columns: List[str]) -> Optional[Dict[str, Any]]:
+        """Cached answer for a question close enough to an earlier one on the same dataset, or None"""
+        if not self.cacheable(question):
+            return None
+        vector, guard = self._embed(question, strategy, columns)
+
+        with self._lock:
+            cache = self._datasets.get(dataset_key)
+            best_id, best_score = None, 0.0
+            if cache is not None:
+                self._datasets.move_to_end(dataset_key)
+                ids = list(cache.entries) if len(cache.entries) < self.exact_scan_limit else cache.index.candidates(vector)
+                for entry_id in ids:
+                    entry = cache.entries[entry_id]
+                    if entry['guard'] != guard:
+                        continue
+                    score = float(vector.multiply(entry['vector']).sum())
+                    if score > best_score:
+                        best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            cache.entries.move_to_end(best_id)
+            entry = cache.entries[best_id]
+            return {**entry['answer'], 'similarity': round(best_score, 3), 'cached_question': entry['question']}
+
+    def store(self, dataset_key: str, question: str, strategy: Dict[str, Any], columns: List[str],
+              answer: Dict[str, Any]):
+        if not self.cacheable(question):
+            return
+        vector, guard = self._embed(question, strategy, columns)
+        with self._lock:
+            cache = self._datasets.get(dataset_key)
+            if cache is None:
+                cache = self._datasets[dataset_key] = _DatasetCache(self._planes)
+                while len(self._datasets) > self.max_datasets:
+                    self._datasets.popitem(last=False)
+            self._datasets.move_to_end(dataset_key)
+
+            entry_id = cache.next_id
+            cache.next_id += 1
+            cache.entries[entry_id] = {'question': question, 'guard': guard,
+                                       'vector': vector, 'answer': answer}
+            cache.index.add(entry_id, vector)
+            while len(cache.entries) > self.max_entries:
+                old_id, old_entry = cache.entries.popitem(last=False)
+                cache.index.remove(old_id, old_entry['vector'])
+
+    def invalidate(self, dataset_key: str):
+        with self._lock:
+            self._datasets.pop(dataset_key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'datasets': len(self._datasets),
+                'entries': sum(len(cache.entries) for cache in self._datasets.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Process-wide answer cache shared by every session"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SemanticCache()
+        return _default_cache
@@ -0,0 +1,130 @@
+# Top-N Engine
+"""
+Top/bottom-N selection without sorting whole columns. np.partition finds the N-th value in
+linear time; only the rows that beat it, plus the ties it needs, are sorted. Per-group top-K
+buckets rows by group code once and selects inside each group. Every result is bounded: row
+results are ResultHandles over the source frame with at most `limit` rows.
+"""
+from typing import Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+from .aggregation_engine import factorize_groups, group_aggregate, Key
+from .result_handle import ResultHandle
+
+# Upper bound on returned rows, including ties and every group of a per-group ranking
+DEFAULT_LIMIT = 1000
+
+TIES = ('first', 'all')
+
+
+def _ranking_values(values: Union[pd.Series, np.ndarray]) -> np.ndarray:
+    """Values as a numpy array that compares like the column (NaN for missing)"""
+    if isinstance(values, pd.Series):
+        if pd.api.types.is_integer_dtype(values.dtype) and not values.hasnans:
+            return values.to_numpy(dtype=np.int64)
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            stamps = values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            return stamps if not values.hasnans else np.where(values.isnull(), np.nan, stamps.astype(np.float64))
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(values)
+
+
+def top_positions(values: Union[pd.Series, np.ndarray], n: int, ascending: bool = False,
+                  ties: str = 'first', limit: Optional[int] = None) -> np.ndarray:
+    """
+    Positions of the n largest (ascending=False) or smallest values, best first. Missing values
+    never rank. ties='first' breaks ties at the cut by position (like nlargest's keep='first');
+    ties='all' keeps every row tied with the n-th value, up to `limit` rows.
+    """
+    if ties not in TIES:
+        raise ValueError(f"ties must be one of {TIES}")
+    array = _ranking_values(values)
+    positions = None
+    if array.dtype.kind == 'f':
+        present = ~np.isnan(array)
+        if not present.all():
+            positions = np.flatnonzero(present)
+            array = array[positions]
+    n = max(0, int(n))
+    if n == 0 or len(array) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if n >= len(array):
+        candidates = np.arange(len(array))
+    else:
+        kth = len(array) - n if not ascending else n - 1
+        threshold = np.partition(array, kth)[kth]
+        better = np.flatnonzero(array > threshold if not ascending else array < threshold)
+        tied = np.flatnonzero(array == threshold)
+        if ties == 'first':
+            tied = tied[:n - len(better)]
+        candidates = np.sort(np.concatenate([better, tied]))
+
+    # Stable sort of the few candidates (in row order already, so equal values keep it);
+    # ~x reverses integers without the overflow of -x
+    key = array[candidates]
+    if not ascending:
+        key = ~key if key.dtype.kind == 'i' else -key
+    result = candidates[np.argsort(key, kind='stable')]
+    if limit is not None:
+        result = result[:limit]
+    return result if positions is None else positions[result]
+
+
+def top_n(df: pd.DataFrame, column: str, n: int, ascending: bool = False, ties: str = 'first',
+          limit: int = DEFAULT_LIMIT) -> ResultHandle:
+    """Top (or bottom) n rows of df by column, best first, as a handle over df"""
+    return ResultHandle(df, top_positions(df[column], n, ascending, ties, limit))
+
+
+def top_n_per_group(df: pd.DataFrame, by: Union[Key, Sequence[Key]], column: str, k: int,
+                    ascending: bool = False, ties: str = 'first', limit: int = DEFAULT_LIMIT) -> ResultHandle:
+    """
+    Top (or bottom) k rows of every group, groups in key order and rows best first within each,
+    as a handle over df. Rows with a missing key or value are left out.
+    """
+    groups = factorize_groups(df, by)
+    array = _ranking_values(df[column])
+    codes = groups.codes
+    # Bucket row positions by group in one pass: a stable argsort on the narrowest code type
+    code_type = np.int16 if groups.groups < 2 ** 15 else np.int32 if groups.groups < 2 ** 31 else np.int64
+    order = np.argsort(codes.astype(code_type), kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(groups.groups + 1))
+
+    selected = []
+    total = 0
+    for group in range(groups.groups):
+        members = order[bounds[group]:bounds[group + 1]]
+        if len(members) == 0:
+            continue
+        best = members[top_positions(array[members], k, ascending, ties)]
+        selected.append(best[:limit - total])
+        total += len(selected[-1])
+        if total >= limit:
+            break
+    rows = np.concatenate(selected) if selected else np.empty(0, dtype=np.int64)
+    return ResultHandle(df, rows)
+
+
+def top_values(df: pd.DataFrame, column: str, n: int, metric: Optional[str] = None,
+               aggregation: str = 'sum', ascending: bool = False, ties: str = 'first',
+               limit: int = DEFAULT_LIMIT) -> pd.DataFrame:
+    """
+    Top (or bottom) n values of a column ranked by row count, or by an aggregated metric
+    ("top 5 products by sales"): one row per value, never the underlying rows.
+    """
+    values = group_aggregate(df, column, metric, aggregation if metric else 'size')
+    best = top_positions(values, n, ascending, ties, limit)
+    name = 'count' if metric is None else f"{metric}_{aggregation}"
+    return values.iloc[best].rename(name).reset_index()
+
+
+def top_values_per_group(df: pd.DataFrame, by: Key, column: str, k: int, metric: Optional[str] = None,
+                         aggregation: str = 'sum', ascending: bool = False, ties: str = 'first',
+                         limit: int = DEFAULT_LIMIT) -> pd.DataFrame:
+    """Top (or bottom) k values of a column within each group ("top 3 products per region by sales")"""
+    values = group_aggregate(df, [by, column], metric, aggregation if metric else 'size')
+    name = 'count' if metric is None else f"{metric}_{aggregation}"
+    table = values.rename(name).reset_index()
+    return top_n_per_group(table, by, name, k, ascending, ties, limit).to_frame().reset_index(drop=True)
+
@@ -1,6 +1,12 @@
 # Two-Model System Coordinator
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Callable
+import threading
+import uuid
 import pandas as pd
+from .incremental_profile import align_to_schema
+from .dtype_optimizer import optimize_dtypes, concat_rows
+from .correlation_engine import get_correlation_engine
+from .dataset_store import get_dataset_store
 from .data_context_analyzer import DataContextAnalyzer  # Model 2
 from .data_analyst_chatbot import DataAnalystChatbot      # Model 1
 
@@ -13,9 +19,20 @@ class TwoModelCoordinator:
 
     def __init__(self, openai_api_key: str):
         self.api_key = openai_api_key
-        self.current_data = None
+        self.dataset = None  # Handle into the process-wide dataset store
+        self._unstored_data = None  # A provisional load's frame until the refinement stores it
         self.data_context_ready = False
 
+        # Two-phase profiling: large uploads get a sample-based prompt first and the
+        # exact profile is swapped in from a background thread
+        self.fast_profile_row_threshold = 200_000
+        self.fast_profile_sample_size = 20_000
+        self.profile_status = 'none'     # 'none', 'provisional' or 'exact'
+        self.dtype_report = None         # Memory before/after the dtype optimization of the loaded data
+        self._profile_generation = 0     # Bumped on every load so stale refinements are dropped
+        self._refine_thread = None
+        self._state_lock = threading.Lock()  # Guards the generation check and the swap of a refined profile
+
         # Initialize the two models
         print("🚀 Initializing 2-Model System...")
         self.model_2_context_analyzer = DataContextAnalyzer()  # Model 2: Data Context
@@ -26,25 +43,90 @@ class TwoModelCoordinator:
 
         print("✅ 2-Model System initialized successfully")
 
-    def load_data(self, df: pd.DataFrame) -> Dict[str, Any]:
+    @property
+    def current_data(self) -> Optional[pd.DataFrame]:
+        """This session's view of the loaded dataset; the frame itself is shared through the dataset store"""
+        return self.dataset.data if self.dataset is not None else self._unstored_data
+
+    @current_data.setter
+    def current_data(self, df: Optional[pd.DataFrame]):
+        previous = self.dataset
+        self.dataset = get_dataset_store().put(df) if df is not None else None
+        self._unstored_data = None
+        if previous is not None:
+            previous.release()
+
+    def load_data(self, df: pd.DataFrame, fast_profile: Optional[bool] = None,
+                  progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
         """
         Load new data and trigger the 2-model workflow:
         1. Model 2 analyzes data and generates context
         2. Model 1 receives the context and becomes ready for stakeholder questions
+
+        With fast_profile (default: automatic above fast_profile_row_threshold rows) step 1 uses a
+        stratified sample and nothing before the chatbot is ready passes over the whole frame: the
+        dtype optimization, the dataset store's content hash and the exact profile all run in the
+        background, and the compacted data and exact context replace the provisional ones together.
+        progress(fraction, stage) is called at each step (see job_queue.JobContext.progress).
+        The new dataset and context are only swapped in after the last progress call, so a load
+        cancelled from progress (or one that fails) leaves the previous dataset in place.
         """
+        progress = progress or (lambda fraction, stage: None)
+        dataset = None
         try:
             print("📊 Loading new data into 2-Model System...")
-            self.current_data = df
+            if fast_profile is None:
+                fast_profile = len(df) >= self.fast_profile_row_threshold
+
+            dtype_report = None
+            if fast_profile:
+                # A frame the store handed out is recognised without hashing; others are stored by the refinement
+                dataset = get_dataset_store().find(df)
+            else:
+                df, dtype_report = optimize_dtypes(df)  # A no-op for frames the app already optimized
+                dataset = get_dataset_store().put(df)
+            if dataset is not None:
+                df = dataset.data  # Work on the shared copy so the caller's frame can be dropped
 
             # STEP 1: Model 2 analyzes data and generates context
-            print("🔍 Step 1: Model 2 analyzing data and generating context...")
-            system_prompt = self.model_2_context_analyzer.analyze_data_and_generate_context(df)
+            progress(0.1, "Model 2: analyzing data structure")
+            analyzer = self._new_context_analyzer()
+            if fast_profile:
+                print("⚡ Step 1: Model 2 building provisional context from a sample...")
+                system_prompt = analyzer.analyze_sample_and_generate_context(df, self.fast_profile_sample_size)
+                profile_status = 'provisional'
+            else:
+                print("🔍 Step 1: Model 2 analyzing data and generating context...")
+                system_prompt = analyzer.analyze_data_and_generate_context(df)
+                profile_status = 'exact'
 
             # STEP 2: Model 1 receives context and data access
             print("💬 Step 2: Configuring Model 1 with generated context...")
-            self.model_1_analyst_chatbot.set_context_and_data(system_prompt, df, self.api_key)
-
-            self.data_context_ready = True
+            progress(0.8, "Model 1: loading the generated context")
+            with self._state_lock:
+                self._profile_generation += 1
+                generation = self._profile_generation
+                previous, self.dataset = self.dataset, dataset
+                self._unstored_data = df if dataset is None else None
+                self.model_2_context_analyzer = analyzer
+                self.dtype_report = dtype_report
+                self.profile_status = profile_status
+                # Unstored data has no content hash yet; its answers are cached under a one-off key
+                data_key = dataset.key if dataset is not None else f"provisional-{uuid.uuid4().hex}"
+                self.model_1_analyst_chatbot.set_context_and_data(system_prompt, df, self.api_key, data_key)
+                self.data_context_ready = True
+            dataset = None  # Now owned by self.dataset
+            if previous is not None:
+                previous.release()
+
+            if fast_profile:
+                self._refine_thread = threading.Thread(
+                    target=self._refine_context,
+                    args=(df, generation),
+                    name="exact-profile",
+                    daemon=True
+                )
+                self._refine_thread.start()
 
             print("✅ 2-Model System ready for stakeholder conversations")
 
@@ -52,6 +134,8 @@ class TwoModelCoordinator:
                 'success': True,
                 'message': 'Data analyzed and chatbot prepared for stakeholder questions',
                 'data_shape': f"{len(df)} rows × {len(df.columns)} columns",
+                'profile_status': profile_status,
+                'dtype_report': dtype_report,
                 'system_prompt_preview': system_prompt[:200] + "..." if len(system_prompt) > 200 else system_prompt
             }
 
@@ -62,6 +146,103 @@ class TwoModelCoordinator:
                 'error': str(e),
                 'message': 'Failed to initialize 2-model system with data'
             }
+        finally:
+            if dataset is not None:
+                dataset.release()  # Cancelled or failed before the swap
+
+    def _new_context_analyzer(self) -> DataContextAnalyzer:
+        """A Model 2 instance with the current one's settings and client but no profile yet"""
+        analyzer = DataContextAnalyzer()
+        analyzer.client = getattr(self.model_2_context_analyzer, 'client', None)
+        analyzer.stats_backend = self.model_2_context_analyzer.stats_backend
+        analyzer.sketch_row_threshold = self.model_2_context_analyzer.sketch_row_threshold
+        return analyzer
+
+    def _refine_context(self, df: pd.DataFrame, generation: int):
+        """Background step: compact and store the data, compute the exact profile and swap both into Model 1"""
+        # Profiled into its own analyzer: a newer load may be using the current one meanwhile
+        analyzer = self._new_context_analyzer()
+        dataset = None
+        try:
+            df, dtype_report = optimize_dtypes(df)
+            dataset = get_dataset_store().put(df)
+            df = dataset.data
+            system_prompt = analyzer.analyze_data_and_generate_context(df)
+        except Exception as e:
+            print(f"⚠️ Exact profile failed, keeping provisional context: {e}")
+            if dataset is not None:
+                dataset.release()
+            return
+
+        with self._state_lock:
+            if generation != self._profile_generation:
+                print("⏭️ Discarding exact profile of a dataset that has since been replaced")
+                previous = dataset
+            else:
+                previous, self.dataset = self.dataset, dataset
+                self._unstored_data = None
+                self.model_2_context_analyzer = analyzer
+                self.dtype_report = dtype_report
+                self.model_1_analyst_chatbot.update_data(df, system_prompt, dataset.key)
+                self.profile_status = 'exact'
+        if previous is not None:
+            previous.release()
+        if previous is not dataset:
+            print("✅ Exact profile ready - Model 1 context refined")
+
+    def wait_for_exact_profile(self, timeout: Optional[float] = None) -> bool:
+        """Block until the background profile (if any) finishes; returns True if the context is exact"""
+        if self._refine_thread is not None:
+            self._refine_thread.join(timeout)
+        return self.profile_status == 'exact'
+
+    def append_data(self, new_rows: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Append new rows to the loaded dataset without re-running the full workflow:
+        1. Validate the rows against the existing schema
+        2. Update Model 2's profile incrementally
+        3. Refresh Model 1's system prompt only if the summary moved materially
+        """
+        if not self.data_context_ready or self.current_data is None:
+            return self.load_data(new_rows)
+
+        # Appends update the exact profile, so it has to exist first
+        self.wait_for_exact_profile()
+
+        try:
+            aligned_rows, errors = align_to_schema(new_rows, self.current_data)
+            if errors:
+                return {
+                    'success': False,
+                    'error': '; '.join(errors),
+                    'message': 'Appended rows do not match the loaded dataset'
+                }
+
+            print(f"📎 Appending {len(aligned_rows)} rows to the 2-Model System...")
+            combined = concat_rows(self.current_data, aligned_rows)
+
+            system_prompt = self.model_2_context_analyzer.update_context(aligned_rows, combined)
+            get_correlation_engine().append(self.current_data, aligned_rows, combined)
+            self.current_data = combined
+            combined = self.current_data
+            self.model_1_analyst_chatbot.update_data(combined, system_prompt, self.dataset.key)
+
+            return {
+                'success': True,
+                'message': 'Rows appended' + (' and analyst context refreshed' if system_prompt else ''),
+                'rows_appended': len(aligned_rows),
+                'data_shape': f"{len(combined)} rows × {len(combined.columns)} columns",
+                'context_regenerated': system_prompt is not None,
+                'data': combined
+            }
+
+        except Exception as e:
+            print(f"❌ Error appending data: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Failed to append rows'
+            }
 
     def chat_with_analyst(self, user_message: str) -> Dict[str, Any]:
         """
@@ -88,6 +269,8 @@ class TwoModelCoordinator:
                     'response': chat_result['response'],
                     'visualizations': chat_result.get('visualizations', []),
                     'follow_up_suggestions': chat_result.get('follow_up_suggestions', []),
+                    'route': chat_result.get('route'),
+                    'cache': chat_result.get('cache'),
                     'conversation_ready': True
                 }
             else:
@@ -109,7 +292,7 @@ class TwoModelCoordinator:
             return {'message': 'No data loaded'}
 
         numeric_cols = self.current_data.select_dtypes(include=['number']).columns.tolist()
-        categorical_cols = self.current_data.select_dtypes(include=['object']).columns.tolist()
+        categorical_cols = self.current_data.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
 
         return {
             'total_rows': len(self.current_data),
@@ -126,7 +309,7 @@ class TwoModelCoordinator:
 
         # Analyze data to suggest relevant questions
         numeric_cols = self.current_data.select_dtypes(include=['number']).columns.tolist()
-        categorical_cols = self.current_data.select_dtypes(include=['object']).columns.tolist()
+        categorical_cols = self.current_data.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
         date_cols = self.current_data.select_dtypes(include=['datetime64']).columns.tolist()
 
         suggestions = []
@@ -162,6 +345,10 @@ class TwoModelCoordinator:
 
         return suggestions[:5]  # Return top 5 suggestions
 
+    def record_feedback(self, positive: bool, route: Optional[Dict[str, Any]] = None) -> bool:
+        """Pass a stakeholder's rating of an answer to the model router"""
+        return self.model_1_analyst_chatbot.record_feedback(positive, route)
+
     def reset_conversation(self):
         """Reset the conversation history"""
         if self.model_1_analyst_chatbot:
@@ -174,5 +361,6 @@ class TwoModelCoordinator:
             'model_2_context_analyzer': hasattr(self.model_2_context_analyzer, 'client') and self.model_2_context_analyzer.client is not None,
             'model_1_analyst_chatbot': hasattr(self.model_1_analyst_chatbot, 'client') and self.model_1_analyst_chatbot.client is not None,
             'data_context_ready': self.data_context_ready,
-            'data_loaded': self.current_data is not None
+            'data_loaded': self.current_data is not None,
+            'profile_exact': self.profile_status == 'exact'
         }
\ No newline at end of file
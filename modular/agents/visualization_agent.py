@@ -1,11 +1,26 @@
 # Visualization Agent
+from __future__ import annotations
 from .base_agent import BaseAgent
+from .correlation_engine import get_correlation_engine
+from .lazy_imports import lazy_import
+from .result_handle import as_frame
+from .aggregation_engine import group_aggregate
+from .top_n import top_values
+from .chart_pool import ChartJob, get_chart_pool
+from functools import partial
 from typing import Dict, Any, List, Optional
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import plotly.figure_factory as ff
+
+# Plotly is only imported once a chart is actually built
+px = lazy_import('plotly.express')
+go = lazy_import('plotly.graph_objects')
+
+# Most bins / categories / cells an aggregated (over-budget) chart draws
+AGGREGATED_BINS = 200
+AGGREGATED_CATEGORIES = 20
+AGGREGATED_GRID = 60
+CORRELATION_SAMPLE = 50_000
 
 class VisualizationAgent(BaseAgent):
     """Agent responsible for creating data visualizations"""
@@ -46,11 +61,7 @@ class VisualizationAgent(BaseAgent):
             else:
                 # Original automatic visualization logic
                 viz_plan = self.plan_visualizations(command, df, analysis_result)
-                charts = []
-                for plan in viz_plan:
-                    chart = self.create_visualization(plan, df, analysis_result)
-                    if chart:
-                        charts.append(chart)
+                charts = self.render_visualizations(viz_plan, df, analysis_result)
 
                 return {
                     'success': True,
@@ -73,7 +84,7 @@ class VisualizationAgent(BaseAgent):
 
         # Get data characteristics
         numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-        categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
+        categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
         date_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
 
         # Determine visualization based on command keywords
@@ -156,7 +167,7 @@ class VisualizationAgent(BaseAgent):
     def generate_viz_options(self, command: str, df: pd.DataFrame, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
         """Generate interactive visualization options for user selection"""
         numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-        categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
+        categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
         date_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
         all_cols = df.columns.tolist()
 
@@ -309,8 +320,23 @@ class VisualizationAgent(BaseAgent):
 
         return recommendations[:3]  # Top 3 recommendations
 
+    def render_visualizations(self, viz_plan: List[Dict[str, Any]], df: pd.DataFrame,
+                              analysis_result: Dict[str, Any]) -> List[go.Figure]:
+        """Build the planned charts in parallel on the chart pool; over-budget ones come back aggregated"""
+        jobs = [ChartJob(partial(self.create_visualization, plan, df, analysis_result),
+                         partial(self.create_aggregated_visualization, plan, df, analysis_result),
+                         plan.get('type', 'chart'))
+                for plan in viz_plan]
+        return [result['figure'] for result in get_chart_pool().render(jobs) if result['figure'] is not None]
+
     def create_chart_from_config(self, df: pd.DataFrame, chart_config: Dict[str, Any]) -> Optional[go.Figure]:
-        """Create chart from user-selected configuration"""
+        """Create chart from user-selected configuration (on the chart pool, under its time budget)"""
+        plan = dict(chart_config, type=self.config_chart_type(chart_config))
+        return get_chart_pool().render_one(partial(self.build_chart_from_config, df, chart_config),
+                                           partial(self.create_aggregated_chart, df, plan), plan['type'])
+
+    def config_chart_type(self, chart_config: Dict[str, Any]) -> str:
+        """Internal chart type for a user-selected chart name"""
         chart_type = chart_config.get('chart_type', '').lower().replace(' ', '_')
 
         # Map display names to internal methods
@@ -324,26 +350,33 @@ class VisualizationAgent(BaseAgent):
             'pie_chart': 'pie'
         }
 
-        chart_method = chart_mapping.get(chart_type, chart_type)
+        return chart_mapping.get(chart_type, chart_type)
+
+    def build_chart_from_config(self, df: pd.DataFrame, chart_config: Dict[str, Any]) -> Optional[go.Figure]:
+        chart_method = self.config_chart_type(chart_config)
 
         if chart_method in self.chart_types:
             return self.chart_types[chart_method](df, chart_config)
         else:
             return self.create_default_chart(df, chart_config)
 
-    def create_visualization(self, plan: Dict[str, Any], df: pd.DataFrame, analysis_result: Dict[str, Any]) -> Optional[go.Figure]:
-        """Create visualization based on plan"""
-        chart_type = plan.get('type')
-        data_source = plan.get('data_source', 'original')
-
-        # Select data source
-        if data_source == 'analysis' and 'data' in analysis_result:
+    def plan_data(self, plan: Dict[str, Any], df: pd.DataFrame, analysis_result: Dict[str, Any]) -> Optional[pd.DataFrame]:
+        """The frame a planned chart draws: the analysis result or the original data"""
+        if plan.get('data_source', 'original') == 'analysis' and 'data' in analysis_result:
             data = analysis_result['data']
         else:
             data = df
 
         if data is None or data.empty:
             return None
+        return as_frame(data)  # Charts need the rows of a result handle
+
+    def create_visualization(self, plan: Dict[str, Any], df: pd.DataFrame, analysis_result: Dict[str, Any]) -> Optional[go.Figure]:
+        """Create visualization based on plan"""
+        chart_type = plan.get('type')
+        data = self.plan_data(plan, df, analysis_result)
+        if data is None:
+            return None
 
         # Create chart based on type
         if chart_type in self.chart_types:
@@ -351,6 +384,86 @@ class VisualizationAgent(BaseAgent):
         else:
             return self.create_default_chart(data, plan)
 
+    def create_aggregated_visualization(self, plan: Dict[str, Any], df: pd.DataFrame,
+                                        analysis_result: Dict[str, Any]) -> Optional[go.Figure]:
+        data = self.plan_data(plan, df, analysis_result)
+        return None if data is None else self.create_aggregated_chart(data, plan)
+
+    def create_aggregated_chart(self, df: pd.DataFrame, plan: Dict[str, Any]) -> Optional[go.Figure]:
+        """
+        Cheap stand-in for a chart that ran over its budget: the data is reduced with numpy /
+        the aggregation engine first, so the figure holds at most a few hundred points.
+        """
+        chart_type = plan.get('type')
+        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
+        date_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
+        x_col = plan.get('x') if plan.get('x') in df.columns else None
+        y_col = plan.get('y') if plan.get('y') in df.columns else None
+
+        if chart_type in ('correlation', 'heatmap') and len(numeric_cols) >= 2:
+            sample = df.sample(CORRELATION_SAMPLE, random_state=0) if len(df) > CORRELATION_SAMPLE else df
+            corr_matrix = get_correlation_engine().correlation(sample).to_frame()
+            return px.imshow(corr_matrix, text_auto='.2f', aspect="auto", color_continuous_scale="RdBu_r",
+                             title=f"Correlation (sample of {len(sample):,} rows)", template="plotly_white")
+
+        if chart_type == 'scatter' and len(numeric_cols) >= 2:
+            y_col = y_col if y_col in numeric_cols else None
+            x_col = x_col if x_col in numeric_cols else next(col for col in numeric_cols if col != y_col)
+            y_col = y_col or next(col for col in numeric_cols if col != x_col)
+            x = df[x_col].to_numpy(dtype=np.float64, na_value=np.nan)
+            y = df[y_col].to_numpy(dtype=np.float64, na_value=np.nan)
+            finite = np.isfinite(x) & np.isfinite(y)
+            counts, x_edges, y_edges = np.histogram2d(x[finite], y[finite], bins=AGGREGATED_GRID)
+            fig = go.Figure(go.Heatmap(
+                z=counts.T, x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+                colorscale='Blues', hovertemplate=f"<b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<br>Rows: %{{z}}<extra></extra>"
+            ))
+            fig.update_layout(title=f"{y_col.title()} vs {x_col.title()} (density)", template="plotly_white",
+                              xaxis_title=x_col, yaxis_title=y_col)
+            return fig
+
+        if chart_type == 'line' and numeric_cols:
+            x_col = x_col or (date_cols[0] if date_cols else None)
+            y_col = y_col if y_col in numeric_cols else numeric_cols[0]
+            if x_col is not None and (x_col in date_cols or x_col in numeric_cols):
+                is_date = x_col in date_cols
+                positions = df[x_col].to_numpy(dtype='datetime64[ns]').view(np.int64) if is_date else \
+                    df[x_col].to_numpy(dtype=np.float64, na_value=np.nan)
+                present = df[x_col].notnull().to_numpy()
+                if present.any():
+                    edges = np.linspace(positions[present].min(), positions[present].max(), AGGREGATED_BINS + 1)
+                    bins = pd.Series(np.where(present, np.clip(np.searchsorted(edges, positions, side='right') - 1,
+                                                               0, AGGREGATED_BINS - 1), -1), index=df.index)
+                    bins = bins.where(bins >= 0)
+                    line = group_aggregate(df, bins.rename('bin'), y_col, 'sum' if is_date else 'mean')
+                    starts = edges[line.index.to_numpy(dtype=np.int64)]
+                    line_data = pd.DataFrame({x_col: pd.to_datetime(starts.astype(np.int64)) if is_date else starts,
+                                              y_col: line.to_numpy()})
+                    return px.line(line_data, x=x_col, y=y_col, markers=True, template="plotly_white",
+                                   title=f"📈 {y_col.title()} over {x_col.title()} ({len(line_data)} bins)")
+
+        category_col = x_col if x_col in categorical_cols else (categorical_cols[0] if categorical_cols else None)
+        if chart_type in ('bar', 'pie', 'treemap', 'box', 'heatmap', None) and category_col is not None:
+            metric = y_col if y_col in numeric_cols else (numeric_cols[0] if numeric_cols else None)
+            table = top_values(df, category_col, AGGREGATED_CATEGORIES, metric)
+            value_col = table.columns[-1]
+            label = f"Total {metric}" if metric else "Count"
+            return px.bar(table, x=category_col, y=value_col, template="plotly_white", labels={value_col: label},
+                          title=f"{label} by {category_col.title()} (top {len(table)})")
+
+        value_col = x_col if x_col in numeric_cols else (y_col if y_col in numeric_cols else
+                                                         (numeric_cols[0] if numeric_cols else None))
+        if value_col is None:
+            return None
+        values = df[value_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        counts, edges = np.histogram(values[np.isfinite(values)], bins=30)
+        fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                               hovertemplate=f"<b>{value_col}</b>: %{{x}}<br><b>Count</b>: %{{y}}<extra></extra>"))
+        fig.update_layout(title=f"Distribution of {value_col.title()}", template="plotly_white",
+                          xaxis_title=value_col, yaxis_title="Count")
+        return fig
+
     def create_bar_chart(self, df: pd.DataFrame, plan: Dict[str, Any]) -> go.Figure:
         """Create bar chart"""
         x_col = plan.get('x')
@@ -358,24 +471,20 @@ class VisualizationAgent(BaseAgent):
 
         # Auto-select columns if not specified
         if not x_col:
-            categorical_cols = df.select_dtypes(include=['object']).columns
+            categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
             x_col = categorical_cols[0] if len(categorical_cols) > 0 else df.columns[0]
 
         if not y_col:
             numeric_cols = df.select_dtypes(include=['number']).columns
             y_col = numeric_cols[0] if len(numeric_cols) > 0 else df.columns[1] if len(df.columns) > 1 else df.columns[0]
 
-        # Aggregate data if needed
+        # One bar per x value: sum y (unique x values keep their own value and order), or count rows
         if pd.api.types.is_numeric_dtype(df[y_col]):
-            if df[x_col].duplicated().any():
-                chart_data = df.groupby(x_col)[y_col].agg(['sum', 'count', 'mean']).reset_index()
-                y_col = 'sum'  # Use sum by default
-            else:
-                chart_data = df
+            chart_data = group_aggregate(df, x_col, y_col, 'sum', sort=False).rename('sum').reset_index()
+            y_col = 'sum'
         else:
-            chart_data = df[x_col].value_counts().reset_index()
-            x_col = 'index'
-            y_col = x_col.replace('index', 'count')
+            chart_data = group_aggregate(df, x_col, sort=False).rename('count').reset_index()
+            y_col = 'count'
 
         fig = px.bar(
             chart_data,
@@ -405,8 +514,10 @@ class VisualizationAgent(BaseAgent):
                 for col in df.columns:
                     if any(keyword in col.lower() for keyword in ['date', 'time', 'year', 'month']):
                         try:
-                            df[col] = pd.to_datetime(df[col], errors='coerce')
-                            if not df[col].isna().all():
+                            converted = pd.to_datetime(df[col], errors='coerce')
+                            if not converted.isna().all():
+                                # Convert on a local frame - the caller's (shared) data stays untouched
+                                df = df.assign(**{col: converted})
                                 date_cols.append(col)
                                 break
                         except:
@@ -504,7 +615,7 @@ class VisualizationAgent(BaseAgent):
 
         # Add color coding if categorical column exists
         color_col = None
-        categorical_cols = df.select_dtypes(include=['object']).columns
+        categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
         if len(categorical_cols) > 0:
             color_col = categorical_cols[0]
 
@@ -558,7 +669,7 @@ class VisualizationAgent(BaseAgent):
         x_col = plan.get('x')
 
         numeric_cols = df.select_dtypes(include=['number']).columns
-        categorical_cols = df.select_dtypes(include=['object']).columns
+        categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
 
         if not y_col and len(numeric_cols) > 0:
             y_col = numeric_cols[0]
@@ -589,7 +700,7 @@ class VisualizationAgent(BaseAgent):
 
         if len(numeric_df.columns) >= 2:
             # Correlation heatmap
-            corr_matrix = numeric_df.corr()
+            corr_matrix = get_correlation_engine().correlation(df).to_frame()
 
             fig = px.imshow(
                 corr_matrix,
@@ -601,15 +712,11 @@ class VisualizationAgent(BaseAgent):
             )
         else:
             # Pivot table heatmap if possible
-            categorical_cols = df.select_dtypes(include=['object']).columns
+            categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
             if len(categorical_cols) >= 2 and len(numeric_df.columns) >= 1:
-                pivot_table = df.pivot_table(
-                    values=numeric_df.columns[0],
-                    index=categorical_cols[0],
-                    columns=categorical_cols[1] if len(categorical_cols) > 1 else categorical_cols[0],
-                    aggfunc='mean',
-                    fill_value=0
-                )
+                pivot_table = group_aggregate(
+                    df, [categorical_cols[0], categorical_cols[1]], numeric_df.columns[0], 'mean'
+                ).unstack(fill_value=0)
 
                 fig = px.imshow(
                     pivot_table,
@@ -628,7 +735,7 @@ class VisualizationAgent(BaseAgent):
         x_col = plan.get('x')
 
         if not x_col:
-            categorical_cols = df.select_dtypes(include=['object']).columns
+            categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
             x_col = categorical_cols[0] if len(categorical_cols) > 0 else df.columns[0]
 
         # Get value counts
@@ -645,12 +752,12 @@ class VisualizationAgent(BaseAgent):
 
     def create_treemap(self, df: pd.DataFrame, plan: Dict[str, Any]) -> go.Figure:
         """Create treemap"""
-        categorical_cols = df.select_dtypes(include=['object']).columns
+        categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
         numeric_cols = df.select_dtypes(include=['number']).columns
 
         if len(categorical_cols) >= 1 and len(numeric_cols) >= 1:
             # Aggregate data
-            treemap_data = df.groupby(categorical_cols[0])[numeric_cols[0]].sum().reset_index()
+            treemap_data = group_aggregate(df, categorical_cols[0], numeric_cols[0], 'sum').reset_index()
 
             fig = px.treemap(
                 treemap_data,
@@ -669,7 +776,7 @@ class VisualizationAgent(BaseAgent):
         numeric_df = df.select_dtypes(include=['number'])
 
         if len(numeric_df.columns) >= 2:
-            corr_matrix = numeric_df.corr()
+            corr_matrix = get_correlation_engine().correlation(df).to_frame()
 
             # Create heatmap
             fig = go.Figure(data=go.Heatmap(
@@ -698,7 +805,7 @@ class VisualizationAgent(BaseAgent):
     def create_default_chart(self, df: pd.DataFrame, plan: Dict[str, Any]) -> go.Figure:
         """Create default chart when type is not specified"""
         numeric_cols = df.select_dtypes(include=['number']).columns
-        categorical_cols = df.select_dtypes(include=['object']).columns
+        categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
 
         # Choose appropriate default based on data types
         if len(numeric_cols) >= 2:
@@ -0,0 +1,531 @@
+# Headless Analysis API
+"""
+Standalone HTTP service exposing the coordinators without Streamlit (standard library only).
+
+    python api_server.py --port 8080 --workers 16 --queue 64
+
+Requests are served by a bounded worker pool. Once every worker is busy and the queue is
+full, new connections get `503` with `Retry-After` instead of piling up.
+
+    GET    /health
+    POST   /sessions                       {"api_key": "..."}  (default: OPENAI_API_KEY)
+    DELETE /sessions/{id}
+    POST   /sessions/{id}/data             CSV, JSON {"records": [...]} or Arrow IPC stream body (?async=true: 202 + job_id)
+    POST   /sessions/{id}/append           same body formats, rows appended to the loaded data
+    GET    /sessions/{id}/data?offset=0&limit=100&sort=Sales&descending=true&filter.Region=north
+    POST   /sessions/{id}/chat             {"message": "..."}
+    POST   /sessions/{id}/feedback         {"positive": true, "route": {...}}  (default: the last answer)
+    POST   /sessions/{id}/command          {"command": "..."}  (?offset=0&limit=100 pages the result table; ?async=true: 202 + job_id)
+    POST   /sessions/{id}/charts           {"chart_type": "bar_chart", "x": "...", "y": "...", ...}
+    GET    /sessions/{id}/jobs/{job_id}    status, progress events and (once finished) the result
+    DELETE /sessions/{id}/jobs/{job_id}    cancel a queued or running job
+
+Responses are JSON; table results are returned as an Arrow IPC stream when the request sends
+`Accept: application/vnd.apache.arrow.stream` (the remaining fields go in the schema metadata).
+"""
+import argparse
+import io
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from agents.two_model_coordinator import TwoModelCoordinator
+from agents.dataset_store import get_dataset_store, enable_copy_on_write
+from agents.request_coalescer import get_request_coalescer
+from agents.model_router import get_model_router
+from agents.semantic_cache import get_semantic_cache
+from agents.data_preview import get_data_preview
+from agents.job_queue import get_job_queue
+from agents.memory_budget import get_memory_budget
+from agents.result_handle import ResultHandle, as_frame
+from agents.figure_codec import FigureRef, encode_figure
+
+enable_copy_on_write()  # Sessions share stored datasets (see agents/dataset_store.py)
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+JOB_APP = 'api'   # The API server's own job database (see job_queue.default_db_path)
+MAX_BODY_BYTES = int(os.getenv("API_MAX_BODY_BYTES", str(512 * 1024 * 1024)))
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisSession:
+    """One API client's conversation: its own TwoModelCoordinator, used by one request at a time"""
+
+    def __init__(self, api_key: str):
+        self.id = uuid.uuid4().hex
+        self.api_key = api_key
+        self.coordinator = TwoModelCoordinator(api_key)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionRegistry:
+    """Sessions by id, expired after `ttl_seconds` without requests"""
+
+    def __init__(self, ttl_seconds: float = 3600, max_sessions: int = 10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: Dict[str, AnalysisSession] = {}
+        self._agent_coordinators: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def create(self, api_key: str) -> AnalysisSession:
+        self.expire()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise ApiError(503, "Too many open sessions")
+            session = AnalysisSession(api_key)
+            self._sessions[session.id] = session
+            return session
+
+    def get(self, session_id: str) -> AnalysisSession:
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise ApiError(404, f"Unknown session '{session_id}'")
+        session.last_used = time.monotonic()
+        return session
+
+    def delete(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            raise ApiError(404, f"Unknown session '{session_id}'")
+        session.coordinator.current_data = None  # Releases the dataset handle
+
+    def expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            expired = [sid for sid, session in self._sessions.items() if session.last_used < cutoff]
+            for sid in expired:
+                self._sessions.pop(sid).coordinator.current_data = None
+
+    def agent_coordinator(self, api_key: str):
+        """The multi-agent system is stateless, one instance per key serves every session"""
+        with self._lock:
+            coordinator = self._agent_coordinators.get(api_key)
+            if coordinator is None:
+                from agents.coordinator import AgentCoordinator
+                coordinator = AgentCoordinator(api_key)
+                self._agent_coordinators[api_key] = coordinator
+            return coordinator
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+def to_jsonable(value: Any) -> Any:
+    """Convert agent results (DataFrames, result handles, figures, numpy/pandas scalars) to JSON-compatible values"""
+    if isinstance(value, ResultHandle):
+        value = value.to_frame()
+    if isinstance(value, pd.DataFrame):
+        return json.loads(value.to_json(orient='split', date_format='iso', index=False))
+    if isinstance(value, pd.Series):
+        return json.loads(value.to_json(date_format='iso'))
+    if isinstance(value, FigureRef):
+        return value.spec()
+    if hasattr(value, 'to_plotly_json'):
+        return json.loads(encode_figure(value))  # Trace arrays as base64 typed arrays
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return value.isoformat()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def frame_to_arrow(df: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'analysis': json.dumps(to_jsonable(metadata)).encode()
+        })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def parse_frame(body: bytes, content_type: str) -> pd.DataFrame:
+    """Read an uploaded table from a CSV, JSON records or Arrow IPC stream body"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    try:
+        if content_type == ARROW_STREAM:
+            import pyarrow as pa
+            return pa.ipc.open_stream(body).read_pandas()
+        if content_type == 'application/json':
+            payload = json.loads(body or b'{}')
+            if 'csv' in payload:
+                return pd.read_csv(io.StringIO(payload['csv']))
+            return pd.DataFrame.from_records(payload.get('records', []))
+        return pd.read_csv(io.BytesIO(body))
+    except ApiError:
+        raise
+    except Exception as e:
+        raise ApiError(400, f"Could not parse uploaded data: {e}")
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    server_version = "AnalysisAPI/1.0"
+
+    routes: List[Tuple[str, str, str]] = [
+        ('GET', r'/health', 'health'),
+        ('POST', r'/sessions', 'create_session'),
+        ('DELETE', r'/sessions/(?P<session_id>\w+)', 'delete_session'),
+        ('POST', r'/sessions/(?P<session_id>\w+)/data', 'load_data'),
+        ('POST', r'/sessions/(?P<session_id>\w+)/append', 'append_data'),
+        ('GET', r'/sessions/(?P<session_id>\w+)/data', 'get_data'),
+        ('POST', r'/sessions/(?P<session_id>\w+)/chat', 'chat'),
+        ('POST', r'/sessions/(?P<session_id>\w+)/feedback', 'feedback'),
+        ('POST', r'/sessions/(?P<session_id>\w+)/command', 'run_command'),  # 'command' is the handler's HTTP verb
+        ('POST', r'/sessions/(?P<session_id>\w+)/charts', 'chart'),
+        ('GET', r'/sessions/(?P<session_id>\w+)/jobs/(?P<job_id>\w+)', 'get_job'),
+        ('DELETE', r'/sessions/(?P<session_id>\w+)/jobs/(?P<job_id>\w+)', 'cancel_job'),
+    ]
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def log_message(self, format, *args):
+        if os.getenv("API_ACCESS_LOG"):
+            super().log_message(format, *args)
+
+    # Plumbing
+
+    def dispatch(self, method: str):
+        url = urlparse(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            for route_method, pattern, name in self.routes:
+                match = re.fullmatch(pattern, url.path.rstrip('/') or '/')
+                if match and route_method == method:
+                    return getattr(self, name)(**match.groupdict())
+            raise ApiError(404, f"No route for {method} {url.path}")
+        except ApiError as e:
+            self.send_json({'success': False, 'error': str(e)}, e.status)
+        except Exception as e:
+            print(f"❌ API error on {method} {url.path}: {e}")
+            self.send_json({'success': False, 'error': str(e)}, 500)
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, f"Request body larger than {MAX_BODY_BYTES} bytes")
+        return self.rfile.read(length) if length else b''
+
+    def read_json(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.read_body() or b'{}')
+        except json.JSONDecodeError as e:
+            raise ApiError(400, f"Invalid JSON body: {e}")
+
+    def int_param(self, name: str, default: int) -> int:
+        try:
+            return max(int(self.query.get(name, default)), 0)
+        except ValueError:
+            raise ApiError(400, f"Query parameter '{name}' must be an integer")
+
+    def bool_param(self, name: str) -> Optional[bool]:
+        value = self.query.get(name)
+        return None if value is None else value.lower() in ('1', 'true', 'yes')
+
+    def wants_arrow(self) -> bool:
+        return ARROW_STREAM in (self.headers.get('Accept') or '') or self.query.get('format') == 'arrow'
+
+    def send_bytes(self, body: bytes, content_type: str, status: int = 200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, payload: Dict[str, Any], status: int = 200):
+        self.send_bytes(json.dumps(to_jsonable(payload)).encode(), 'application/json', status)
+
+    def send_result(self, payload: Dict[str, Any], table_key: str = 'data'):
+        """JSON by default; the result table as Arrow IPC (rest of the payload as metadata) on request"""
+        table = as_frame(payload.get(table_key))
+        if self.wants_arrow() and isinstance(table, pd.DataFrame):
+            metadata = {key: value for key, value in payload.items() if key != table_key}
+            self.send_bytes(frame_to_arrow(table, metadata), ARROW_STREAM)
+        else:
+            self.send_json(payload)
+
+    def paged_result(self, result: Any) -> Any:
+        """Only the requested rows (?offset=&limit=, default all) of a command result's table"""
+        table = result.get('data') if isinstance(result, dict) else None
+        if not isinstance(table, ResultHandle):
+            return result
+        offset = min(self.int_param('offset', 0), len(table))
+        limit = self.int_param('limit', len(table))
+        return {**result, 'data': table.take(np.arange(offset, min(offset + limit, len(table)))),
+                'matching_rows': len(table), 'offset': offset}
+
+    def session(self, session_id: str) -> AnalysisSession:
+        return self.server.sessions.get(session_id)
+
+    # Endpoints
+
+    def health(self):
+        self.send_json({
+            'status': 'ok',
+            'sessions': len(self.server.sessions),
+            'workers': self.server.workers,
+            'in_flight': self.server.in_flight,
+            'queue_capacity': self.server.queue_size,
+            'dataset_store': get_dataset_store().stats(),
+            'llm_requests': get_request_coalescer().stats(),
+            'model_tiers': get_model_router().stats(),
+            'answer_cache': get_semantic_cache().stats(),
+            'jobs': get_job_queue(JOB_APP).stats(),
+            'memory': get_memory_budget().stats()
+        })
+
+    def create_session(self):
+        api_key = self.read_json().get('api_key') or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ApiError(400, "An OpenAI API key is required (request body or OPENAI_API_KEY)")
+        session = self.server.sessions.create(api_key)
+        self.send_json({'success': True, 'session_id': session.id}, 201)
+
+    def delete_session(self, session_id: str):
+        self.server.sessions.delete(session_id)
+        self.send_json({'success': True})
+
+    def load_data(self, session_id: str):
+        session = self.session(session_id)
+        df = parse_frame(self.read_body(), self.headers.get('Content-Type'))
+        fast_profile = self.bool_param('fast_profile')
+
+        def load(job=None):
+            with session.lock:
+                return session.coordinator.load_data(df, fast_profile, progress=job.progress if job else None)
+
+        if self.bool_param('async'):
+            return self.send_job(session, get_job_queue(JOB_APP).submit('load_data', load, owner=session.id))
+        result = load()
+        self.send_json(result, 200 if result.get('success') else 400)
+
+    def append_data(self, session_id: str):
+        session = self.session(session_id)
+        new_rows = parse_frame(self.read_body(), self.headers.get('Content-Type'))
+        with session.lock:
+            result = session.coordinator.append_data(new_rows)
+        result.pop('data', None)  # Callers page through GET /data instead of receiving everything
+        self.send_json(result, 200 if result.get('success') else 400)
+
+    def get_data(self, session_id: str):
+        session = self.session(session_id)
+        df = session.coordinator.current_data
+        if df is None:
+            raise ApiError(409, "No data loaded for this session")
+        offset = self.int_param('offset', 0)
+        limit = self.int_param('limit', 100)
+        # filter.<column>=<expression>: substring for text, '>100' / '10..20' / '=3' for numbers and dates
+        filters = {name[len('filter.'):]: value for name, value in self.query.items() if name.startswith('filter.')}
+        preview = get_data_preview(df, session.coordinator.dataset.key,
+                                   session.coordinator.model_2_context_analyzer.profile)
+        try:
+            positions = preview.row_order(filters, self.query.get('sort') or None,
+                                          self.query.get('descending', 'false').lower() not in ('1', 'true', 'yes'))
+        except (ValueError, KeyError) as e:
+            raise ApiError(400, str(e.args[0]) if e.args else str(e))
+        self.send_result({
+            'success': True,
+            'total_rows': len(df),
+            'matching_rows': len(positions),
+            'offset': offset,
+            'data': df.iloc[positions[offset:offset + limit]]
+        })
+
+    def chat(self, session_id: str):
+        session = self.session(session_id)
+        message = self.read_json().get('message', '').strip()
+        if not message:
+            raise ApiError(400, "'message' is required")
+        with session.lock:
+            result = session.coordinator.chat_with_analyst(message)
+        self.send_json(result)  # Figures are serialised as plotly JSON
+
+    def feedback(self, session_id: str):
+        session = self.session(session_id)
+        body = self.read_json()
+        if not isinstance(body.get('positive'), bool):
+            raise ApiError(400, "'positive' must be true or false")
+        if not session.coordinator.record_feedback(body['positive'], body.get('route')):
+            raise ApiError(409, "No answer to rate yet")
+        self.send_json({'success': True})
+
+    def run_command(self, session_id: str):
+        session = self.session(session_id)
+        command = self.read_json().get('command', '').strip()
+        if not command:
+            raise ApiError(400, "'command' is required")
+        df = session.coordinator.current_data
+        if df is None:
+            raise ApiError(409, "No data loaded for this session")
+        coordinator = self.server.sessions.agent_coordinator(session.api_key)
+        if self.bool_param('async'):
+            job_id = get_job_queue(JOB_APP).submit('command', lambda job: coordinator.process_command(command, df, job.progress),
+                                            owner=session.id)
+            return self.send_job(session, job_id)
+        self.send_result(self.paged_result(coordinator.process_command(command, df)))
+
+    def chart(self, session_id: str):
+        session = self.session(session_id)
+        config = self.read_json()
+        if not config.get('chart_type'):
+            raise ApiError(400, "'chart_type' is required")
+        df = session.coordinator.current_data
+        if df is None:
+            raise ApiError(409, "No data loaded for this session")
+        viz_agent = self.server.sessions.agent_coordinator(session.api_key).visualization_agent
+        chart = viz_agent.create_chart_from_config(df, config)
+        if chart is None:
+            raise ApiError(422, f"Could not build a {config['chart_type']} chart with this configuration")
+        self.send_json({'success': True, 'chart': chart})
+
+    def send_job(self, session: AnalysisSession, job_id: str):
+        self.send_json({'success': True, 'job_id': job_id,
+                        'status_url': f"/sessions/{session.id}/jobs/{job_id}"}, 202)
+
+    def session_job(self, session_id: str, job_id: str) -> Dict[str, Any]:
+        """Status of a job submitted by this session; other sessions' jobs are reported as unknown"""
+        session = self.session(session_id)
+        status = get_job_queue(JOB_APP).status(job_id)
+        if status is None or status['owner'] != session.id:
+            raise ApiError(404, f"Unknown job '{job_id}'")
+        return status
+
+    def get_job(self, session_id: str, job_id: str):
+        queue = get_job_queue(JOB_APP)
+        status = self.session_job(session_id, job_id)
+        if status['status'] == 'succeeded':
+            status['result'] = self.paged_result(queue.result(job_id))
+        self.send_json({'success': True, **status})
+
+    def cancel_job(self, session_id: str, job_id: str):
+        self.session_job(session_id, job_id)
+        if not get_job_queue(JOB_APP).cancel(job_id):
+            raise ApiError(409, "Job already finished")
+        self.send_json({'success': True})
+
+
+class AnalysisHTTPServer(HTTPServer):
+    """
+    HTTP server with a bounded worker pool: at most `workers` requests run and `queue_size`
+    wait; anything beyond that is answered immediately with 503 + Retry-After (backpressure)
+    """
+
+    allow_reuse_address = True
+    request_queue_size = 128  # listen() backlog
+
+    def __init__(self, address, workers: int = 16, queue_size: int = 64, session_ttl: float = 3600):
+        super().__init__(address, AnalysisRequestHandler)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.sessions = SessionRegistry(session_ttl)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-worker")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self.reject(request)
+            return
+        with self._in_flight_lock:
+            self._in_flight += 1
+        self.executor.submit(self._process_in_worker, request, client_address)
+
+    def _process_in_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def reject(self, request):
+        body = json.dumps({'success': False, 'error': 'Server busy, retry later'}).encode()
+        response = (
+            "HTTP/1.1 503 Service Unavailable\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Retry-After: 1\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode() + body
+        try:
+            request.sendall(response)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless data analysis API")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "16")), help="Concurrent requests")
+    parser.add_argument("--queue", type=int, default=int(os.getenv("API_QUEUE", "64")), help="Requests waiting for a worker before 503")
+    parser.add_argument("--session-ttl", type=float, default=3600, help="Seconds before an idle session is dropped")
+    args = parser.parse_args()
+
+    server = AnalysisHTTPServer((args.host, args.port), args.workers, args.queue, args.session_ttl)
+    print(f"🚀 Analysis API listening on http://{args.host}:{args.port} ({args.workers} workers, queue {args.queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Shutting down")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# Batch Question Runner
+"""
+Run a question set against a dataset offline, without the Streamlit UI.
+
+    python batch_cli.py sales_2024_06.csv questions.txt --output runs/2024-06 --concurrency 8 --rpm 120
+    python batch_cli.py ledger.parquet questions.jsonl --mode command
+
+Questions are read one per line (.txt) or from a "question" field (.jsonl). The dataset is
+profiled once; every worker thread then answers questions with its own chatbot clone sharing
+that context. Output directory:
+
+    responses.jsonl     one record per question (response, insights, timing, chart files)
+    charts/             plotly figure JSON per chart
+    data/               result tables of --mode command, as CSV
+    summary.json        counts and timings for the run
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from agents.rate_limiter import TokenBucket
+from agents.result_handle import ResultHandle
+from agents.figure_codec import encode_figure
+from agents.dataset_store import enable_copy_on_write
+
+enable_copy_on_write()  # Questions share one loaded frame (see agents/dataset_store.py)
+
+
+def read_dataset(path: str) -> pd.DataFrame:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        return pd.read_parquet(path)
+    if extension in ('.arrow', '.feather'):
+        return pd.read_feather(path)
+    if extension in ('.xlsx', '.xls'):
+        return pd.read_excel(path)
+    return pd.read_csv(path)
+
+
+def read_questions(path: str) -> List[str]:
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(line)['question'] for line in f if line.strip()]
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def normalize_question(question: str) -> str:
+    return ' '.join(question.lower().split()).rstrip('?')
+
+
+class BatchRunner:
+    """Answers a question set with a bounded thread pool; identical questions are asked once"""
+
+    def __init__(self, df: pd.DataFrame, api_key: str, mode: str, output_dir: str,
+                 concurrency: int = 4, requests_per_minute: float = 60):
+        self.df = df
+        self.api_key = api_key
+        self.mode = mode
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        # Paces question starts; the LLM calls inside are also held to the shared per-model limits
+        self.limiter = TokenBucket(requests_per_minute, capacity=concurrency)
+        self.local = threading.local()
+        self.base_chatbot = None
+        self.agent_coordinator = None
+
+    def prepare(self):
+        """Shared work done once per run: dataset profiling / agent construction"""
+        if self.mode == 'chat':
+            from agents.two_model_coordinator import TwoModelCoordinator
+            coordinator = TwoModelCoordinator(self.api_key)
+            load_result = coordinator.load_data(self.df, fast_profile=False)
+            if not load_result['success']:
+                raise RuntimeError(f"Profiling failed: {load_result['error']}")
+            self.base_chatbot = coordinator.model_1_analyst_chatbot
+        else:
+            from agents.coordinator import AgentCoordinator
+            self.agent_coordinator = AgentCoordinator(self.api_key)
+
+    def chatbot(self):
+        """One chatbot per worker thread - conversation history is per-instance state"""
+        if getattr(self.local, 'chatbot', None) is None:
+            self.local.chatbot = self.base_chatbot.clone()
+        return self.local.chatbot
+
+    def answer(self, question: str) -> Dict[str, Any]:
+        self.limiter.take()
+        if self.mode == 'chat':
+            chatbot = self.chatbot()
+            chatbot.conversation_history = []  # Questions are independent of each other
+            result = chatbot.chat(question)
+            return {
+                'success': result.get('success', False),
+                'response': result.get('response'),
+                'error': result.get('error'),
+                'follow_up_suggestions': result.get('follow_up_suggestions', []),
+                'figures': [viz['chart'] for viz in result.get('visualizations', []) if viz.get('chart') is not None]
+            }
+
+        result = self.agent_coordinator.process_command(question, self.df)
+        return {
+            'success': 'error' not in result,
+            'response': result.get('explanation'),
+            'ai_insights': result.get('ai_insights'),
+            'error': result.get('error'),
+            'table': result.get('data'),
+            'figures': list(result.get('charts', []))
+        }
+
+    def write_outputs(self, index: int, answer: Dict[str, Any]) -> Dict[str, Any]:
+        record = {key: value for key, value in answer.items() if key not in ('figures', 'table')}
+
+        chart_files = []
+        for n, figure in enumerate(answer.get('figures', []), start=1):
+            chart_path = os.path.join('charts', f"q{index:04d}_{n}.json")
+            with open(os.path.join(self.output_dir, chart_path), 'w', encoding='utf-8') as f:
+                f.write(encode_figure(figure))
+            chart_files.append(chart_path)
+        record['charts'] = chart_files
+
+        table = answer.get('table')
+        if isinstance(table, (pd.DataFrame, ResultHandle)):
+            table_path = os.path.join('data', f"q{index:04d}.csv")
+            table.to_csv(os.path.join(self.output_dir, table_path), index=False)
+            record['table'] = table_path
+        return record
+
+    def run(self, questions: List[str]) -> Dict[str, Any]:
+        os.makedirs(os.path.join(self.output_dir, 'charts'), exist_ok=True)
+        os.makedirs(os.path.join(self.output_dir, 'data'), exist_ok=True)
+
+        started = time.monotonic()
+        print(f"🔍 Preparing {self.mode} run over {len(self.df)} rows...")
+        self.prepare()
+        prepared = time.monotonic()
+
+        # Duplicate questions are asked once and the answer is reused for every occurrence
+        unique: Dict[str, int] = {}
+        for index, question in enumerate(questions):
+            unique.setdefault(normalize_question(question), index)
+        print(f"🚀 Answering {len(unique)} unique questions ({len(questions)} total) with {self.concurrency} workers")
+
+        answers: Dict[int, Dict[str, Any]] = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+            futures = {pool.submit(self.timed_answer, questions[index]): index for index in unique.values()}
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                answers[index] = self.write_outputs(index, future.result())
+                status = "✅" if answers[index]['success'] else "❌"
+                print(f"{status} [{done}/{len(futures)}] {questions[index][:80]}")
+
+        failures = 0
+        with open(os.path.join(self.output_dir, 'responses.jsonl'), 'w', encoding='utf-8') as f:
+            for index, question in enumerate(questions):
+                source = unique[normalize_question(question)]
+                record = {'index': index, 'question': question, **answers[source]}
+                if source != index:
+                    record['duplicate_of'] = source
+                failures += not record['success']
+                f.write(json.dumps(record, default=str) + "\n")
+
+        summary = {
+            'mode': self.mode,
+            'rows': len(self.df),
+            'questions': len(questions),
+            'unique_questions': len(unique),
+            'failures': failures,
+            'prepare_seconds': round(prepared - started, 2),
+            'total_seconds': round(time.monotonic() - started, 2)
+        }
+        with open(os.path.join(self.output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+    def timed_answer(self, question: str) -> Dict[str, Any]:
+        start = time.monotonic()
+        try:
+            answer = self.answer(question)
+        except Exception as e:
+            answer = {'success': False, 'response': None, 'error': str(e), 'figures': []}
+        answer['seconds'] = round(time.monotonic() - start, 2)
+        return answer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a question set against a dataset")
+    parser.add_argument("dataset", help="CSV, Parquet, Feather/Arrow or Excel file")
+    parser.add_argument("questions", help="Text file (one question per line) or JSONL with a 'question' field")
+    parser.add_argument("--mode", choices=['chat', 'command'], default='chat',
+                        help="chat: 2-model analyst chatbot, command: multi-agent workflow")
+    parser.add_argument("--output", default="batch_output", help="Output directory")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions answered in parallel")
+    parser.add_argument("--rpm", type=float, default=60, help="Questions started per minute (0 = unlimited)")
+    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY"), help="Defaults to OPENAI_API_KEY")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("an OpenAI API key is required (--api-key or OPENAI_API_KEY)")
+
+    questions = read_questions(args.questions)
+    if not questions:
+        parser.error(f"no questions found in {args.questions}")
+
+    runner = BatchRunner(read_dataset(args.dataset), args.api_key, args.mode, args.output,
+                         args.concurrency, args.rpm)
+    summary = runner.run(questions)
+    print(f"📁 Results written to {args.output}: {summary['questions'] - summary['failures']}/{summary['questions']} answered "
+          f"in {summary['total_seconds']}s")
+    return 1 if summary['failures'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
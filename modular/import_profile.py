@@ -0,0 +1,71 @@
+# Import-time Profiler
+"""
+Summarise `python -X importtime` for the app's cold start.
+
+    python import_profile.py                 # profile `import main`
+    python import_profile.py agents.coordinator --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+
+def run_importtime(module: str) -> List[Dict]:
+    """Import `module` in a fresh interpreter and parse the -X importtime report"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+
+    entries = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000
+        })
+
+    if process.returncode != 0 and not entries:
+        raise RuntimeError(f"Importing {module} failed:\n{process.stderr[-2000:]}")
+    return entries
+
+
+def print_report(module: str, entries: List[Dict], top: int):
+    top_level = [entry for entry in entries if entry['depth'] == 0]
+    total = sum(entry['cumulative_ms'] for entry in top_level)
+
+    print(f"⏱️ import {module}: {total:.0f} ms across {len(entries)} modules\n")
+
+    print(f"Top {top} by cumulative time (module + everything it imported):")
+    for entry in sorted(entries, key=lambda e: e['cumulative_ms'], reverse=True)[:top]:
+        print(f"  {entry['cumulative_ms']:8.1f} ms  {'  ' * entry['depth']}{entry['module']}")
+
+    print(f"\nTop {top} by self time:")
+    for entry in sorted(entries, key=lambda e: e['self_ms'], reverse=True)[:top]:
+        print(f"  {entry['self_ms']:8.1f} ms  {entry['module']}")
+
+    # Packages that should only load on first use
+    loaded = {entry['module'] for entry in entries}
+    heavy = [name for name in ('plotly', 'openai', 'sklearn', 'scipy', 'matplotlib', 'httpx') if name in loaded]
+    print(f"\nHeavy optional packages loaded at start-up: {', '.join(heavy) if heavy else 'none'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise -X importtime for a module")
+    parser.add_argument("module", nargs="?", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=10, help="Number of modules to list")
+    args = parser.parse_args()
+
+    print_report(args.module, run_importtime(args.module), args.top)
+
+
+if __name__ == "__main__":
+    main()
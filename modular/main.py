@@ -1,32 +1,96 @@
 # Data Analytics Software with Multi-Agent Framework
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from typing import Dict, Any, List, Optional
-import json
-import io
-import base64
-import tempfile
-import subprocess
-import sys
+from functools import partial
 import os
-from dataclasses import dataclass
-from enum import Enum
-from openai import OpenAI
+import re
+import uuid
 from dotenv import load_dotenv
+from streamlit.errors import StreamlitAPIException
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Import our custom agents
-from agents.data_agent import DataAnalysisAgent
-from agents.meta_prompt_agent import MetaPromptAgent
-from agents.visualization_agent import VisualizationAgent
-from agents.code_execution_agent import CodeExecutionAgent
-from agents.coordinator import AgentCoordinator
-# Import new 2-model system
-from agents.two_model_coordinator import TwoModelCoordinator
+# Agent systems (and plotly/openai behind them) are imported when a mode first needs them,
+# see DataApp.coordinator / DataApp.two_model_system - this keeps cold start short
+from agents.incremental_profile import align_to_schema
+from agents.dtype_optimizer import optimize_dtypes, concat_rows
+from agents.data_preview import get_data_preview
+from agents.correlation_engine import get_correlation_engine
+from agents.dataset_store import get_dataset_store, enable_copy_on_write
+from agents.job_queue import get_job_queue, FINISHED_STATES
+from agents.memory_budget import get_memory_budget, load_spilled
+from agents.result_handle import ResultHandle, as_frame
+from agents.figure_codec import compact_figure, as_figure, transport_figure
+
+@st.cache_resource(show_spinner=False)
+def get_agent_coordinator(openai_api_key: str):
+    """The multi-agent system keeps no per-user state, so one instance serves every session and rerun"""
+    from agents.coordinator import AgentCoordinator
+    return AgentCoordinator(openai_api_key)
+
+# Sessions share one copy of each dataset (agents/dataset_store.py), which relies on copy-on-write
+enable_copy_on_write()
+
+# Chat exchanges rendered in full; older ones sit behind a toggle so reruns don't grow with the conversation
+CHAT_HISTORY_WINDOW = 5
+
+# Rows of a command result shown per page
+RESULT_PAGE_SIZE = 50
+
+# Name of this app's private job database directory (see job_queue.default_db_path)
+JOB_APP = 'streamlit'
+
+# Cookie naming the browser that owns a background job; a refreshed page only reattaches to its own jobs
+JOB_OWNER_COOKIE = 'analyst_job_owner'
+JOB_OWNER_MAX_AGE = 7 * 24 * 3600
+
+def job_owner() -> str:
+    """
+    Owner id of this browser's jobs. It lives in a cookie, since a refreshed page is a new
+    Streamlit session; the first run of a browser without one writes it (Streamlit only reads cookies).
+    """
+    if 'job_owner' not in st.session_state:
+        owner = st.context.cookies.get(JOB_OWNER_COOKIE)
+        if not isinstance(owner, str) or not re.fullmatch(r'[0-9a-f]{32}', owner):
+            owner = uuid.uuid4().hex
+            st.html(f"<script>document.cookie = '{JOB_OWNER_COOKIE}={owner}; path=/; "
+                    f"max-age={JOB_OWNER_MAX_AGE}; SameSite=Strict';</script>", unsafe_allow_javascript=True)
+        st.session_state.job_owner = owner
+    return st.session_state.job_owner
+
+def rerun_panel():
+    """Rerun only the fragment being interacted with; during a full-app run this falls back to st.rerun()"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def analyze_data_job(job, two_model_system, df: pd.DataFrame, dataset_key: str) -> Dict[str, Any]:
+    """Background job: Model 2 compacts and profiles the data and Model 1 takes over the context"""
+    result = two_model_system.load_data(df, progress=job.progress)
+    dataset = two_model_system.dataset  # The compacted dataset the session switches to
+    return {**result, 'dataset_key': dataset.key if dataset is not None else dataset_key, 'coordinator': two_model_system}
+
+def optimize_data_job(job, df: pd.DataFrame, dataset_key: str) -> Dict[str, Any]:
+    """Background job: compact the loaded data's dtypes into a new stored dataset"""
+    job.progress(0.1, "Compacting column types")
+    optimized, report = optimize_dtypes(df)
+    handle = get_dataset_store().put(optimized)
+    return {'success': True, 'dataset_key': handle.key, 'dataset_handle': handle, 'dtype_report': report}
+
+def command_job(job, coordinator, command: str, df: pd.DataFrame, dataset_key: str) -> Dict[str, Any]:
+    """Background job: one command through the multi-agent workflow"""
+    result = coordinator.process_command(command, df, progress=job.progress)
+    # Charts are encoded here, on the worker: the stored job result and last_result hold compact figures
+    if result.get('charts'):
+        result = {**result, 'charts': [compact_figure(chart) for chart in result['charts']]}
+    return {**result, 'dataset_key': dataset_key}
+
+def chart_html(chart) -> str:
+    """Standalone HTML of a stored (possibly compact or spilled) chart, for its download button"""
+    return as_figure(load_spilled(chart)).to_html(include_plotlyjs='cdn')
 
 # Page configuration
 st.set_page_config(
@@ -109,8 +173,8 @@ st.markdown('''
 
 class DataApp:
     def __init__(self):
-        self.coordinator = None
-        self.two_model_system = None  # New 2-model system
+        self.openai_api_key = None
+        self._coordinator = None
         self.current_data = None
         self.current_operation = ""
         self.suggestions = []
@@ -118,12 +182,28 @@ class DataApp:
         self.use_powerbi_mode = False    # Flag for Power BI style visualizations
 
     def initialize_agents(self, openai_api_key: str):
-        """Initialize both the multi-agent system and 2-model system"""
-        # Original multi-agent system
-        self.coordinator = AgentCoordinator(openai_api_key)
-
-        # New 2-model system
-        self.two_model_system = TwoModelCoordinator(openai_api_key)
+        """Enable the agent systems; each one is constructed the first time its mode uses it"""
+        self.openai_api_key = openai_api_key
+
+    @property
+    def coordinator(self):
+        """Original multi-agent system (shared across sessions)"""
+        if self._coordinator is None and self.openai_api_key:
+            self._coordinator = get_agent_coordinator(self.openai_api_key)
+        return self._coordinator
+
+    @property
+    def two_model_system(self):
+        """
+        New 2-model system - kept per session so loaded data, appended rows and the
+        conversation history survive reruns without leaking into other sessions
+        """
+        if not self.openai_api_key:
+            return None
+        if st.session_state.get('two_model_system') is None:
+            from agents.two_model_coordinator import TwoModelCoordinator
+            st.session_state.two_model_system = TwoModelCoordinator(self.openai_api_key)
+        return st.session_state.two_model_system
 
     def render_header(self):
         """Render the main header"""
@@ -145,7 +225,7 @@ class DataApp:
                 api_key = st.text_input("OpenAI API Key", type="password",
                                        help="Enter your OpenAI API key or set OPENAI_API_KEY in .env file")
 
-            if api_key and not self.coordinator:
+            if api_key and not self.openai_api_key:
                 try:
                     self.initialize_agents(api_key)
                     st.success("✅ Agents initialized!")
@@ -175,43 +255,109 @@ class DataApp:
                 help="Upload your dataset to start analysis"
             )
 
-            if uploaded_file:
+            # Only (re)load when a different file is uploaded - the uploader keeps its file across reruns
+            if uploaded_file and st.session_state.get('loaded_file_id') != uploaded_file.file_id:
                 self.load_data(uploaded_file)
+                st.session_state.loaded_file_id = uploaded_file.file_id
+
+            # Incremental append for growing datasets
+            if self.current_data is not None:
+                appended_file = st.file_uploader(
+                    "➕ Append new rows",
+                    type=['csv'],
+                    key="append_uploader",
+                    help="Add rows with the same columns to the loaded dataset without a full re-upload"
+                )
+
+                if appended_file and appended_file.file_id not in st.session_state.appended_file_ids:
+                    self.append_data(appended_file)
+                    st.session_state.appended_file_ids.append(appended_file.file_id)
 
             # Sample data option
             if st.button("🎲 Load Sample Data"):
                 self.load_sample_data()
 
+            # Memory use of this session, measured whenever results are added
+            report = st.session_state.get('memory_report')
+            dtype_report = st.session_state.get('dtype_report')
+            if report or dtype_report:
+                with st.expander("🧮 Memory"):
+                    if dtype_report and dtype_report['conversions']:
+                        st.caption(f"🗜️ Loaded data: {dtype_report['memory_before'] / 1e6:.1f} MB → "
+                                   f"{dtype_report['memory_after'] / 1e6:.1f} MB ({len(dtype_report['conversions'])} columns compacted)")
+                    if report:
+                        st.caption(f"Session: {report['bytes'] / 1e6:.1f} MB of {report['budget_bytes'] / 1e6:.0f} MB budget")
+                    if report and report['spilled']:
+                        st.caption(f"💾 {report['spilled']} older figures spilled to disk")
+                    store_stats = get_dataset_store().stats()
+                    st.caption(f"Datasets: {store_stats['datasets']} in memory ({store_stats['bytes'] / 1e6:.1f} MB, shared between sessions)")
+
             return uploaded_file
 
     def load_data(self, uploaded_file):
         """Load data from uploaded file and initialize appropriate system"""
         try:
-            self.current_data = pd.read_csv(uploaded_file)
-            # Clean data for Arrow compatibility
-            self.current_data = self.clean_dataframe_for_display(self.current_data)
-            st.session_state.data = self.current_data
+            # Clean data for Arrow compatibility; the dtypes are compacted by the load job
+            self.current_data = self.share_dataset(self.clean_dataframe_for_display(pd.read_csv(uploaded_file)))
+            self.start_load_job()
+
+            st.sidebar.success(f"✅ Data loaded: {len(self.current_data)} rows, {len(self.current_data.columns)} columns")
+
+        except Exception as e:
+            st.sidebar.error(f"❌ Error loading data: {e}")
+
+    def append_data(self, appended_file):
+        """Append rows from an uploaded file to the current dataset"""
+        try:
+            new_rows = self.clean_dataframe_for_display(pd.read_csv(appended_file))
 
-            # Initialize the 2-model system with the data
-            if self.use_two_model_system and self.two_model_system:
+            # Only update the 2-model system if it already holds the data; never build it just for this
+            two_model_system = st.session_state.get('two_model_system') if self.openai_api_key else None
+            if two_model_system and two_model_system.current_data is not None:
                 with st.sidebar:
-                    with st.spinner("🔍 Model 2: Analyzing data structure..."):
-                        load_result = self.two_model_system.load_data(self.current_data)
+                    with st.spinner("📎 Updating data profile..."):
+                        append_result = two_model_system.append_data(new_rows)
 
-                    if load_result['success']:
-                        st.success(f"✅ Data analyzed by AI: {load_result['data_shape']}")
-                        st.info("💬 Ready for data analyst conversation!")
-                    else:
-                        st.error(f"❌ 2-Model system error: {load_result['error']}")
+                if not append_result['success']:
+                    st.sidebar.error(f"❌ Could not append rows: {append_result['error']}")
+                    return
 
-            st.sidebar.success(f"✅ Data loaded: {len(self.current_data)} rows, {len(self.current_data.columns)} columns")
+                self.current_data = append_result['data']
+                if append_result['context_regenerated']:
+                    st.sidebar.info("🔍 Data summary changed - analyst context refreshed")
+            else:
+                aligned_rows, errors = align_to_schema(new_rows, self.current_data)
+                if errors:
+                    st.sidebar.error(f"❌ Could not append rows: {'; '.join(errors)}")
+                    return
+                self.current_data = concat_rows(self.current_data, aligned_rows)
+
+            self.current_data = self.share_dataset(self.current_data)
+            st.sidebar.success(f"✅ Appended {len(new_rows)} rows: {len(self.current_data)} rows total")
 
         except Exception as e:
-            st.sidebar.error(f"❌ Error loading data: {e}")
+            st.sidebar.error(f"❌ Error appending data: {e}")
+
+    def share_dataset(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Keep the session's data in the process-wide dataset store: sessions that load the same
+        file share one copy, and the session only holds a handle plus a view of it
+        """
+        return self.adopt_dataset(get_dataset_store().put(df))
+
+    def adopt_dataset(self, handle) -> pd.DataFrame:
+        """Make a dataset store handle the session's data, releasing the previous one"""
+        previous = st.session_state.get('dataset_handle')
+        st.session_state.dataset_handle = handle
+        if previous is not None and previous is not handle:
+            previous.release()
+        st.session_state.data = handle.data
+        self.current_data = handle.data
+        return handle.data
 
     def clean_dataframe_for_display(self, df):
         """Clean dataframe to avoid Arrow serialization issues"""
-        df_clean = df.copy()
+        df_clean = df.copy(deep=False)  # Converted columns are replaced, never written in place
 
         for col in df_clean.columns:
             # Handle mixed types by converting to string if needed
@@ -231,6 +377,39 @@ class DataApp:
 
         return df_clean
 
+    def adopt_refined_dataset(self):
+        """
+        After a provisional load, Model 2 compacts the data in the background along with the exact
+        profile; once that is done the session switches to the compacted dataset too
+        """
+        refining_key = st.session_state.get('refining_key')
+        two_model_system = st.session_state.get('two_model_system')
+        handle = st.session_state.get('dataset_handle')
+        if refining_key is None or two_model_system is None or two_model_system.profile_status != 'exact':
+            return
+        st.session_state.refining_key = None
+        if handle is None or handle.key != refining_key or two_model_system.dataset is None:
+            return  # Other data was loaded since
+        refined = get_dataset_store().acquire(two_model_system.dataset.key)
+        if refined is not None and refined.key != handle.key:
+            self.adopt_dataset(refined)
+        elif refined is not None:
+            refined.release()
+        st.session_state.dtype_report = two_model_system.dtype_report
+
+    def start_load_job(self):
+        """
+        Compact the dtypes of freshly loaded data (categorize repetitive text, parse dates) on the
+        job queue, not the upload rerun - with the 2-model system as part of Model 2's analysis.
+        finish_job switches the session to the compacted dataset.
+        """
+        st.session_state.dtype_report = None
+        st.session_state.refining_key = None
+        if self.use_two_model_system and self.two_model_system:
+            self.start_job('load_data', analyze_data_job, self.two_model_system, self.current_data)
+        else:
+            self.start_job('optimize_data', optimize_data_job, self.current_data)
+
     def load_sample_data(self):
         """Load sample data for demonstration"""
         import numpy as np
@@ -252,70 +431,211 @@ class DataApp:
             'Discount': np.random.uniform(0, 0.3, n_records)
         })
 
-        self.current_data = self.clean_dataframe_for_display(sample_data)
-        st.session_state.data = self.current_data
+        self.current_data = self.share_dataset(self.clean_dataframe_for_display(sample_data))
+        self.start_load_job()
 
-        # Initialize the 2-model system with sample data
-        if self.use_two_model_system and self.two_model_system:
-            with st.sidebar:
-                with st.spinner("🔍 Model 2: Analyzing sample data..."):
-                    load_result = self.two_model_system.load_data(self.current_data)
+        st.sidebar.success(f"✅ Sample data loaded: {len(self.current_data)} rows, {len(self.current_data.columns)} columns")
 
-                if load_result['success']:
-                    st.success(f"✅ Sample data analyzed: {load_result['data_shape']}")
-                    st.info("💬 Ready for data analyst conversation!")
+    def start_job(self, kind: str, fn, *args):
+        """
+        Run fn on the job queue as this session's active job (replacing any earlier one). The job id
+        also goes into the ?job= query parameter, so a refreshed page of the same browser (the job's
+        owner, see job_owner) reattaches to it.
+        """
+        queue = get_job_queue(JOB_APP)
+        if st.session_state.get('active_job'):
+            queue.cancel(st.session_state.active_job)
+        job_id = queue.submit(kind, fn, *args, st.session_state.dataset_handle.key,
+                              owner=job_owner(), memory_only=('coordinator', 'dataset_handle'))
+        st.session_state.active_job = job_id
+        st.query_params['job'] = job_id
+
+    def clear_job(self):
+        st.session_state.active_job = None
+        if 'job' in st.query_params:
+            del st.query_params['job']
+
+    def active_job_kind(self) -> Optional[str]:
+        job_id = st.session_state.get('active_job')
+        status = get_job_queue(JOB_APP).status(job_id) if job_id else None
+        return status['kind'] if status and status['status'] not in FINISHED_STATES else None
+
+    @st.fragment(run_every=1)
+    def render_job_status(self):
+        """Progress of the session's background job, polled every second; a finished job is applied with a full rerun"""
+        job_id = st.session_state.get('active_job')
+        queue = get_job_queue(JOB_APP)
+        status = queue.status(job_id) if job_id else None
+        if status is None or status['owner'] != job_owner():
+            self.clear_job()
+            return
 
-        st.sidebar.success(f"✅ Sample data loaded: {len(self.current_data)} rows, {len(self.current_data.columns)} columns")
+        if status['status'] not in FINISHED_STATES:
+            st.progress(status['progress'], text=f"⏳ {status['stage']}")
+            if st.button("⏹️ Cancel", key="cancel_job"):
+                queue.cancel(job_id)
+            return
 
+        self.finish_job(status, queue.result(job_id))
+        self.clear_job()
+        st.rerun()
+
+    def finish_job(self, status: Dict[str, Any], result: Optional[Dict[str, Any]]):
+        """Apply a finished job to the session; the message is shown after the rerun"""
+        if status['status'] == 'cancelled':
+            st.session_state.job_notice = ('warning', "⏹️ Analysis cancelled")
+            return
+        if status['status'] == 'failed' or result is None:
+            st.session_state.job_notice = ('error', f"❌ Analysis failed: {status.get('error') or 'result no longer available'}")
+            return
+
+        # Load jobs hand back the compacted dataset, and after a page refresh the session starts
+        # empty; either way the session switches to the job's dataset
+        current = st.session_state.get('dataset_handle')
+        if result.get('dataset_key') and (st.session_state.get('data') is None or current is None
+                                          or current.key != result['dataset_key']):
+            handle = result.get('dataset_handle') or get_dataset_store().acquire(result['dataset_key'])
+            if handle is not None:
+                self.adopt_dataset(handle)
+        if result.get('dtype_report') is not None:
+            st.session_state.dtype_report = result['dtype_report']
+
+        if status['kind'] == 'load_data':
+            if result.get('coordinator') is not None:
+                st.session_state.two_model_system = result['coordinator']
+            if result.get('success'):
+                message = f"✅ Data analyzed by AI: {result['data_shape']} - ready for data analyst conversation!"
+                if result.get('profile_status') == 'provisional':
+                    message += " (answers start from a sampled profile, the exact one is finishing in the background)"
+                    st.session_state.refining_key = st.session_state.dataset_handle.key
+                st.session_state.job_notice = ('success', message)
+            else:
+                st.session_state.job_notice = ('error', f"❌ 2-Model system error: {result.get('error')}")
+        elif status['kind'] == 'optimize_data':
+            report = result['dtype_report']
+            st.session_state.job_notice = ('success', f"✅ Data compacted: {report['memory_before'] / 1e6:.1f} MB → "
+                                                      f"{report['memory_after'] / 1e6:.1f} MB")
+        elif status['kind'] == 'command':
+            st.session_state.last_result = result
+            self.enforce_memory_budget()
+            if 'error' in result:
+                st.session_state.job_notice = ('error', f"❌ Analysis Error: {result['error']}")
+            else:
+                st.session_state.job_notice = ('success', "✅ Analysis completed successfully!")
+
+    def enforce_memory_budget(self) -> Dict[str, Any]:
+        """
+        Measure this session's results and figures against the per-session budget; the oldest chat
+        and Power BI figures are spilled to disk first (displaying them loads them back)
+        """
+        if 'session_id' not in st.session_state:
+            st.session_state.session_id = uuid.uuid4().hex
+        history = st.session_state.get('chat_history') or []
+        items = {
+            'last_result': st.session_state.get('last_result'),
+            'chat_text': [(chat['user'], chat['analyst'], chat.get('follow_ups')) for chat in history],
+            'custom_charts': st.session_state.get('custom_charts')
+        }
+        spillable = [(viz, 'chart') for chat in history for viz in chat.get('visualizations') or []]
+        spillable += [(chart_info, 'chart') for chart_info in st.session_state.get('powerbi_charts') or []]
+        report = get_memory_budget().enforce(st.session_state.session_id, items, spillable)
+        st.session_state.memory_report = report
+        return report
+
+    def data_preview(self):
+        """Cached preview of the current dataset (shared with other sessions viewing the same data)"""
+        handle = st.session_state.get('dataset_handle')
+        two_model_system = st.session_state.get('two_model_system')
+        profile = two_model_system.model_2_context_analyzer.profile if two_model_system is not None else None
+        key = handle.key if handle is not None else str(id(self.current_data))
+        return get_data_preview(self.current_data, key, profile)
+
+    @st.fragment
     def render_data_preview(self):
-        """Render data preview section"""
+        """Render data preview section (a fragment: paging, sorting and filtering rerun only this panel)"""
         if self.current_data is not None:
             st.header("📋 Data Preview")
+            preview = self.data_preview()
+            summary = preview.summary()
 
             # Quick stats
             col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                st.metric("Rows", len(self.current_data))
+                st.metric("Rows", summary['rows'])
                 st.markdown('</div>', unsafe_allow_html=True)
             with col2:
                 st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                st.metric("Columns", len(self.current_data.columns))
+                st.metric("Columns", summary['columns'])
                 st.markdown('</div>', unsafe_allow_html=True)
             with col3:
                 st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                numeric_cols = len(self.current_data.select_dtypes(include=['number']).columns)
-                st.metric("Numeric Columns", numeric_cols)
+                st.metric("Numeric Columns", summary['numeric_columns'])
                 st.markdown('</div>', unsafe_allow_html=True)
             with col4:
                 st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                missing_values = self.current_data.isnull().sum().sum()
-                st.metric("Missing Values", missing_values)
+                st.metric("Missing Values", summary['missing_values'])
                 st.markdown('</div>', unsafe_allow_html=True)
 
-            # Data preview table
+            # Data table: one page at a time, sorted/filtered on the server
             st.subheader("Sample Data")
-            st.dataframe(self.current_data.head(10), width='stretch')
+            columns = list(self.current_data.columns)
+            sort_col, order_col, filter_col, value_col, size_col = st.columns([2, 1, 2, 2, 1])
+            with sort_col:
+                sort_by = st.selectbox("Sort by", ["(original order)"] + columns, key="preview_sort")
+            with order_col:
+                descending = st.toggle("Descending", key="preview_descending")
+            with filter_col:
+                filter_column = st.selectbox("Filter column", ["(none)"] + columns, key="preview_filter_column")
+            with value_col:
+                filter_value = st.text_input("Filter", key="preview_filter_value",
+                                             placeholder="text, >100, 10..20, 2024-01-01..2024-03-31")
+            with size_col:
+                page_size = st.selectbox("Rows", [10, 25, 50, 100], key="preview_page_size")
+
+            filters = {filter_column: filter_value} if filter_column != "(none)" and filter_value else None
+            sort_by = None if sort_by == "(original order)" else sort_by
+            try:
+                matching = len(preview.row_order(filters, sort_by, not descending))
+            except (ValueError, KeyError) as e:
+                st.warning(f"Filter not applied: {e}")
+                filters = None
+                matching = summary['rows']
+
+            pages = max(1, -(-matching // page_size))
+            # Keyed by page count so a narrower filter starts again at page 1
+            page_number = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1,
+                                          key=f"preview_page_{pages}") if pages > 1 else 1
+            page = preview.page(page_number - 1, page_size, sort_by, not descending, filters)
+            st.dataframe(page['data'], width='stretch')
+            if page['matching_rows']:
+                st.caption(f"Rows {page['start'] + 1:,}-{page['start'] + len(page['data']):,} of {page['matching_rows']:,}"
+                           + (f" matching ({page['total_rows']:,} total)" if filters else ""))
+            else:
+                st.caption("No rows match the filter")
 
             # Column information
             with st.expander("📊 Column Information"):
-                col_info = pd.DataFrame({
-                    'Column': self.current_data.columns,
-                    'Type': self.current_data.dtypes.astype(str),  # Convert dtypes to strings
-                    'Non-Null Count': self.current_data.count(),
-                    'Unique Values': [self.current_data[col].nunique() for col in self.current_data.columns]
-                })
-                st.dataframe(col_info, width='stretch')
+                st.dataframe(preview.column_info(), width='stretch')
 
     def render_command_interface(self):
         """Render the appropriate interface based on system selection"""
         if self.use_two_model_system:
-            self.render_analyst_chat_interface()
+            self.render_chat_panel()
         elif self.use_powerbi_mode:
             self.render_powerbi_visualization_interface()
         else:
             self.render_traditional_command_interface()
 
+    @st.fragment
+    def render_chat_panel(self):
+        """Chat input and history as one fragment: asking, follow-ups and ratings rerun only this panel"""
+        if self.active_job_kind() == 'load_data':
+            st.info("🔍 Model 2 is still analyzing the data - the analyst is ready as soon as it finishes")
+            return
+        self.render_analyst_chat_interface()
+        self.display_chat_history()
+
     def render_analyst_chat_interface(self):
         """Render the 2-model analyst chatbot interface"""
         st.header("💬 Chat with Your Data Analyst")
@@ -338,7 +658,6 @@ class DataApp:
                             if st.button(f"💭 {question}", key=f"suggestion_q_{i}", width='stretch'):
                                 # Process the suggested question
                                 self.process_analyst_chat(question)
-                                st.rerun()
 
                     st.markdown("---")
             except Exception as e:
@@ -362,8 +681,8 @@ class DataApp:
                         self.two_model_system.reset_conversation()
                     if 'chat_history' in st.session_state:
                         del st.session_state['chat_history']
+                    self.enforce_memory_budget()
                     st.success("Chat cleared!")
-                    st.rerun()
 
             if submitted and user_question:
                 self.process_analyst_chat(user_question)
@@ -383,12 +702,15 @@ class DataApp:
                 st.session_state.chat_history.append({
                     'user': user_question,
                     'analyst': chat_result['response'],
-                    'visualizations': chat_result.get('visualizations', []),
-                    'follow_ups': chat_result.get('follow_up_suggestions', [])
+                    # Compact typed-array figures, decoded only while a chart is drawn
+                    'visualizations': [dict(viz, chart=compact_figure(viz.get('chart')))
+                                       for viz in chat_result.get('visualizations', [])],
+                    'follow_ups': chat_result.get('follow_up_suggestions', []),
+                    'route': chat_result.get('route')
                 })
+                self.enforce_memory_budget()
 
                 st.success("✅ Analysis complete!")
-                st.rerun()
             else:
                 st.error(f"❌ Analyst Error: {chat_result.get('response', 'Unknown error')}")
 
@@ -402,7 +724,13 @@ class DataApp:
 
         st.header("💬 Conversation with Data Analyst")
 
-        for i, chat in enumerate(st.session_state.chat_history):
+        history = st.session_state.chat_history
+        first = max(0, len(history) - CHAT_HISTORY_WINDOW)
+        if first and st.toggle(f"Show {first} earlier exchange{'s' if first > 1 else ''}", key="show_earlier_chat"):
+            first = 0
+
+        for i in range(first, len(history)):
+            chat = history[i]
             # User question
             with st.chat_message("user"):
                 st.write(chat['user'])
@@ -414,8 +742,8 @@ class DataApp:
                 # Show visualizations
                 if chat.get('visualizations'):
                     st.subheader("📊 Visualizations")
-                    for viz in chat['visualizations']:
-                        st.plotly_chart(viz['chart'], width='stretch', key=f"chat_viz_{i}_{hash(str(viz))}")
+                    for k, viz in enumerate(chat['visualizations']):
+                        st.plotly_chart(as_figure(load_spilled(viz['chart'])), width='stretch', key=f"chat_viz_{i}_{k}")
 
                 # Show follow-up suggestions
                 if chat.get('follow_ups'):
@@ -425,12 +753,26 @@ class DataApp:
                         with cols[j % 2]:
                             if st.button(f"❓ {follow_up}", key=f"followup_{i}_{j}"):
                                 self.process_analyst_chat(follow_up)
-                                st.rerun()
+                                rerun_panel()
+
+                # Ratings feed the model router's per-tier quality stats
+                if chat.get('route'):
+                    if chat.get('feedback') is None:
+                        rating_cols = st.columns([1, 1, 10])
+                        for col, (label, positive) in zip(rating_cols, [("👍", True), ("👎", False)]):
+                            with col:
+                                if st.button(label, key=f"feedback_{i}_{positive}"):
+                                    self.two_model_system.record_feedback(positive, chat['route'])
+                                    chat['feedback'] = positive
+                                    rerun_panel()
+                    else:
+                        st.caption("Thanks for the feedback!")
 
             st.divider()
 
+    @st.fragment
     def render_powerbi_visualization_interface(self):
-        """Render Power BI style direct visualization interface"""
+        """Render Power BI style direct visualization interface (a fragment: building charts reruns only this panel)"""
         st.header("📊 Create Visualizations - Power BI Style")
         st.markdown("**Direct visualization creation** - Select your data and chart type to create instant visuals")
 
@@ -440,7 +782,7 @@ class DataApp:
 
         # Get column information
         numeric_cols = self.current_data.select_dtypes(include=['number']).columns.tolist()
-        categorical_cols = self.current_data.select_dtypes(include=['object']).columns.tolist()
+        categorical_cols = self.current_data.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
         date_cols = self.current_data.select_dtypes(include=['datetime64']).columns.tolist()
 
         # Chart type selector
@@ -451,22 +793,22 @@ class DataApp:
         with col1:
             if st.button("📊 Bar Chart", key="powerbi_bar", width='stretch', type="primary"):
                 st.session_state['powerbi_chart_type'] = 'bar'
-                st.rerun()
+                rerun_panel()
 
         with col2:
             if st.button("📈 Line Chart", key="powerbi_line", width='stretch'):
                 st.session_state['powerbi_chart_type'] = 'line'
-                st.rerun()
+                rerun_panel()
 
         with col3:
             if st.button("🔵 Scatter Plot", key="powerbi_scatter", width='stretch'):
                 st.session_state['powerbi_chart_type'] = 'scatter'
-                st.rerun()
+                rerun_panel()
 
         with col4:
             if st.button("🥧 Pie Chart", key="powerbi_pie", width='stretch'):
                 st.session_state['powerbi_chart_type'] = 'pie'
-                st.rerun()
+                rerun_panel()
 
         # Additional chart types
         col5, col6, col7, col8 = st.columns(4)
@@ -474,17 +816,17 @@ class DataApp:
         with col5:
             if st.button("📦 Box Plot", key="powerbi_box", width='stretch'):
                 st.session_state['powerbi_chart_type'] = 'box'
-                st.rerun()
+                rerun_panel()
 
         with col6:
             if st.button("🔥 Heatmap", key="powerbi_heatmap", width='stretch'):
                 st.session_state['powerbi_chart_type'] = 'heatmap'
-                st.rerun()
+                rerun_panel()
 
         with col7:
             if st.button("📊 Histogram", key="powerbi_histogram", width='stretch'):
                 st.session_state['powerbi_chart_type'] = 'histogram'
-                st.rerun()
+                rerun_panel()
 
         with col8:
             if st.button("🔄 Clear All", key="powerbi_clear", width='stretch'):
@@ -492,7 +834,7 @@ class DataApp:
                     del st.session_state['powerbi_chart_type']
                 if 'powerbi_charts' in st.session_state:
                     del st.session_state['powerbi_charts']
-                st.rerun()
+                rerun_panel()
 
         # Chart configuration
         if 'powerbi_chart_type' in st.session_state:
@@ -504,13 +846,12 @@ class DataApp:
             st.header("📊 Your Visualizations")
             for i, chart_info in enumerate(st.session_state['powerbi_charts']):
                 st.subheader(f"{chart_info['title']}")
-                st.plotly_chart(chart_info['chart'], width='stretch', key=f"powerbi_chart_{i}")
+                st.plotly_chart(as_figure(load_spilled(chart_info['chart'])), width='stretch', key=f"powerbi_chart_{i}")
 
-                # Add download button for each chart
-                chart_html = chart_info['chart'].to_html(include_plotlyjs='cdn')
+                # Add download button for each chart (the HTML is only rendered when it is downloaded)
                 st.download_button(
                     label=f"📥 Download {chart_info['title']}",
-                    data=chart_html,
+                    data=partial(chart_html, chart_info['chart']),
                     file_name=f"{chart_info['title'].replace(' ', '_')}.html",
                     mime="text/html",
                     key=f"download_chart_{i}"
@@ -576,13 +917,14 @@ class DataApp:
                         st.session_state.powerbi_charts = []
 
                     st.session_state.powerbi_charts.append({
-                        'chart': chart,
+                        'chart': compact_figure(chart),
                         'title': config.get('title', f"{chart_type.title()} Chart"),
                         'type': chart_type
                     })
+                    self.enforce_memory_budget()
 
                     st.success(f"✅ {config.get('title', chart_type.title())} created successfully!")
-                    st.rerun()
+                    rerun_panel()
 
     def create_powerbi_chart(self, chart_type: str, config: Dict[str, Any]):
         """Create Power BI style chart based on configuration"""
@@ -590,6 +932,8 @@ class DataApp:
             # Clean config
             clean_config = {k: v for k, v in config.items() if v and v != 'None'}
 
+            import plotly.express as px
+
             if chart_type == 'bar':
                 fig = px.bar(
                     self.current_data,
@@ -663,7 +1007,7 @@ class DataApp:
             elif chart_type == 'heatmap':
                 columns = clean_config.get('columns', [])
                 if columns:
-                    corr_matrix = self.current_data[columns].corr()
+                    corr_matrix = get_correlation_engine().correlation(self.current_data, columns).to_frame()
                     fig = px.imshow(
                         corr_matrix,
                         text_auto=True,
@@ -727,27 +1071,9 @@ class DataApp:
                 self.clear_results()
 
     def process_command(self, command: str):
-        """Process natural language command through agents"""
+        """Process natural language command through agents (on the job queue; results show when it finishes)"""
         try:
-            with st.spinner("🤖 Agents are analyzing your request..."):
-                result = self.coordinator.process_command(command, self.current_data)
-
-                if result:
-                    # Store result in session state
-                    st.session_state.last_result = result
-
-                    # Debug: Show what we got
-                    if 'error' in result:
-                        st.error(f"❌ Analysis Error: {result['error']}")
-                        if 'explanation' in result:
-                            st.info(f"💡 Details: {result['explanation']}")
-                    else:
-                        # Success - display results
-                        self.display_results(result)
-                        st.success("✅ Analysis completed successfully!")
-                else:
-                    st.error("Sorry, I couldn't process your command. Please try rephrasing it.")
-
+            self.start_job('command', command_job, self.coordinator, command, self.current_data)
         except Exception as e:
             st.error(f"Error processing command: {e}")
             import traceback
@@ -781,7 +1107,7 @@ class DataApp:
             st.header("📈 Visualizations")
             st.write(f"**Found {len(result['charts'])} charts**")
             for i, chart in enumerate(result['charts']):
-                st.plotly_chart(chart, width='stretch', key=f"chart_{i}")
+                st.plotly_chart(as_figure(chart), width='stretch', key=f"chart_{i}")
         else:
             st.info("No visualizations generated")
 
@@ -790,21 +1116,27 @@ class DataApp:
                 fallback_chart = self.create_fallback_visualization(result)
                 if fallback_chart:
                     st.header("📈 Quick Visualization")
-                    st.plotly_chart(fallback_chart, width='stretch', key="fallback_chart")
+                    st.plotly_chart(transport_figure(fallback_chart), width='stretch', key="fallback_chart")
 
-        # Data tables
+        # Data tables: the result is a handle over the dataset, only the shown page is materialised
         if 'data' in result and result['data'] is not None:
+            result_data = ResultHandle.wrap(result['data'])
             st.header("📋 Filtered/Processed Data")
-            st.write(f"**Data shape:** {result['data'].shape}")
+            st.write(f"**Data shape:** {result_data.shape}")
+            pages = max(1, -(-len(result_data) // RESULT_PAGE_SIZE))
+            page_number = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1,
+                                          key=f"result_page_{pages}") if pages > 1 else 1
+            page = result_data.page(page_number - 1, RESULT_PAGE_SIZE)
             # Clean the result data for display
-            clean_data = self.clean_dataframe_for_display(result['data'])
+            clean_data = self.clean_dataframe_for_display(page['data'])
             st.dataframe(clean_data, width='stretch')
+            if pages > 1:
+                st.caption(f"Rows {page['start'] + 1:,}-{page['start'] + len(page['data']):,} of {page['matching_rows']:,}")
 
-            # Export option
-            csv_data = result['data'].to_csv(index=False)
+            # Export option (the CSV is only written when the button is clicked)
             st.download_button(
                 label="📥 Download Results as CSV",
-                data=csv_data,
+                data=result_data.to_csv,
                 file_name=f"analysis_results_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv"
             )
@@ -826,7 +1158,7 @@ class DataApp:
 
             # Simple correlation heatmap for correlation analysis
             if op_type == 'correlation':
-                numeric_data = data.select_dtypes(include=['number'])
+                numeric_data = as_frame(data.select_dtypes(include=['number']))
                 if len(numeric_data.columns) >= 2:
                     import plotly.graph_objects as go
 
@@ -852,7 +1184,7 @@ class DataApp:
                     import plotly.express as px
 
                     # Use first text column for x and first numeric for y
-                    text_cols = data.select_dtypes(include=['object', 'string']).columns
+                    text_cols = data.select_dtypes(include=['object', 'string', 'category']).columns
                     numeric_cols = data.select_dtypes(include=['number']).columns
 
                     if len(text_cols) > 0 and len(numeric_cols) > 0:
@@ -1015,9 +1347,11 @@ class DataApp:
 
         try:
             # Initialize visualization agent
-            viz_agent = VisualizationAgent()
             if self.coordinator:
-                viz_agent.initialize_model(os.getenv("OPENAI_API_KEY"))
+                viz_agent = self.coordinator.visualization_agent
+            else:
+                from agents.visualization_agent import VisualizationAgent
+                viz_agent = VisualizationAgent()
 
             # Clean config (remove None values)
             clean_config = {k: v for k, v in config.items() if v and v != 'None'}
@@ -1027,8 +1361,9 @@ class DataApp:
             chart = viz_agent.create_chart_from_config(self.current_data, clean_config)
 
             if chart:
+                chart = compact_figure(chart)
                 st.header("📈 Your Custom Visualization")
-                st.plotly_chart(chart, width='stretch')
+                st.plotly_chart(as_figure(chart), width='stretch')
 
                 # Store in session state for persistence
                 if 'custom_charts' not in st.session_state:
@@ -1072,32 +1407,52 @@ class DataApp:
             st.session_state.custom_charts = []
         if 'show_config' not in st.session_state:
             st.session_state.show_config = False
+        if 'appended_file_ids' not in st.session_state:
+            st.session_state.appended_file_ids = []
+
+        # A refreshed page reattaches to its background job through the ?job= query parameter,
+        # provided the job was started from this browser
+        owner = job_owner()
+        if not st.session_state.get('active_job') and st.query_params.get('job'):
+            status = get_job_queue(JOB_APP).status(st.query_params['job'])
+            if status is not None and status['owner'] == owner:
+                st.session_state.active_job = st.query_params['job']
+            else:
+                self.clear_job()
 
         # Get current data from session state
+        self.adopt_refined_dataset()
         self.current_data = st.session_state.data
 
         # Render sidebar
         self.render_sidebar()
 
+        # Background job progress goes at the top; jobs started further down the page still land here
+        job_slot = st.container()
+        notice = st.session_state.pop('job_notice', None)
+        if notice:
+            getattr(st, notice[0])(notice[1])
+
         # Main content
         if self.current_data is not None:
             self.render_data_preview()
             self.render_command_interface()
 
             # Display appropriate results based on system
-            if self.use_two_model_system:
-                # Display chat history for 2-model system
-                self.display_chat_history()
-            elif self.use_powerbi_mode:
-                # Power BI mode displays charts directly in the interface
+            if self.use_two_model_system or self.use_powerbi_mode:
+                # The chat panel and the Power BI builder display their own results
                 pass
             else:
                 # Display traditional results
                 if st.session_state.last_result is not None:
                     self.display_results(st.session_state.last_result)
-        else:
+        elif not st.session_state.get('active_job'):
             st.info("👆 Please upload a CSV file or load sample data from the sidebar to get started!")
 
+        if st.session_state.get('active_job'):
+            with job_slot:
+                self.render_job_status()
+
         # Footer
         st.divider()
         st.markdown("Built with ❤️ using Streamlit, Plotly, and OpenAI")